@@ -0,0 +1,371 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark module
+
+Copyright © 2022 Roman Clavier
+
+Measure the performances of the data processing, without any board.
+
+The ingestion benchmark generates command streams like the ones of examples/Bases/Bases.ino, and processes them
+as main.py does (validation, dispatch, file writing, Scene.add_values, Scene.compute_derivative (see scene.py) and
+rendering), on a headless matplotlib backend. The time spent in each stage is reported, to catch regressions.
+"""
+
+import argparse
+import math
+import shutil
+import tempfile
+import time
+
+import matplotlib
+import numpy as np
+matplotlib.use("Agg")   # headless: nothing is displayed, but the figures are still rendered
+
+import columnar
+import command_helper as helper
+import data_writer
+import legacy_parsing
+import line_buffer
+import main as visualizer
+import null_backend
+import pyplot_utils
+import scene
+
+# Setup commands of each scenario, as sent by the init_x() functions of examples/Bases/Bases.ino
+SCENARIOS_SETUP = {
+    "write": ["-n 1", "-h Time_(s) Sine"],
+    "line": ["-n 1", "-aa 211 Sine X Y", "-aa 212 Cosine X Y", "-al 1", "-ml 1 1 *", "-al 2 #1F85DE"],
+    "packet": ["-n 1", "-aa 211 Sine X Y", "-aa 212 Cosine X Y", "-al 1", "-ml 1 1 *", "-al 2 #1F85DE"],
+    "line_write": ["-n 1", "-h Time_(s) Sine", "-aa 111 Sine X Y", "-al 1", "-ml 1 1 None", "-sl 1 1 -."],
+    "line_write_several": ["-n 1", "-h Time_(s) Sine", "-aa 111 Sine X Y", "-al 1"],
+    "derivative": ["-n", "-aa 111", "-al 1", "-ml 1 1 none", "-al 1", "-ml 1 2 none", "-al 1", "-ml 1 3 none",
+                   "-al 1", "-ml 1 4 none", "-cl 1 4 #FBC15E"],
+}
+
+STAGES = ["validation", "dispatch", "file writing", "add_values", "derivative", "render"]
+
+
+def get_example_lines():
+    """
+    Get the example lines of all the available commands (see command_helper.COMMANDS_LIST).
+    :return: array of str, example: ["-n", "-n True", ..., "-ld 1 1 2 1"]
+    """
+    lines = []
+    for command in helper.get_commands():
+        for example in command.examples.split("\n"):
+            line = example.split("=>")[0].strip()
+            if line.startswith("-"):
+                lines.append(line)
+    return lines
+
+
+def build_dispatcher():
+    """Build a dispatcher whose handlers do nothing, to only measure the parsing and the dispatch"""
+    return helper.Dispatcher({code: (lambda data: None) for code in helper.get_command_codes()})
+
+
+def dispatch(dispatcher: helper.Dispatcher, data_read: str):
+    """Parse and dispatch a command using the dispatcher"""
+    err, handler, data = dispatcher.parse(data_read)
+    if err is None and handler is not None:
+        handler.execute(data)
+    return data
+
+
+def measure(function, lines: [], repeat: int):
+    """
+    Call a function on all the lines, several times.
+    :param function: Function taking a line
+    :param lines: The lines
+    :param repeat: Number of times all the lines are processed
+    :return: The number of lines processed per second
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for line in lines:
+            function(line)
+    elapsed = time.perf_counter() - start
+    return repeat * len(lines) / elapsed
+
+
+def run_dispatch_benchmark(repeat: int):
+    """
+    Compare the parsing and dispatch of the example lines of each command, before (see legacy_parsing.py) and with
+    command_helper.Dispatcher. The commands added since (not in legacy_parsing.COMMANDS_LIST) are only measured with
+    the dispatcher, and are left out of the total.
+    """
+    lines = get_example_lines()
+    dispatcher = build_dispatcher()
+    lines_by_code = {}
+    for line in lines:
+        lines_by_code.setdefault(line.split()[0], []).append(line)
+
+    print(f"Dispatch: {len(lines)} example lines x {repeat}")
+    row_format = "{:<12}{:>16}{:>16}{:>10}"
+    print(row_format.format("", "legacy lines/s", "lines/s", "ratio"))
+    common_lines = []
+    for code, code_lines in lines_by_code.items():
+        current = measure(lambda line: dispatch(dispatcher, line), code_lines, repeat)
+        if code in legacy_parsing.get_command_codes():
+            common_lines += code_lines
+            legacy = measure(legacy_parsing.dispatch, code_lines, repeat)
+            print(row_format.format(code, f"{legacy:.0f}", f"{current:.0f}", f"{current / legacy:.2f}x"))
+        else:
+            print(row_format.format(code, "-", f"{current:.0f}", "-"))
+    legacy = measure(legacy_parsing.dispatch, common_lines, repeat)
+    current = measure(lambda line: dispatch(dispatcher, line), common_lines, repeat)
+    print(row_format.format("all", f"{legacy:.0f}", f"{current:.0f}", f"{current / legacy:.2f}x"))
+
+
+def generate_stream(scenario: str, count: int, packet_size=5, interval=0.01):
+    """
+    Generate the high rate commands of a scenario, as sent by the example_x() functions of examples/Bases/Bases.ino
+    :param scenario: A key of SCENARIOS_SETUP
+    :param count: Number of samples (points or lines written) to send
+    :param packet_size: Number of samples per command, for the packet scenarios
+    :param interval: Time between two samples (in seconds)
+    :return: array of tuple (line, samples), samples being the number of samples carried by the line
+    """
+    stream = []
+    packet = []
+    for i in range(count):
+        time_elapsed = i * interval
+        sine = f"{time_elapsed:.2f} {math.sin(time_elapsed):.6f}"
+        match scenario:
+            case "write":
+                stream.append((f"-w {sine}", 1))
+            case "line":
+                stream.append((f"-l 1 1 {sine}", 1))
+                stream.append((f"-l 2 1 {time_elapsed:.2f} {math.cos(time_elapsed):.6f}", 1))
+            case "packet":
+                packet.append(sine)
+                if len(packet) >= packet_size:
+                    stream.append((f"-l 1 1 {' '.join(packet)}", len(packet)))
+                    packet = []
+            case "line_write":
+                stream.append((f"-lw 1 1 {sine}", 1))
+            case "line_write_several":
+                packet.append(sine)
+                if len(packet) >= packet_size:
+                    stream.append((f"-lws 1 1 {' ; '.join(packet)}", len(packet)))
+                    packet = []
+            case "derivative":
+                stream.append((f"-l 1 1 {time_elapsed:.3f} {math.sin(time_elapsed):.6f}", 1))
+                stream.append(("-ld 1 1 1 2", 0))
+                stream.append(("-ld 1 2 1 3", 0))
+                stream.append(("-ld 1 3 1 4", 0))
+    return stream
+
+
+class StageTimer:
+    """
+    Stage timer class.
+    Measure the time spent in each stage. The time of a stage excludes the time of the stages called inside it.
+    """
+    def __init__(self):
+        self.times = {stage: 0.0 for stage in STAGES}
+        self._children_times = [0.0]
+        self._wrapped = []
+
+    def call(self, stage: str, function, *args):
+        """
+        Call a function, adding its duration to a stage
+        :return: The value returned by the function
+        """
+        self._children_times.append(0.0)
+        start = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            children_time = self._children_times.pop()
+            self.times[stage] += elapsed - children_time
+            self._children_times[-1] += elapsed
+
+    def wrap(self, owner, name: str, stage: str):
+        """Replace the function owner.name by a function measuring its duration, until restore() is called"""
+        function = getattr(owner, name)
+        self._wrapped.append((owner, name, function))
+        setattr(owner, name, lambda *args: self.call(stage, function, *args))
+
+    def restore(self):
+        """Restore all the wrapped functions"""
+        for owner, name, function in reversed(self._wrapped):
+            setattr(owner, name, function)
+        self._wrapped = []
+
+
+def render(session, backend):
+    """Apply the changes of the scene, and render a frame, as the main loop of main.py does"""
+    session.renderer.sync()
+    if session.fig is not None:     # no figure with the null backend, or in the write scenario
+        backend.render([session.fig], True)
+
+
+def run_scenario(scenario: str, count: int, packet_size: int, max_values, render_every: int, backend=pyplot_utils,
+                 columnar_format=False):
+    """
+    Process the commands of a scenario, as main.py does with a board.
+    :param scenario: A key of SCENARIOS_SETUP
+    :param count: Number of samples
+    :param packet_size: Number of samples per command, for the packet scenarios
+    :param max_values: Maximum number of values per line (see -mv). None if not limited.
+    :param render_every: The figure is drawn after each render_every lines, 0 to never draw it
+    :param backend: The rendering backend: pyplot_utils or null_backend
+    :param columnar_format: If True, the save file is recorded as typed columns (see the -col option of main.py)
+    :return: The number of lines, the number of samples, the total time and the StageTimer
+    """
+    setup = [line for line in SCENARIOS_SETUP[scenario]]
+    if max_values:
+        setup.insert(1, f"-mv {max_values}")
+    stream = generate_stream(scenario, count, packet_size)
+
+    visualizer.utils = backend
+    visualizer.scene = scene
+    visualizer.data_writer = data_writer
+    visualizer.columnar = columnar
+    writing_defaults = columnar if columnar_format else data_writer
+    visualizer.flush_interval = writing_defaults.default_flush_interval
+    visualizer.flush_rows = writing_defaults.default_flush_rows
+    visualizer.flush_bytes = data_writer.default_flush_bytes
+    visualizer.fsync_data = False
+    visualizer.write_queue_size = data_writer.default_queue_size
+    visualizer.write_block = True     # the rows are never dropped
+    visualizer.columnar_format = columnar_format
+    visualizer.rotate_size = None
+    visualizer.rotate_rows = None
+    visualizer.rotate_time = None
+    visualizer.compression = None
+    visualizer.display_elapsed_time = False
+    visualizer.base_path = tempfile.mkdtemp(prefix="benchmark_")
+    log = visualizer.log
+    visualizer.log = lambda data: None    # the new file created is not logged
+    session = visualizer.Session([], name=scenario)
+    timer = StageTimer()
+
+    def process(line: str):
+        err, handler, data = timer.call("validation", session.dispatcher.parse, line)
+        if err:
+            raise ValueError(err)
+        timer.call("dispatch", session.execute_command, handler, data, line, time.monotonic())
+
+    try:
+        for line in setup:
+            session.process_line(line.encode("ascii"), time.monotonic())
+
+        timer.wrap(scene.Scene, "add_values", "add_values")
+        timer.wrap(scene.Scene, "compute_derivative", "derivative")
+        timer.wrap(visualizer.Session, "write_data", "file writing")
+        timer.wrap(visualizer.Session, "write_datas", "file writing")
+
+        start = time.perf_counter()
+        for i, (line, _) in enumerate(stream):
+            process(line)
+            if render_every and (i + 1) % render_every == 0:
+                timer.call("render", render, session, backend)
+        elapsed = time.perf_counter() - start
+    finally:
+        timer.restore()
+        pyplot_utils.scheduler.flush()
+        session.close()
+        visualizer.log = log
+        shutil.rmtree(visualizer.base_path, ignore_errors=True)
+
+    return len(stream), sum(samples for _, samples in stream), elapsed, timer
+
+
+def run_ingestion_benchmark(scenarios: [], count: int, packet_size: int, max_values, render_every: int,
+                            backend=pyplot_utils, columnar_format=False):
+    """Run the ingestion benchmark of each scenario, and print the results"""
+    if backend is pyplot_utils:
+        rendering = f"blit: {pyplot_utils.scheduler.blit}, decimation: {pyplot_utils.scheduler.level_of_detail.enabled}"
+    else:
+        rendering = f"backend: {backend.__name__}"
+    print(f"Ingestion: {count} samples per scenario, packets of {packet_size} samples, " +
+          f"max values: {max_values}, render every {render_every} lines, {rendering}, "
+          f"save format: {'columns' if columnar_format else 'text'}")
+    for scenario in scenarios:
+        lines, samples, elapsed, timer = run_scenario(scenario, count, packet_size, max_values, render_every, backend,
+                                                      columnar_format)
+        print()
+        print(f"{scenario}: {lines} lines, {samples} samples in {elapsed:.3f} s => "
+              f"{lines / elapsed:.0f} lines/s, {samples / elapsed:.0f} samples/s")
+        for stage in STAGES:
+            stage_time = timer.times[stage]
+            if stage_time == 0:
+                continue
+            print("    {:<14}{:>10.3f} s{:>8.1f} %{:>12.1f} µs/line".format(
+                stage, stage_time, 100 * stage_time / elapsed, 1e6 * stage_time / lines))
+
+
+def check_derivatives(count=50, max_degree=5):
+    """
+    Check the incremental derivation (see line_buffer.DerivativeStream) against the derivation of all the values at
+    once, with one value added per update, as the -ld command does after each -l command.
+    :param count: Number of values added
+    :param max_degree: The degrees from 0 to max_degree are checked
+    :return: array of int, the degrees whose derived values differ
+    """
+    x_data = np.arange(count) * 0.01
+    y_data = np.sin(x_data)
+    failed = []
+    for degree in range(max_degree + 1):
+        ori_buffer = line_buffer.LineBuffer()
+        derived_buffer = line_buffer.LineBuffer()
+        stream = line_buffer.DerivativeStream(ori_buffer, degree)
+        for x, y in zip(x_data, y_data):
+            ori_buffer.append(x, y)
+            _, new_x, new_y = stream.update(derived_buffer)
+            derived_buffer.append(new_x, new_y)
+        expected_x, expected_y = line_buffer.get_derivatives(x_data, y_data, degree)
+        if not (np.array_equal(derived_buffer.get_xdata(), expected_x) and
+                np.allclose(derived_buffer.get_ydata(), expected_y)):
+            failed.append(degree)
+    return failed
+
+
+def main():
+    """Main function"""
+    print()
+    failed = check_derivatives()
+    print(f"Derivative check: {'failed for the degrees ' + str(failed) if failed else 'ok'}")
+    print()
+    pyplot_utils.scheduler.blit = not args.no_blit
+    pyplot_utils.scheduler.level_of_detail.enabled = not args.no_decimation
+    if not args.no_ingestion:
+        run_ingestion_benchmark(args.scenario, args.samples, args.packet_size, args.max_values, args.render_every,
+                                null_backend if args.no_render else pyplot_utils, args.columnar)
+        print()
+    if not args.no_dispatch:
+        run_dispatch_benchmark(args.repeat)
+        print()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark CLI")
+    parser.add_argument("-s", "--scenario", type=str, nargs="+", choices=SCENARIOS_SETUP.keys(),
+                        default=list(SCENARIOS_SETUP.keys()), help="scenarios of the ingestion benchmark (default: all)")
+    parser.add_argument("-n", "--samples", type=int, default=2000,
+                        help="number of samples sent in each scenario (default: 2000)")
+    parser.add_argument("-ps", "--packet-size", type=int, default=5,
+                        help="number of samples per command in the packet scenarios (default: 5)")
+    parser.add_argument("-mv", "--max-values", type=int, help="maximum number of values per line (see the -mv command)")
+    parser.add_argument("-re", "--render-every", type=int, default=100,
+                        help="draw the figure after each given number of lines, 0 to never draw it (default: 100)")
+    parser.add_argument("-nbl", "--no-blit", action="store_true",
+                        help="redraw the whole figures instead of only their lines (see the -nbl option of main.py)")
+    parser.add_argument("-ndec", "--no-decimation", action="store_true",
+                        help="draw all the points of the lines (see the -ndec option of main.py)")
+    parser.add_argument("-nr", "--no-render", action="store_true",
+                        help="use the null backend: the values are only stored in memory (see the -nr option of "
+                             "main.py), to measure the processing without the rendering")
+    parser.add_argument("-col", "--columnar", action="store_true",
+                        help="record the save files as typed columns (see the -col option of main.py)")
+    parser.add_argument("-r", "--repeat", type=int, default=2000,
+                        help="number of times the example lines are processed by the dispatch benchmark "
+                             "(default: 2000)")
+    parser.add_argument("-ni", "--no-ingestion", action="store_true", help="skip the ingestion benchmark")
+    parser.add_argument("-nd", "--no-dispatch", action="store_true", help="skip the dispatch benchmark")
+    args = parser.parse_args()
+    main()
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+"""
+Binary protocol module
+
+Copyright © 2022 Roman Clavier
+
+Decode the compact binary frames, an alternative to the ASCII commands for high data rates.
+
+Each frame is COBS encoded (Consistent Overhead Byte Stuffing) and terminated by a 0x00 byte.
+Once decoded, a frame is composed of a command byte followed by its payload:
+
+    TEXT        [0x01] [ascii command]                      => any ASCII command, example: "-aa 111"
+    LINE        [0x02 | 0x03] [axis:u8] [line:u8] [values]  => same as -l
+    LINE_WRITE  [0x04 | 0x05] [axis:u8] [line:u8] [values]  => same as -lws
+    WRITE       [0x06 | 0x07] [values]                      => same as -w
+
+The values are packed little-endian, float32 for the even command bytes (0x02, 0x04, 0x06)
+and int16 for the odd ones (0x03, 0x05, 0x07).
+For LINE and LINE_WRITE, values are the pairs x1 y1 x2 y2 ...
+
+See examples/Binary/Binary.ino to send these frames from an Arduino board.
+"""
+
+import numpy as np
+
+FRAME_DELIMITER = b"\x00"
+
+TEXT_COMMAND = 0x01
+
+# command byte: (equivalent ASCII command code, dtype of the values)
+BINARY_COMMANDS = {
+    0x02: ("-l", np.dtype("<f4")),
+    0x03: ("-l", np.dtype("<i2")),
+    0x04: ("-lws", np.dtype("<f4")),
+    0x05: ("-lws", np.dtype("<i2")),
+    0x06: ("-w", np.dtype("<f4")),
+    0x07: ("-w", np.dtype("<i2")),
+}
+
+
+def cobs_decode(frame: bytes):
+    """
+    Decode a COBS encoded frame (without its 0x00 delimiter).
+    :param frame: The encoded frame
+    :return: The decoded bytes
+    :raise ValueError: If the frame is not a valid COBS frame
+    """
+    decoded = bytearray()
+    length = len(frame)
+    index = 0
+    while index < length:
+        code = frame[index]
+        if code == 0:
+            raise ValueError("Unexpected zero byte in COBS frame")
+        end = index + code
+        if end > length:
+            raise ValueError("Truncated COBS frame")
+        decoded += frame[index + 1:end]
+        index = end
+        # A block of 255 is not followed by an implicit zero, and the last block never is
+        if code != 0xFF and index < length:
+            decoded.append(0)
+    return decoded
+
+
+def cobs_encode(data: bytes):
+    """
+    Encode bytes using COBS. The 0x00 delimiter is not added.
+    :param data: The bytes to encode
+    :return: The encoded frame
+    """
+    encoded = bytearray([0])
+    code_index = 0
+    code = 1
+    for byte in data:
+        if byte == 0:
+            encoded[code_index] = code
+            code_index = len(encoded)
+            encoded.append(0)
+            code = 1
+            continue
+        encoded.append(byte)
+        code += 1
+        if code == 0xFF:
+            encoded[code_index] = code
+            code_index = len(encoded)
+            encoded.append(0)
+            code = 1
+    encoded[code_index] = code
+    return bytes(encoded)
+
+
+def decode_frame(frame: bytes):
+    """
+    Decode a frame received.
+    :param frame: The COBS encoded frame, without its 0x00 delimiter
+    :return: None, data or err_message, None<br />
+             data is the ASCII command (bytes) for a TEXT frame,
+             else an array built like the validated ASCII command, the values being numpy arrays
+             (of shape (n, 2) for the line commands).
+    """
+    try:
+        decoded = cobs_decode(frame)
+    except ValueError as err:
+        return f"Invalid frame: {err}", None
+
+    if len(decoded) == 0:
+        return "Invalid frame: empty frame", None
+
+    command_byte = decoded[0]
+    if command_byte == TEXT_COMMAND:
+        return None, bytes(decoded[1:])
+
+    if command_byte not in BINARY_COMMANDS:
+        return f"Binary command not found: {command_byte:#04x}", None
+
+    code, dtype = BINARY_COMMANDS[command_byte]
+    offset = 1 if code == "-w" else 3
+    payload_size = len(decoded) - offset
+    # values must be pairs for the line commands
+    values_size = dtype.itemsize if code == "-w" else 2 * dtype.itemsize
+
+    if payload_size <= 0 or payload_size % values_size != 0:
+        return f"Invalid payload size for binary command {command_byte:#04x} ({code}): {payload_size} bytes", None
+
+    values = np.frombuffer(decoded, dtype=dtype, offset=offset)
+
+    if code == "-w":
+        return None, [code] + [str(value) for value in values]
+
+    axis = decoded[1]
+    line = decoded[2]
+    if axis < 1 or line < 1:
+        return f"Invalid axis or line for binary command {command_byte:#04x} ({code}): {axis} {line}", None
+
+    return None, [code, axis, line, values.reshape(-1, 2)]
+
+
+def encode_frame(command_byte: int, payload: bytes):
+    """
+    Build a frame, ready to be sent (can be used to simulate a board).
+    :param command_byte: The command byte
+    :param payload: The payload
+    :return: The COBS encoded frame, with its 0x00 delimiter
+    """
+    return cobs_encode(bytes([command_byte]) + payload) + FRAME_DELIMITER
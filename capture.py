@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+
+"""
+Capture module
+
+Copyright © 2022 Roman Clavier
+
+Record the raw data received from a board into a capture file, and replay it without any board.
+
+A capture file starts with the magic bytes b"RTDVCAP", followed by one byte of flags (1 if the data are binary frames),
+then each line received is stored as a record: [receive_time:float64] [size:uint32] [raw line:size bytes],
+little-endian. receive_time is the time.monotonic() value at which the line has been received.
+"""
+
+import struct
+import time
+
+MAGIC = b"RTDVCAP"
+FLAG_BINARY = 0x01
+
+_record_header = struct.Struct("<dI")
+
+
+class CaptureWriter:
+    """Capture writer class. Record the raw lines received into a capture file."""
+    def __init__(self, file_path: str, binary=False):
+        self.file_path = file_path
+        self.count = 0
+        self._file = open(file_path, "wb")
+        self._file.write(MAGIC + bytes([FLAG_BINARY if binary else 0]))
+
+    def write(self, receive_time: float, data_read: bytes):
+        """Record a line"""
+        self._file.write(_record_header.pack(receive_time, len(data_read)))
+        self._file.write(data_read)
+        self.count += 1
+
+    def close(self):
+        """Close the capture file"""
+        if not self._file.closed:
+            self._file.close()
+
+
+def read_capture(file_path: str):
+    """
+    Read a capture file.
+    :param file_path: Path of the capture file
+    :return: True if the data are binary frames, and the array of tuple (receive_time, data_read) recorded
+    :raise ValueError: If the file is not a capture file
+    """
+    with open(file_path, "rb") as file:
+        content = file.read()
+
+    if not content.startswith(MAGIC) or len(content) <= len(MAGIC):
+        raise ValueError(f"Not a capture file: {file_path}")
+
+    binary = bool(content[len(MAGIC)] & FLAG_BINARY)
+    records = []
+    offset = len(MAGIC) + 1
+    length = len(content)
+    while offset + _record_header.size <= length:
+        receive_time, size = _record_header.unpack_from(content, offset)
+        offset += _record_header.size
+        records.append((receive_time, content[offset:offset + size]))
+        offset += size
+    return binary, records
+
+
+class ReplaySource:
+    """
+    Replay source class.
+    Give the lines of a capture file, with the same interface as serial_utils.SerialReader.
+    The lines are given following their original timing divided by the speed, or as fast as possible if speed is 0.
+    """
+    def __init__(self, file_path: str, speed=1.0, batch_size=1000):
+        """
+        :param file_path: Path of the capture file
+        :param speed: 1 for real time, 2 for twice faster, ..., 0 for as fast as possible
+        :param batch_size: Maximum number of lines given by each call of get_lines() when speed is 0
+        """
+        self.name = file_path
+        self.binary, self._records = read_capture(file_path)
+        self.count = len(self._records)
+        self._speed = speed
+        self._batch_size = batch_size
+        self._index = 0
+        self._start_time = None
+        self._first_time = self._records[0][0] if self._records else 0
+        self.error = None
+        self.received_count = 0
+        self.dropped_count = 0
+
+    @property
+    def finished(self):
+        """True when all the lines have been given"""
+        return self._index >= self.count
+
+    @property
+    def start_time(self):
+        """The time (time.monotonic()) at which the replay started, None if not started"""
+        return self._start_time
+
+    def start(self):
+        """Start the replay"""
+        self._start_time = time.monotonic()
+
+    def get_lines(self):
+        """
+        Get all the lines due since the last call.
+        :return: array of tuple (receive_time, data_read), receive_time being the replayed time
+        """
+        if self.finished:
+            return []
+
+        now = time.monotonic()
+        if self._start_time is None:
+            self._start_time = now
+
+        start = self._index
+        if self._speed <= 0:
+            end = min(start + self._batch_size, self.count)
+            lines = [(now, data_read) for _, data_read in self._records[start:end]]
+        else:
+            # The original time (relative to the first line) reached by the replay
+            replay_time = self._first_time + (now - self._start_time) * self._speed
+            end = start
+            while end < self.count and self._records[end][0] <= replay_time:
+                end += 1
+            lines = [(self._start_time + (receive_time - self._first_time) / self._speed, data_read)
+                     for receive_time, data_read in self._records[start:end]]
+
+        self._index = end
+        self.received_count = end
+        return lines
+
+    def stop(self, timeout=None):
+        """Stop the replay"""
+        self._index = self.count
@@ -0,0 +1,398 @@
+# -*- coding: utf-8 -*-
+
+"""
+Columnar module
+
+Copyright © 2022 Roman Clavier
+
+Record the rows of a save file as typed columns instead of text (see main.py -col option): the values aren't
+formatted when they are received, and the recordings are smaller and faster to load with numpy.
+
+A recording is a directory (example: data/2022_01_01-12_00_00.columns) containing:
+- manifest.json: the segments of the recording. A segment starts at each header, each time the number of values
+  of the rows changes, and each time the separator or the decimal character of the session changes (see the -s and
+  -dc commands). Each segment has its header (None if there isn't any), its number of columns, its separator and
+  decimal character (used by the export) and its chunks.
+- The chunks: the rows written at once (see the flush policy of data_writer.py), stored as one .npy file per column.
+  "s000001_c000002_3.npy" is the column 3 of the chunk 2 of the segment 1. The values of a column of a chunk are
+  stored as int64 if they are all integers, as float64 with their number of decimals if they are all numbers written
+  with a fixed number of decimals ("2.50"), else as strings. So the export gives back the text of each value.
+The files of a chunk are never modified once written, and the manifest is replaced after each chunk written: it only
+lists complete chunks, even if the program is stopped while writing.
+
+A recording can be exported to a text save file, as written without the -col option:
+- Use `python columnar.py -e data/2022_01_01-12_00_00.columns` to get data/2022_01_01-12_00_00.txt, with the
+  separator and the decimal character of the session.
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+import tools
+from data_writer import default_flush_bytes
+
+extension = ".columns"
+manifest_name = "manifest.json"
+manifest_version = 1
+default_flush_interval = 10.0       # each flush writes a chunk: fewer and bigger chunks than the rows of a text file
+default_flush_rows = 65536
+
+
+def create(path: str):
+    """
+    Create an empty recording
+    :param path: The path of the directory of the recording
+    :raise FileExistsError: If the directory already exists
+    """
+    os.mkdir(path)
+    write_manifest(path, new_manifest())
+
+
+def new_manifest():
+    """Get the manifest of an empty recording"""
+    return {"version": manifest_version, "row_count": 0, "segments": []}
+
+
+def read_manifest(path: str):
+    """
+    Read the manifest of a recording
+    :param path: The path of the directory of the recording
+    :return: dict (see the module description)
+    """
+    with open(os.path.join(path, manifest_name)) as file:
+        manifest = json.load(file)
+    if manifest.get("version") != manifest_version:
+        raise ValueError(f"Unsupported recording version: {manifest.get('version')}")
+    return manifest
+
+
+def write_manifest(path: str, manifest: dict, fsync=False):
+    """Replace the manifest of a recording. It is written next to the old one then renamed, so it's always complete."""
+    manifest_path = os.path.join(path, manifest_name)
+    with open(manifest_path + ".tmp", "w") as file:
+        json.dump(manifest, file)
+        if fsync:
+            file.flush()
+            os.fsync(file.fileno())
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+
+def is_empty(path: str):
+    """True if the recording doesn't contain any row (only headers, or nothing)"""
+    return read_manifest(path)["row_count"] == 0
+
+
+number_dtype = np.dtype([("value", np.float64), ("decimals", np.uint8)])
+
+
+def to_column(values: []):
+    """
+    Get the typed array of the values of a column. The text of each value can be given back (see to_texts()).
+    :param values: array of string
+    :return: numpy array of int64 if all the values are integers, of number_dtype (value and number of decimals) if
+    they are all numbers written with a fixed number of decimals ("5", "2.50", ...), else of string
+    """
+    texts = np.array(values, dtype=str)
+    try:
+        column = np.array(values, dtype=np.int64)
+        if np.array_equal(column.astype(str), texts):     # not "007" or "+5"
+            return column
+    except (ValueError, OverflowError):
+        pass
+
+    try:
+        column = np.empty(len(texts), dtype=number_dtype)
+        column["value"] = np.array(values, dtype=np.float64)
+        dots = np.char.find(texts, ".")
+        decimals = np.where(dots >= 0, np.char.str_len(texts) - dots - 1, 0)
+        if decimals.max(initial=0) <= np.iinfo(np.uint8).max:
+            column["decimals"] = decimals
+            if np.array_equal(to_texts(column), texts):    # not "1e3" or "NaN"
+                return column
+    except (ValueError, OverflowError):
+        pass
+    return texts
+
+
+def to_texts(column):
+    """
+    Get the texts of the values of a column, as received
+    :param column: numpy array, see to_column()
+    :return: numpy array of string
+    """
+    if column.dtype != number_dtype:
+        return column.astype(str)
+    texts = np.empty(len(column), dtype=object)
+    for decimals in np.unique(column["decimals"]):
+        selected = column["decimals"] == decimals
+        texts[selected] = np.char.mod(f"%.{decimals}f", column["value"][selected])
+    return texts.astype(str)
+
+
+class ColumnarWriter:
+    """
+    Columnar writer class.
+    Write the rows of a recording by chunks, with the same interface and flush policy as data_writer.DataWriter.
+    The rows are given as arrays of values (string): write([header], 0) for a header, write(rows, len(rows)) for
+    rows, and write({"separator": ..., "decimal_character": ...}, 0) for the layout of the next rows (see
+    format_layout()).
+    If the recording can't be written, a PermissionError or a FileNotFoundError (directory removed) is raised, and
+    the rows stay waiting (see detach()).
+    """
+    def __init__(self, path: str, flush_interval=default_flush_interval, flush_rows=default_flush_rows,
+                 flush_bytes=default_flush_bytes, fsync=False):
+        """
+        :param path: The path of the directory of the recording, created by create()
+        :param flush_interval: See DataWriter
+        :param flush_rows: See DataWriter
+        :param flush_bytes: See DataWriter
+        :param fsync: See DataWriter
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_rows = flush_rows
+        self.flush_bytes = flush_bytes
+        self.fsync = fsync
+        self._manifest = None       # read at the first flush
+        self._layout = None         # layout of the rows written, None if not given yet
+        self._pending = []          # tuple (rows, row_count), see write()
+        self._pending_rows = 0
+        self._pending_size = 0
+        self._flush_time = None
+        self.written_rows = 0
+        self.flush_count = 0
+
+    @property
+    def pending_count(self):
+        """The number of rows waiting to be written"""
+        return self._pending_rows
+
+    def write(self, data: [], row_count=1):
+        """
+        Add rows. They are written at once if the flush policy requires it.
+        :param data: array of rows, each row being an array of values (string). Or the layout (see format_layout()).
+        :param row_count: The number of rows in data, 0 if data only contains a header or is a layout
+        """
+        self._pending.append((data, row_count))
+        self._pending_rows += row_count
+        if not isinstance(data, dict):
+            self._pending_size += sum(len(value) + 1 for row in data for value in row)
+        if self._flush_time is None:
+            self._flush_time = time.monotonic() + self.flush_interval
+
+        if self.flush_interval <= 0 \
+                or (self.flush_rows is not None and self._pending_rows >= self.flush_rows) \
+                or (self.flush_bytes is not None and self._pending_size >= self.flush_bytes):
+            self.flush()
+
+    def poll(self):
+        """Write the rows waiting if the flush interval is elapsed. To call regularly."""
+        if self._flush_time is not None and time.monotonic() >= self._flush_time:
+            self.flush()
+
+    def flush(self):
+        """Write all the rows waiting, as new chunks"""
+        if not self._pending:
+            return
+        if not os.path.isdir(self.path):
+            raise FileNotFoundError(f"Recording removed: {self.path}")
+        if self._manifest is None:
+            self._manifest = read_manifest(self.path)
+        try:
+            layout = self._write_pending(self._manifest["segments"])
+            self._manifest["row_count"] += self._pending_rows
+            write_manifest(self.path, self._manifest, self.fsync)
+        except OSError:
+            self._manifest = None   # read again: it only describes the chunks listed in the manifest file
+            raise
+
+        self._layout = layout
+        self.written_rows += self._pending_rows
+        self.flush_count += 1
+        self._pending = []
+        self._pending_rows = 0
+        self._pending_size = 0
+        self._flush_time = None
+
+    def _write_pending(self, segments: []):
+        """
+        Write the rows waiting as new chunks, adding them (and the new segments) to the segments given
+        :return: The layout of the last rows
+        """
+        layout = self._layout
+        rows = []   # rows of the next chunk, having the same number of values
+        for data, row_count in self._pending:
+            if row_count == 0:
+                if rows:
+                    self._write_chunk(segments, rows, layout)
+                    rows = []
+                if isinstance(data, dict):
+                    layout = data
+                    if segments and not segments[-1]["chunks"]:     # the rows of the segment follow the layout
+                        segments[-1].update(layout)
+                else:   # a header starts a new segment
+                    segments.append({"header": list(data[0]), "columns": None, **(layout or {}), "chunks": []})
+                continue
+            for row in data:
+                if rows and len(row) != len(rows[0]):
+                    self._write_chunk(segments, rows, layout)
+                    rows = []
+                rows.append(row)
+        if rows:
+            self._write_chunk(segments, rows, layout)
+        return layout
+
+    def _write_chunk(self, segments: [], rows: [], layout=None):
+        """
+        Write rows having the same number of values as a new chunk of the last segment (or of a new one, if the last
+        one has another number of values or another layout)
+        """
+        column_count = len(rows[0])
+        if not segments or segments[-1]["columns"] not in (None, column_count) \
+                or any(segments[-1].get(key) != value for key, value in (layout or {}).items()):
+            segments.append({"header": None, "columns": column_count, **(layout or {}), "chunks": []})
+        segment = segments[-1]
+        segment["columns"] = column_count
+
+        segment_index = len(segments) - 1
+        chunk_index = len(segment["chunks"])
+        files = []
+        for column_index, values in enumerate(zip(*rows)):
+            name = f"s{segment_index:06d}_c{chunk_index:06d}_{column_index}.npy"
+            with open(os.path.join(self.path, name), "wb") as file:
+                np.save(file, to_column(values))
+                if self.fsync:
+                    file.flush()
+                    os.fsync(file.fileno())
+            files.append(name)
+        segment["chunks"].append({"rows": len(rows), "files": files})
+
+    def detach(self):
+        """
+        Forget the rows waiting, when the recording can't be written anymore
+        :return: array of tuple (data, row_count) of the rows waiting (see write()), starting with their layout
+        """
+        items = self._pending
+        if items and self._layout is not None:
+            items.insert(0, (self._layout, 0))
+        self._pending = []
+        self._pending_rows = 0
+        self._pending_size = 0
+        self._flush_time = None
+        return items
+
+    def write_moved(self, items: [], header=None):
+        """
+        Write at once the rows of a recording which couldn't be written (see detach())
+        :param items: array of tuple (data, row_count)
+        :param header: The header (as given to write()) written first, if the rows don't start with it. None if there
+        isn't any.
+        """
+        first = next((item for item in items if not isinstance(item[0], dict)), None)
+        if header and not (first and first[1] == 0 and list(first[0]) == list(header)):
+            self._pending.append((header, 0))
+        for data, row_count in items:
+            self._pending.append((data, row_count))
+            self._pending_rows += row_count
+        self.flush()
+
+    def close(self):
+        """Write the rows waiting"""
+        self.flush()
+
+
+def format_layout(separator: str, decimal_character: str):
+    """Get the layout of the rows written next, as given to ColumnarWriter.write()"""
+    return {"separator": separator, "decimal_character": decimal_character}
+
+
+def iter_chunks(path: str):
+    """
+    Read a recording chunk by chunk, only one chunk being loaded at once
+    :param path: The path of the directory of the recording
+    :return: generator of tuple (segment, columns): each segment (see the module description) with columns None at
+    its start, then the columns (array of numpy array) of each of its chunks
+    """
+    manifest = read_manifest(path)
+    for segment in manifest["segments"]:
+        yield segment, None
+        for chunk in segment["chunks"]:
+            yield segment, [np.load(os.path.join(path, name)) for name in chunk["files"]]
+
+
+def export_csv(path: str, output_path=None, separator=None, decimal_character=None):
+    """
+    Export a recording to a text save file, as written by main.py without the -col option. The rows are written
+    chunk by chunk, so the memory used doesn't depend on the size of the recording.
+    The values are written as received (see to_texts()), except the numbers of the recordings of the previous
+    versions, stored as float64: they are written in their shortest form ("5" is exported as "5.0").
+    :param path: The path of the directory of the recording
+    :param output_path: The path of the text file. None for the path of the recording with the .txt extension.
+    :param separator: The character separating the values of a row. None for the one of each segment (";" if the
+    recording doesn't give it)
+    :param decimal_character: The decimal character of the numbers which are not integers. None for the one of each
+    segment ("." if the recording doesn't give it)
+    :return: The path of the text file, and the number of rows written (headers excluded)
+    """
+    if output_path is None:
+        output_path = os.path.splitext(path.rstrip("/\\"))[0] + ".txt"
+
+    row_count = 0
+    with open(output_path, "w") as file:
+        for segment, columns in iter_chunks(path):
+            segment_separator = separator or segment.get("separator") or ";"
+            segment_decimal_character = decimal_character or segment.get("decimal_character") or "."
+            if columns is None:
+                if segment["header"] is not None:
+                    file.write(segment_separator.join(segment["header"]) + "\n")
+                continue
+            texts = []
+            for values in columns:
+                text = to_texts(values)
+                if segment_decimal_character != ".":
+                    if values.dtype.kind == "f" or values.dtype == number_dtype:
+                        text = np.char.replace(text, ".", segment_decimal_character)
+                    elif values.dtype.kind == "U":     # same rule as main.py for each value
+                        text = [value.replace(".", segment_decimal_character)
+                                if not tools.is_int(value) and tools.is_float(value) else value for value in text]
+                        text = np.array(text, dtype=str)
+                texts.append(text.tolist())
+            file.writelines(segment_separator.join(row) + "\n" for row in zip(*texts))
+            row_count += len(columns[0]) if columns else 0
+    return output_path, row_count
+
+
+def main():
+    """Main function"""
+    args = parser.parse_args()
+
+    if args.export:
+        if not os.path.isdir(args.export):
+            print(f"Recording not found: {args.export}")
+            return
+        try:
+            output_path, row_count = export_csv(args.export, args.output, args.separator, args.decimal_character)
+        except (OSError, ValueError) as err:
+            print(f"{type(err).__name__}: {err}")
+            return
+        print(f"Exported: {output_path} ({row_count} rows)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="columnar.py CLI")
+    parser.add_argument("-e", "--export", type=str, help="export a recording (directory *.columns) to a text save "
+                                                         "file")
+    parser.add_argument("-o", "--output", type=str,
+                        help="set the path of the text file exported. Default: the path of the recording with the "
+                             ".txt extension")
+    parser.add_argument("-s", "--separator", type=str,
+                        help="set the character separating the values of a row. Default: the one recorded (-s "
+                             "command of the session), else ;")
+    parser.add_argument("-dc", "--decimal-character", type=str,
+                        help="set the decimal character of the numbers. Default: the one recorded (-dc command of the "
+                             "session), else .")
+    main()
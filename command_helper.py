@@ -24,7 +24,7 @@ COMMANDS_LIST = {
     "-aas": commands.AddAxesCommand(),
     "-at": commands.AxisTitleCommand(),
     "-albl": commands.AxisLabelsCommand(),
-    # "-sa": commands.SynchronizeAxesCommand(),
+    "-sa": commands.SynchronizeAxesCommand(),
     "-clra": commands.ClearAxisCommand(),
     "-ra": commands.RemoveAxisCommand(),
     "-al": commands.AddLineCommand(),
@@ -62,7 +62,12 @@ def get_command(code: str):
     :param code: A string corresponding to a command. Example: '-n'
     :return: The corresponding command
     """
-    return COMMANDS_LIST[code] if code in get_command_codes() else None
+    return COMMANDS_LIST.get(code)
+
+
+def build_not_found_error(code: str):
+    """Build the error message of an unknown command"""
+    return f"Command not found: {code}\nTo get the available commands, use: python command_helper.py -l"
 
 
 def validation(data_read: str):
@@ -76,15 +81,88 @@ def validation(data_read: str):
         return err, None
     data_build = None
 
-    if data[0] in get_command_codes():
-        data_build = COMMANDS_LIST[data[0]].build_data(data)
+    command = COMMANDS_LIST.get(data[0])
+    if command is not None:
+        try:
+            data_build = command.build_data(data)
+        except commands.InvalidDataError as details:
+            return commands.build_error(command, data_read, details), None
         if data_build is None:
-            err = commands.build_error(COMMANDS_LIST[data[0]], data_read)
+            err = commands.build_error(command, data_read)
     else:
-        err = f"Command not found: {data[0]}\nTo get the available commands, use: python command_helper.py -l"
+        err = build_not_found_error(data[0])
     return err, data_build
 
 
+class CommandHandler:
+    """
+    Command handler class. A command bound to the function executing it.
+    The function building the data of the command is bound once, so parsing a line costs a single call.
+    """
+    __slots__ = ("command", "build_data", "execute")
+
+    def __init__(self, command, execute):
+        """
+        :param command: The command (see commands.py) building the data
+        :param execute: Function taking the data built, and executing the command
+        """
+        self.command = command
+        self.build_data = command.build_data
+        self.execute = execute
+
+    def parse(self, tokens: [], data_read: str):
+        """
+        Build the data of the command.
+        :param tokens: The data read split, starting with the command code
+        :param data_read: The data read, used for the error message
+        :return: None, [data] or err_message, None
+        """
+        try:
+            data = self.build_data(tokens)
+        except commands.InvalidDataError as details:
+            return commands.build_error(self.command, data_read, details), None
+        if data is None:
+            return commands.build_error(self.command, data_read), None
+        return None, data
+
+
+class Dispatcher:
+    """
+    Dispatcher class.
+    Map each command code to its handler once, so a line is parsed and dispatched with a single lookup: the line is
+    split once (str.split), then the handler of its code converts the values to their types in one pass (see
+    build_data() in commands.py), without any intermediate list, and executes the command.
+    """
+    def __init__(self, executions: dict):
+        """
+        :param executions: dict of command code: function executing the command, taking the data built.
+        The codes not available in COMMANDS_LIST are ignored.
+        """
+        self._handlers = {code: CommandHandler(COMMANDS_LIST[code], execute)
+                          for code, execute in executions.items() if code in COMMANDS_LIST}
+
+    def get_handler(self, code: str):
+        """Get the handler of a command code, None if not found"""
+        return self._handlers.get(code)
+
+    def parse(self, data_read: str):
+        """
+        Parse a command.
+        :param data_read: The data read. Example: "-l 1 1 0 2"
+        :return: err_message, handler, data<br />err_message is None if the command is valid.
+        """
+        tokens = data_read.split()
+        if len(tokens) == 0:
+            return None, None, None
+
+        handler = self._handlers.get(tokens[0])
+        if handler is None:
+            return build_not_found_error(tokens[0]), None, None
+
+        err, data = handler.parse(tokens, data_read)
+        return err, handler, data
+
+
 def main():
     """Main function"""
     print()
@@ -11,8 +11,19 @@ Contains all commands classes.
 import abc
 from abc import ABC
 
+import numpy as np
+
 import pyplot_utils
 
+BOOLEANS = {"true": True, "True": True, "false": False, "False": False}
+
+
+class InvalidDataError(ValueError):
+    """
+    Invalid data error class.
+    Can be raised by build_data() instead of returning None, to give the details of the invalid data.
+    """
+
 
 class Command(metaclass=abc.ABCMeta):
     """Command class"""
@@ -34,7 +45,11 @@ class Command(metaclass=abc.ABCMeta):
 
     @abc.abstractmethod
     def build_data(self, data):
-        """Return None if the validation has failed, else return a data ready to be used"""
+        """
+        Convert the values of a command to their types, in one pass (see Dispatcher of command_helper.py).
+        :param data: The command split, starting with its code. It isn't modified.
+        :return: None if the validation has failed, else the data ready to be used: the code, then the typed values
+        """
         return None
 
 
@@ -57,8 +72,12 @@ class NewCommand(Command, ABC):
         )
 
     def build_data(self, data):
-        if len(data) == 1 or (len(data) == 2 and parse_bool(data, [1])):
+        if len(data) == 1:
             return data
+        if len(data) == 2:
+            ruf = to_bool(data[1])
+            if ruf is not None:
+                return [data[0], ruf]
         return None
 
 
@@ -79,8 +98,10 @@ class RemoveUnusedFilesCommand(Command, ABC):
         )
 
     def build_data(self, data):
-        if len(data) == 2 and parse_bool(data, [1]):
-            return data
+        if len(data) == 2:
+            ruf = to_bool(data[1])
+            if ruf is not None:
+                return [data[0], ruf]
         return None
 
 
@@ -98,8 +119,7 @@ class SeparatorCommand(Command, ABC):
 
     def build_data(self, data):
         if len(data) == 2:
-            replace_underscore_by_space(data)
-            return data
+            return [data[0], data[1].replace("_", " ")]
         return None
 
 
@@ -117,8 +137,7 @@ class DecimalCharacterCommand(Command, ABC):
 
     def build_data(self, data):
         if len(data) == 2:
-            replace_underscore_by_space(data)
-            return data
+            return [data[0], data[1].replace("_", " ")]
         return None
 
 
@@ -136,11 +155,12 @@ class MaxValueCommand(Command, ABC):
         )
 
     def build_data(self, data):
-        if len(data) == 2 and ((parse_int(data, [1]) and data[1] >= 1) or data[1] == "None"):
-            if data[1] == "None":
-                data[1] = None
-            return data
-        return None
+        if len(data) != 2:
+            return None
+        if data[1] == "None":
+            return [data[0], None]
+        max_values = to_number(data[1])
+        return [data[0], max_values] if max_values is not None else None
 
 
 class AddAxisCommand(Command, ABC):
@@ -161,10 +181,12 @@ class AddAxisCommand(Command, ABC):
         )
 
     def build_data(self, data):
-        if len(data) in range(2, 6) and parse_int(data, [1]) and data[1] >= 111:
-            replace_underscore_by_space(data, [1])
-            return data
-        return None
+        if not 2 <= len(data) <= 5:
+            return None
+        rcp = to_number(data[1], 111)
+        if rcp is None:
+            return None
+        return [data[0], rcp] + [text.replace("_", " ") for text in data[2:]]
 
 
 class AddAxesCommand(Command, ABC):
@@ -173,16 +195,21 @@ class AddAxesCommand(Command, ABC):
         super().__init__(
             name="Add Axes",
             description="Add new several axes.\nSet the grid by row (>= 1) and column (>= 1).\n" +
-                        "The number of axes created is equal to row * column.",
+                        "The number of axes created is equal to row * column.\n" +
+                        "The previous axes and their lines are removed, the window is kept.",
             code="-aas",
             arg="[row:int] [column:int]",
             examples="-aas 2 2   => Adds 4 (2 x 2 = 4) axes arranged in 2 rows and 2 columns"
         )
 
     def build_data(self, data):
-        if len(data) == 3 and parse_int(data, [1, 2]) and data[1] >= 1 and data[2] >= 1:
-            return data
-        return None
+        if len(data) != 3:
+            return None
+        try:
+            data_build = [data[0], int(data[1]), int(data[2])]
+        except ValueError:
+            return None
+        return data_build if data_build[1] >= 1 and data_build[2] >= 1 else None
 
 
 class AxisTitleCommand(Command, ABC):
@@ -199,9 +226,10 @@ class AxisTitleCommand(Command, ABC):
         )
 
     def build_data(self, data):
-        if len(data) == 3 and parse_int(data, [1]) and data[1] >= 1:
-            replace_underscore_by_space(data, [1])
-            return data
+        if len(data) == 3:
+            axis = to_number(data[1])
+            if axis is not None:
+                return [data[0], axis, data[2].replace("_", " ")]
         return None
 
 
@@ -219,9 +247,10 @@ class AxisLabelsCommand(Command, ABC):
         )
 
     def build_data(self, data):
-        if len(data) == 4 and parse_int(data, [1]) and data[1] >= 1:
-            replace_underscore_by_space(data, [1])
-            return data
+        if len(data) == 4:
+            axis = to_number(data[1])
+            if axis is not None:
+                return [data[0], axis, data[2].replace("_", " "), data[3].replace("_", " ")]
         return None
 
 
@@ -231,7 +260,7 @@ class SynchronizeAxesCommand(Command, ABC):
         super().__init__(
             name="Synchronize Axes",
             description="Allow to synchronize the dimension of the abscissa of all specified axes with respect to a reference axis.\n" +
-                        "Set the synchronization time (in seconds) to loop.\n" +
+                        "Set the synchronization time (in seconds): the axes are synchronized each time the reference axis changes, at most once per this time.\n" +
                         "Set it to 0 to do it only once.\n" +
                         "Set it to -1 to stop the loop.\n" +
                         "Axes to synchronize must be different than the reference axis.\n" +
@@ -249,20 +278,17 @@ class SynchronizeAxesCommand(Command, ABC):
         )
 
     def build_data(self, data):
-        if not (len(data) >= 3 and parse_float(data, [1]) and parse_int(data, range(2, len(data))) and data[2] >= 1):
+        if len(data) < 3:
             return None
-
-        if data[1] < 0 and data[1] != -1.0:
+        interval = to_float(data[1])
+        numbers = to_numbers(data[2:])
+        if interval is None or numbers is None or (interval < 0 and interval != -1.0):
             return None
 
-        axes = []
-        for i in range(3, len(data)):
-            if data[i] < 1 or data[i] == data[2]:
-                return None
-            else:
-                axes.append(data[i])
-
-        return [data[0], data[1], data[2], axes]
+        ori_axis, axes = numbers[0], numbers[1:]
+        if ori_axis in axes:
+            return None
+        return [data[0], interval, ori_axis, axes]
 
 
 class ClearAxisCommand(Command, ABC):
@@ -277,8 +303,10 @@ class ClearAxisCommand(Command, ABC):
         )
 
     def build_data(self, data):
-        if len(data) == 2 and parse_int(data, [1]) and data[1] >= 1:
-            return data
+        if len(data) == 2:
+            axis = to_number(data[1])
+            if axis is not None:
+                return [data[0], axis]
         return None
 
 
@@ -294,8 +322,10 @@ class RemoveAxisCommand(Command, ABC):
         )
 
     def build_data(self, data):
-        if len(data) == 2 and parse_int(data, [1]) and data[1] >= 1:
-            return data
+        if len(data) == 2:
+            axis = to_number(data[1])
+            if axis is not None:
+                return [data[0], axis]
         return None
 
 
@@ -323,8 +353,10 @@ class AddLineCommand(Command, ABC):
         )
 
     def build_data(self, data):
-        if len(data) in [2, 3] and parse_int(data, [1]) and data[1] >= 1:
-            return data
+        if len(data) in (2, 3):
+            axis = to_number(data[1])
+            if axis is not None:
+                return [data[0], axis] + data[2:]
         return None
 
 
@@ -342,9 +374,13 @@ class ColorLineCommand(Command, ABC):
         )
 
     def build_data(self, data):
-        if len(data) == 4 and parse_int(data, [1, 2]) and data[1] >= 1 and data[2] >= 1:
-            return data
-        return None
+        if len(data) != 4:
+            return None
+        try:
+            data_build = [data[0], int(data[1]), int(data[2]), data[3]]
+        except ValueError:
+            return None
+        return data_build if data_build[1] >= 1 and data_build[2] >= 1 else None
 
 
 class MarkerLineCommand(Command, ABC):
@@ -365,9 +401,13 @@ class MarkerLineCommand(Command, ABC):
         )
 
     def build_data(self, data):
-        if len(data) == 4 and parse_int(data, [1, 2]) and data[1] >= 1 and data[2] >= 1:
-            return data
-        return None
+        if len(data) != 4:
+            return None
+        try:
+            data_build = [data[0], int(data[1]), int(data[2]), data[3]]
+        except ValueError:
+            return None
+        return data_build if data_build[1] >= 1 and data_build[2] >= 1 else None
 
 
 class StyleLineCommand(Command, ABC):
@@ -396,9 +436,13 @@ class StyleLineCommand(Command, ABC):
         )
 
     def build_data(self, data):
-        if len(data) == 4 and parse_int(data, [1, 2]) and data[1] >= 1 and data[2] >= 1:
-            return data
-        return None
+        if len(data) != 4:
+            return None
+        try:
+            data_build = [data[0], int(data[1]), int(data[2]), data[3]]
+        except ValueError:
+            return None
+        return data_build if data_build[1] >= 1 and data_build[2] >= 1 else None
 
 
 class ClearLineCommand(Command, ABC):
@@ -413,9 +457,13 @@ class ClearLineCommand(Command, ABC):
         )
 
     def build_data(self, data):
-        if len(data) == 3 and parse_int(data, [1, 2]) and data[1] >= 1 and data[2] >= 1:
-            return data
-        return None
+        if len(data) != 3:
+            return None
+        try:
+            data_build = [data[0], int(data[1]), int(data[2])]
+        except ValueError:
+            return None
+        return data_build if data_build[1] >= 1 and data_build[2] >= 1 else None
 
 
 class RemoveLineCommand(Command, ABC):
@@ -430,9 +478,13 @@ class RemoveLineCommand(Command, ABC):
         )
 
     def build_data(self, data):
-        if len(data) == 3 and parse_int(data, [1, 2]) and data[1] >= 1 and data[2] >= 1:
-            return data
-        return None
+        if len(data) != 3:
+            return None
+        try:
+            data_build = [data[0], int(data[1]), int(data[2])]
+        except ValueError:
+            return None
+        return data_build if data_build[1] >= 1 and data_build[2] >= 1 else None
 
 
 class HeaderCommand(Command, ABC):
@@ -452,8 +504,7 @@ class HeaderCommand(Command, ABC):
 
     def build_data(self, data):
         if len(data) >= 2:
-            replace_underscore_by_space(data)
-            return data
+            return [data[0]] + [text.replace("_", " ") for text in data[1:]]
         return None
 
 
@@ -474,8 +525,7 @@ class WriteCommand(Command, ABC):
 
     def build_data(self, data):
         if len(data) >= 2:
-            replace_underscore_by_space(data)
-            return data
+            return [data[0]] + [text.replace("_", " ") for text in data[1:]]
         return None
 
 
@@ -496,24 +546,20 @@ class WriteSeveralCommand(Command, ABC):
         )
 
     def build_data(self, data):
-        length = len(data)
-        if length <= 2:
+        if len(data) <= 2:
             return None
-        else:
-            lines = []
-            line = []
-            for i in range(1, length):
-                if data[i] == ";":
-                    if len(line) > 0:
-                        replace_underscore_by_space(line, skip_0=False)
-                        lines.append(line)
-                        line = []
-                    continue
-                line.append(data[i])
-            if len(line) > 0:
-                replace_underscore_by_space(line, skip_0=False)
-                lines.append(line)
-            return [data[0], lines]
+        lines = []
+        line = []
+        for text in data[1:]:
+            if text == ";":
+                if line:
+                    lines.append(line)
+                    line = []
+            else:
+                line.append(text.replace("_", " "))
+        if line:
+            lines.append(line)
+        return [data[0], lines]
 
 
 class LineCommand(Command, ABC):
@@ -534,13 +580,20 @@ class LineCommand(Command, ABC):
         )
 
     def build_data(self, data):
-        while ";" in data:
-            data.remove(";")
-        length = len(data)
-        if length >= 3 and length % 2 == 1 and parse_int(data, [1, 2]) and data[1] >= 1 and data[
-            2] >= 1 and parse_float(data, range(3, length)):
-            return data
-        return None
+        if len(data) < 3:
+            return None
+        try:
+            axis, line = int(data[1]), int(data[2])
+        except ValueError:
+            return None
+        if axis < 1 or line < 1:
+            return None
+        values = data[3:]
+        if ";" in values:
+            values = [value for value in values if value != ";"]
+        if len(values) % 2 == 1:
+            return None
+        return [data[0], axis, line, parse_pairs(values)]
 
 
 class LineWriteCommand(Command, ABC):
@@ -557,9 +610,15 @@ class LineWriteCommand(Command, ABC):
         )
 
     def build_data(self, data):
-        if len(data) == 5 and parse_int(data, [1, 2]) and parse_float(data, [3, 4]) and data[1] >= 1 and data[2] >= 1:
-            return data
-        return None
+        if len(data) != 5:
+            return None
+        try:
+            axis, line, x, y = int(data[1]), int(data[2]), float(data[3]), float(data[4])
+        except ValueError:
+            return None
+        if axis < 1 or line < 1:
+            return None
+        return [data[0], axis, line, x, y]
 
 
 class LineWriteSeveralCommand(Command, ABC):
@@ -578,30 +637,29 @@ class LineWriteSeveralCommand(Command, ABC):
         )
 
     def build_data(self, data):
-        length = len(data)
-        if not (length >= 3 and parse_int(data, [1, 2]) and data[1] >= 1 and data[2] >= 1):
+        if len(data) < 3:
+            return None
+        try:
+            axis, line = int(data[1]), int(data[2])
+        except ValueError:
             return None
+        if axis < 1 or line < 1:
+            return None
+        values = data[3:]
+        separators = values[2::3]
+        if len(values) % 3 == 2 and separators.count(";") == len(separators) and ";" not in values[0::3] and \
+                ";" not in values[1::3]:
+            # Usual case: x1 y1 ; x2 y2 ; ...
+            del values[2::3]
         else:
-            lines = []
-            line = []
-            for i in range(3, length):
-                if data[i] == ";":
-                    if len(line) > 0:
-                        valid = parse_float(line) and len(line) == 2
-                        if not valid:
-                            return None
-                        lines.append(line)
-                        line = []
-                    continue
-                line.append(data[i])
-
-            if len(line) != 0:
-                valid = parse_float(line) and len(line) == 2
-                if not valid:
-                    return None
-                lines.append(line)
-
-            return [data[0], data[1], data[2], lines]
+            # Each pair must be separated by ";": positions of the separators, including virtual ones at both ends
+            separators = [-1] + [i for i, value in enumerate(values) if value == ";"] + [len(values)]
+            sizes = np.diff(separators) - 1
+            sizes = sizes[sizes != 0]  # several ";" in a row are ignored
+            if np.any(sizes != 2):
+                return None
+            values = [value for value in values if value != ";"]
+        return [data[0], axis, line, parse_pairs(values)]
 
 
 class LineDerivationCommand(Command, ABC):
@@ -621,28 +679,30 @@ class LineDerivationCommand(Command, ABC):
         )
 
     def build_data(self, data):
-        length = len(data)
-        if length == 5:
-            if not (parse_int(data, range(1, 5)) and data[1] >= 1 and data[2] >= 1 and data[3] >= 1 and data[4] >= 1):
-                return None
-        elif length == 6:
-            if not (parse_int(data, range(1, 6)) and data[1] >= 1 and data[2] >= 1 and data[3] >= 1 and data[4] >= 1 and
-                    data[5] >= 0):
-                return None
-        else:
+        if len(data) not in (5, 6):
             return None
-        return data
+        try:
+            data_build = [data[0], *map(int, data[1:])]
+        except ValueError:
+            return None
+        # Axes and lines >= 1, degree >= 0
+        if min(data_build[1:5]) < 1 or len(data_build) == 6 and data_build[5] < 0:
+            return None
+        return data_build
 
 
-def build_error(command, data_read: str):
+def build_error(command, data_read: str, details=None):
     """
     Build the validation error message
     :param command: The command tested
     :param data_read: The string received
+    :param details: Details of the invalid data (see InvalidDataError). None if not available.
     :return: An error message
     """
+    details = f"{details}\n" if details else ""
     return f"Usage: {command.code} {command.arg}\n" \
            f"Given: {data_read}\n" \
+           f"{details}" \
            f"To get more details, use: python command_helper.py -d {command.code[1:]}"
 
 
@@ -660,76 +720,69 @@ def build_details(command, char: str):
            note
 
 
-def replace_underscore_by_space(data: [], index_to_skip=None, skip_0=True):
+def to_bool(text: str):
     """
-    Replace all underscore by a simple space
-    :param data: Array of string.
-    :param index_to_skip: Array of int.
-    :param skip_0: Skip the first element
+    Convert a value to boolean: a non-zero integer, "true" or "True" for True, 0, "false" or "False" for False.
+    :return: The boolean, None if the value is not valid
     """
-    if index_to_skip is None:
-        index_to_skip = []
-    if skip_0:
-        index_to_skip.append(0)
+    try:
+        return bool(int(text))
+    except ValueError:
+        return BOOLEANS.get(text)
 
-    for i in range(len(data)):
-        if i in index_to_skip:
-            continue
-        data[i] = data[i].replace("_", " ")
 
+def to_float(text: str):
+    """Convert a value to float, None if it is not valid"""
+    try:
+        return float(text)
+    except ValueError:
+        return None
 
-def parse_bool(data: [], index=None):
+
+def to_number(text: str, minimum=1):
     """
-    Try to parse values to boolean.
-    :param data: Data to source.
-    :param index: Index to parse. If None, check all the data.
-    :return: True if all is parsed, else False.
+    Convert a number (axis, line, ...) to integer.
+    :param text: The value
+    :param minimum: The minimum valid number
+    :return: The integer, None if the value isn't an integer greater than or equal to minimum
     """
-    if index is None:
-        index = range(0, len(data))
-
-    for i in index:
-        try:
-            data[i] = bool(int(data[i]))
-        except ValueError:
-            if data[i] in ["true", "True", "false", "False"]:
-                data[i] = True if data[i] in ["true", "True"] else False
-            else:
-                return False
-    return True
+    try:
+        number = int(text)
+    except ValueError:
+        return None
+    return number if number >= minimum else None
 
 
-def parse_int(data: [], index=None):
+def to_numbers(texts: [], minimum=1):
     """
-    Try to parse values to integer.
-    :param data: Data to source.
-    :param index: Index to parse. If None, check all the data.
-    :return: True if all is parsed, else False.
+    Convert numbers (axes, lines, ...) to integers, in one pass.
+    :param texts: Array of string
+    :param minimum: The minimum valid number
+    :return: Array of int, None if a value isn't an integer greater than or equal to minimum
     """
-    if index is None:
-        index = range(0, len(data))
-
-    for i in index:
-        try:
-            data[i] = int(data[i])
-        except ValueError:
-            return False
-    return True
+    try:
+        numbers = list(map(int, texts))
+    except ValueError:
+        return None
+    return numbers if min(numbers, default=minimum) >= minimum else None
 
 
-def parse_float(data: [], index=None):
+def parse_pairs(values: []):
     """
-    Try to parse values to float.
-    :param data: Data to source.
-    :param index: Index to parse. If None, check all the data.
-    :return: True if all is parsed, else False.
+    Parse values to float in one pass, and group them by pairs.
+    :param values: Array of string: x1 y1 x2 y2 ... Its length must be even.
+    :return: numpy array of shape (n, 2)
+    :raise InvalidDataError: If some values are not floats, with all the invalid pairs
     """
-    if index is None:
-        index = range(0, len(data))
-
-    for i in index:
-        try:
-            data[i] = float(data[i])
-        except ValueError:
-            return False
-    return True
+    try:
+        return np.array(values, dtype=np.float64).reshape(-1, 2)
+    except ValueError:
+        pass
+
+    # Only when a value is invalid: find all the invalid pairs, to report them at once
+    invalid = []
+    for i in range(0, len(values), 2):
+        pair = values[i:i + 2]
+        if to_float(pair[0]) is None or to_float(pair[1]) is None:
+            invalid.append(f"{i // 2 + 1} ({' '.join(pair)})")
+    raise InvalidDataError(f"Invalid pairs: {', '.join(invalid)}")
@@ -0,0 +1,405 @@
+# -*- coding: utf-8 -*-
+
+"""
+Data writer module
+
+Copyright © 2022 Roman Clavier
+
+Write the rows of a save file without opening and closing the file for each row: the file is kept open, and the
+rows are written by batches, following a flush policy:
+- flush_interval: the rows waiting are written at most this time (in seconds) after the first one. 0 to write each
+  row at once.
+- flush_rows: the rows are written as soon as this number of rows is waiting.
+- flush_bytes: the rows are written as soon as this number of characters is waiting.
+- fsync: if True, the file is also synchronized to the disk at each write, so the rows written survive a power loss.
+
+The files are written by a background thread (see DiskWriter), so a slow disk (network share, antivirus scan, ...)
+never delays the processing of the data received. The files closed can be compressed by another background thread
+(see Compressor), with gzip or lzma.
+"""
+
+import gzip
+import lzma
+import os
+import queue
+import shutil
+import threading
+import time
+
+default_flush_interval = 1.0
+default_flush_rows = 10000
+default_flush_bytes = 256 * 1024
+default_buffer_size = 256 * 1024
+default_queue_size = 10000
+poll_period = 0.05      # time (in seconds) between two checks of the flush interval by the DiskWriter thread
+compression_extensions = {"gzip": ".gz", "lzma": ".xz"}
+
+
+class DataWriter:
+    """
+    Data writer class.
+    Keep a file open in append mode, and write the rows given by batches (see the flush policy of the module).
+    If the file can't be written, a PermissionError (file locked by another program) or a FileNotFoundError (file
+    removed) is raised, and the rows stay waiting: they can be written into another file (see detach() and
+    write_moved()).
+    """
+    def __init__(self, path: str, flush_interval=default_flush_interval, flush_rows=default_flush_rows,
+                 flush_bytes=default_flush_bytes, fsync=False):
+        """
+        :param path: The path of the file
+        :param flush_interval: Maximum time (in seconds) a row waits before being written. 0 to write each row at once.
+        :param flush_rows: Maximum number of rows waiting. None if not limited.
+        :param flush_bytes: Maximum number of characters waiting. None if not limited.
+        :param fsync: If True, the file is synchronized to the disk at each write
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_rows = flush_rows
+        self.flush_bytes = flush_bytes
+        self.fsync = fsync
+        self._file = None
+        self._pending = []
+        self._pending_rows = 0
+        self._pending_size = 0
+        self._flush_time = None     # time when the rows waiting must be written
+        self.written_rows = 0
+        self.flush_count = 0
+
+    @property
+    def pending_count(self):
+        """The number of rows waiting to be written"""
+        return self._pending_rows
+
+    def write(self, data: str, row_count=1):
+        """
+        Add rows. They are written at once if the flush policy requires it.
+        :param data: The text of the rows, with their end of line
+        :param row_count: The number of rows in data
+        """
+        self._pending.append(data)
+        self._pending_rows += row_count
+        self._pending_size += len(data)
+        if self._flush_time is None:
+            self._flush_time = time.monotonic() + self.flush_interval
+
+        if self.flush_interval <= 0 \
+                or (self.flush_rows is not None and self._pending_rows >= self.flush_rows) \
+                or (self.flush_bytes is not None and self._pending_size >= self.flush_bytes):
+            self.flush()
+
+    def poll(self):
+        """Write the rows waiting if the flush interval is elapsed. To call regularly."""
+        if self._flush_time is not None and time.monotonic() >= self._flush_time:
+            self.flush()
+
+    def flush(self):
+        """Write all the rows waiting into the file"""
+        if not self._pending:
+            return
+        if self._file is None:
+            self._file = open(self.path, "a", buffering=default_buffer_size)
+        elif not os.path.exists(self.path):     # removed since opened: the rows would be lost
+            raise FileNotFoundError(f"File removed: {self.path}")
+
+        self._file.write("".join(self._pending))
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+        self.written_rows += self._pending_rows
+        self.flush_count += 1
+        self._pending = []
+        self._pending_rows = 0
+        self._pending_size = 0
+        self._flush_time = None
+
+    def detach(self):
+        """
+        Close the file without writing the rows waiting, when it can't be written anymore.
+        :return: array of tuple (data, row_count) of the rows waiting (see write())
+        """
+        items = [("".join(self._pending), self._pending_rows)] if self._pending else []
+        self._pending = []
+        self._pending_rows = 0
+        self._pending_size = 0
+        self._flush_time = None
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:     # the part of the rows not written yet is returned anyway
+                pass
+            self._file = None
+        return items
+
+    def write_moved(self, items: [], header=None):
+        """
+        Write at once the rows of a file which couldn't be written (see detach())
+        :param items: array of tuple (data, row_count)
+        :param header: The header written first, if the rows don't start with it. None if there isn't any.
+        """
+        data = "".join(data for data, _ in items)
+        if header and not data.startswith(header):
+            data = header + data
+        self.write(data, sum(row_count for _, row_count in items))
+        self.flush()
+
+    def close(self):
+        """Write the rows waiting, and close the file"""
+        try:
+            self.flush()
+        finally:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class DiskWriter(threading.Thread):
+    """
+    Disk writer class.
+    Own the writer of the save files (DataWriter, or ColumnarWriter of columnar.py) in a background thread. The rows
+    given by write() are pushed into a bounded queue: if it is full (the disk is too slow), the rows are dropped and
+    counted, or write() waits for room if block is True. The headers (and the layouts of columnar.py) are never
+    dropped: write() always waits for room for them, as the rows written after them depend on them.
+    If a file can't be written, its rows not written are kept, and new_file_required is set: they are written into
+    the next file given by open().
+    """
+    def __init__(self, flush_interval=default_flush_interval, flush_rows=default_flush_rows,
+                 flush_bytes=default_flush_bytes, fsync=False, queue_size=default_queue_size, block=False,
+                 name="DiskWriter", writer_class=DataWriter):
+        """
+        :param flush_interval: See DataWriter
+        :param flush_rows: See DataWriter
+        :param flush_bytes: See DataWriter
+        :param fsync: See DataWriter
+        :param queue_size: Maximum number of writes waiting (one per call of write())
+        :param block: If True, write() waits for room when the queue is full, instead of dropping the rows
+        :param name: Name of the thread
+        :param writer_class: The class writing a file, taking its path and the flush policy (see DataWriter)
+        """
+        super().__init__(name=name, daemon=True)
+        self.flush_interval = flush_interval
+        self.flush_rows = flush_rows
+        self.flush_bytes = flush_bytes
+        self.fsync = fsync
+        self.block = block
+        self.writer_class = writer_class
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._writer = None
+        self._orphan = []           # (data, row_count) not written into a file which can't be written anymore
+        self._orphan_rows = 0
+        self._requested_file = 0    # number of the last file given by open()
+        self._current_file = 0      # number of the file written by the thread
+        self._failed_file = None    # number of the last file which couldn't be written
+        self._closed_rows = 0       # rows written into the files closed
+        self.error = None           # last error, None if the current file is written
+        self.failure_count = 0      # number of files which couldn't be written since the last successful write
+        self.queued_count = 0
+        self.dropped_count = 0
+
+    @property
+    def written_count(self):
+        """The number of rows written into the files"""
+        writer = self._writer
+        return self._closed_rows + (writer.written_rows if writer else 0)
+
+    @property
+    def orphan_count(self):
+        """The number of rows waiting for a new file, the last one couldn't be written"""
+        return self._orphan_rows
+
+    @property
+    def new_file_required(self):
+        """True if the current file can't be written, and no new file has been given since"""
+        return self._failed_file is not None and self._failed_file == self._requested_file
+
+    def open(self, path: str, header=None, on_closed=None):
+        """
+        Close the current file (its rows waiting are written), and write the next rows into a new one.
+        :param path: The path of the new file
+        :param header: The header (as given to write()) written first into the file if rows of the previous file are
+        moved into it (the previous file couldn't be written). None if there isn't any.
+        :param on_closed: Function called by the thread with the path of the current file, once it is closed (see
+        Compressor.submit()). None if not used. It isn't called if the file can't be written.
+        """
+        self._requested_file += 1
+        self._queue.put(("open", (path, header, self._requested_file, on_closed), 0))
+
+    def write(self, data: str, row_count=1):
+        """
+        Add rows to the current file
+        :param data: The rows, as given to the write() of the writer class: text with the end of lines for DataWriter
+        :param row_count: The number of rows in data, 0 for a header (never dropped)
+        :return: False if the rows have been dropped, the queue being full
+        """
+        try:
+            self._queue.put(("rows", data, row_count), block=self.block or row_count == 0)
+        except queue.Full:
+            self.dropped_count += row_count
+            return False
+        self.queued_count += row_count
+        return True
+
+    def flush(self):
+        """Write all the rows waiting, without waiting for the flush interval"""
+        self._queue.put(("flush", None, 0))
+
+    def run(self):
+        """Write the rows until stop() is called"""
+        while True:
+            try:
+                kind, data, row_count = self._queue.get(timeout=poll_period)
+            except queue.Empty:
+                if self._writer:
+                    self._call(self._writer.poll)
+                continue
+
+            if kind == "stop":
+                break
+            elif kind == "open":
+                self._open(*data)
+            elif kind == "flush":
+                if self._writer:
+                    self._call(self._writer.flush)
+            elif self._writer:
+                self._call(self._writer.write, data, row_count)
+            else:
+                self._orphan.append((data, row_count))
+                self._orphan_rows += row_count
+        self._close_writer()
+
+    def _open(self, path: str, header, file_number: int, on_closed):
+        """Close the current file, and open a new one containing the rows of the previous files not written"""
+        previous_path = self._writer.path if self._writer else None
+        if self._close_writer() and previous_path and on_closed:
+            on_closed(previous_path)
+        self._writer = self.writer_class(path, self.flush_interval, self.flush_rows, self.flush_bytes, self.fsync)
+        self._current_file = file_number
+        if self._orphan:
+            items = self._orphan
+            self._orphan = []
+            self._orphan_rows = 0
+            # written at once, so a new file which can't be written is detected now
+            self._call(self._writer.write_moved, items, header)
+
+    def _call(self, function, *args):
+        """
+        Call a function of the writer. If the file can't be written, its rows waiting are kept for the next file.
+        :return: True if the call succeeded
+        """
+        try:
+            written_count = self._writer.written_rows
+            function(*args)
+        except OSError as err:
+            self._orphan_rows += self._writer.pending_count
+            self._orphan.extend(self._writer.detach())
+            self._closed_rows += self._writer.written_rows
+            self._writer = None
+            self.error = err
+            self.failure_count += 1
+            self._failed_file = self._current_file
+            return False
+        if self._writer.written_rows != written_count:
+            self.error = None
+            self.failure_count = 0
+        return True
+
+    def _close_writer(self):
+        """
+        Write the rows waiting into the current file, and close it
+        :return: True if the file has been closed with all its rows written
+        """
+        if self._writer is None:
+            return False
+        if self._call(self._writer.close):
+            self._closed_rows += self._writer.written_rows
+            self._writer = None
+            return True
+        return False
+
+    def stop(self, timeout=None):
+        """
+        Write all the rows queued, close the file and wait the end of the thread
+        :param timeout: Maximum time to wait (in seconds), None to wait until all the rows are written
+        """
+        if not self.is_alive():
+            return
+        self._queue.put(("stop", None, 0))
+        self.join(timeout)
+
+
+def compress_file(path: str, method="gzip"):
+    """
+    Compress a file, then remove it. The compressed file is written next to the file then renamed, so the file is
+    only removed once its compressed file is complete.
+    :param path: The path of the file
+    :param method: "gzip" or "lzma"
+    :return: The path of the compressed file: the path of the file with the extension .gz (or .xz) added
+    """
+    output_path = path + compression_extensions[method]
+    with open(path, "rb") as source, open(output_path + ".tmp", "wb") as raw:
+        if method == "gzip":
+            target = gzip.GzipFile(os.path.basename(path), "wb", fileobj=raw)
+        else:
+            target = lzma.LZMAFile(raw, "wb")
+        with target:
+            shutil.copyfileobj(source, target, 1024 * 1024)
+    os.replace(output_path + ".tmp", output_path)
+    os.remove(path)
+    return output_path
+
+
+class Compressor(threading.Thread):
+    """
+    Compressor class.
+    Compress the files given by submit() one by one in a background thread (see compress_file()), so compressing a
+    big file never delays the writing of the next rows.
+    """
+    def __init__(self, method="gzip", name="Compressor"):
+        """
+        :param method: "gzip" or "lzma"
+        :param name: Name of the thread
+        """
+        super().__init__(name=name, daemon=True)
+        if method not in compression_extensions:
+            raise ValueError(f"Unknown compression method: {method}. Available: {', '.join(compression_extensions)}")
+        self.method = method
+        self._queue = queue.Queue()
+        self._errors = queue.Queue()
+        self.compressed_count = 0
+
+    def submit(self, path: str):
+        """Give a file to compress. Can be called from any thread."""
+        self._queue.put(path)
+
+    def run(self):
+        """Compress the files until stop() is called"""
+        while True:
+            path = self._queue.get()
+            if path is None:
+                break
+            try:
+                compress_file(path, self.method)
+            except OSError as err:
+                self._errors.put((path, err))
+            else:
+                self.compressed_count += 1
+
+    def pop_errors(self):
+        """
+        Get the errors not returned yet.
+        :return: array of tuple (path, error)
+        """
+        errors = []
+        for _ in range(self._errors.qsize()):
+            errors.append(self._errors.get_nowait())
+        return errors
+
+    def stop(self, timeout=None):
+        """
+        Compress the files waiting, and wait the end of the thread
+        :param timeout: Maximum time to wait (in seconds), None to wait until all the files are compressed
+        """
+        if not self.is_alive():
+            return
+        self._queue.put(None)
+        self.join(timeout)
@@ -0,0 +1,110 @@
+/*
+  Binary frames example.
+
+  Use: python main.py -bin (the baud rate can be detected with: python main.py -bin -br auto)
+
+  Instead of ASCII lines, the data are sent in compact binary frames (see binary_protocol.py).
+  A float is sent in 4 bytes, instead of up to 10 characters, and the computer doesn't need to parse any text.
+
+  Each frame is COBS encoded (Consistent Overhead Byte Stuffing) and terminated by a 0 byte.
+  Once decoded, a frame is composed of a command byte followed by its payload:
+
+  TEXT        [0x01] [ascii command]                  => any ASCII command, example: "-aa 111"
+  LINE        [0x02] [axis] [line] [x1 y1 x2 y2 ...]  => same as -l,   values are float
+  LINE        [0x03] [axis] [line] [x1 y1 x2 y2 ...]  => same as -l,   values are int16_t
+  LINE_WRITE  [0x04] [axis] [line] [x1 y1 x2 y2 ...]  => same as -lws, values are float
+  LINE_WRITE  [0x05] [axis] [line] [x1 y1 x2 y2 ...]  => same as -lws, values are int16_t
+  WRITE       [0x06] [value1 value2 ...]              => same as -w,   values are float
+  WRITE       [0x07] [value1 value2 ...]              => same as -w,   values are int16_t
+
+  Values are little-endian, as on AVR and ARM boards.
+
+  This example draws the sine and writes it into the save file, sending 10 points per frame.
+*/
+
+const byte TEXT_COMMAND = 0x01;
+const byte LINE_FLOAT = 0x02;
+const byte LINE_INT16 = 0x03;
+const byte LINE_WRITE_FLOAT = 0x04;
+const byte LINE_WRITE_INT16 = 0x05;
+const byte WRITE_FLOAT = 0x06;
+const byte WRITE_INT16 = 0x07;
+
+const byte MAX_FRAME_SIZE = 254; // a bigger frame would need a bigger encoding buffer
+
+const byte packetSize = 10; // points per frame
+float points[2 * packetSize];
+byte packetCount;
+unsigned int interval = 10;
+
+void setup() {
+  Serial.begin(115200);
+  while (!Serial);
+  packetCount = 0;
+
+  // The setup commands are still sent as text, in TEXT frames
+  sendText("-n 1");
+  sendText("-h Time_(s) Sine");
+  sendText("-aa 111 Sine X Y");
+  sendText("-al 1");
+  sendText("-ml 1 1 None");
+}
+
+void loop() {
+  float timeElapsed = millis() / 1000.0;
+  points[2 * packetCount] = timeElapsed;
+  points[2 * packetCount + 1] = sin(timeElapsed);
+  packetCount++;
+
+  if (packetCount >= packetSize) {
+    // Draw the points in the line 1 of the axis 1, and write them into the save file
+    sendPoints(LINE_WRITE_FLOAT, 1, 1, points, packetCount);
+    packetCount = 0;
+  }
+  delay(interval);
+}
+
+void sendText(const char* command) {
+  sendFrame(TEXT_COMMAND, (const byte*)command, strlen(command));
+}
+
+void sendPoints(byte commandByte, byte axis, byte line, const float* values, byte pointsCount) {
+  // values: x1 y1 x2 y2 ...
+  byte payload[MAX_FRAME_SIZE - 1];
+  size_t size = 2 * pointsCount * sizeof(float);
+  if (size + 2 > sizeof(payload)) {
+    return;
+  }
+  payload[0] = axis;
+  payload[1] = line;
+  memcpy(payload + 2, values, size);
+  sendFrame(commandByte, payload, size + 2);
+}
+
+void sendFrame(byte commandByte, const byte* payload, size_t size) {
+  // COBS encoding of [commandByte][payload], followed by the 0 delimiter
+  byte encoded[MAX_FRAME_SIZE + 2];
+  size_t length = size + 1;
+  if (length > MAX_FRAME_SIZE) {
+    return;
+  }
+  size_t codeIndex = 0;
+  size_t writeIndex = 1;
+  byte code = 1;
+
+  for (size_t i = 0; i < length; i++) {
+    byte value = (i == 0) ? commandByte : payload[i - 1];
+    if (value == 0) {
+      encoded[codeIndex] = code;
+      codeIndex = writeIndex++;
+      code = 1;
+    }
+    else {
+      encoded[writeIndex++] = value;
+      code++;
+    }
+  }
+  encoded[codeIndex] = code;
+  Serial.write(encoded, writeIndex);
+  Serial.write((byte)0);
+}
@@ -0,0 +1,463 @@
+# -*- coding: utf-8 -*-
+
+"""
+Legacy parsing module
+
+Copyright © 2022 Roman Clavier
+
+The parsing and dispatch of the commands as they were before command_helper.Dispatcher and the typed build_data() of
+commands.py: validation() scanning the command codes, build_data() converting the values in place, then a match on
+the command code. The code is copied unchanged, except the descriptions of the commands, left out: the error messages
+use the ones of command_helper.COMMANDS_LIST.
+Used by benchmark.py as the baseline of the dispatch benchmark. Not used by main.py.
+"""
+
+import abc
+from abc import ABC
+
+import command_helper as helper
+import commands
+
+
+class Command(metaclass=abc.ABCMeta):
+    """Command class"""
+    def build_data(self, data):
+        """Return None if the validation has failed, else return a data ready to be used"""
+        return None
+
+
+class NewCommand(Command, ABC):
+    """New command class"""
+    def build_data(self, data):
+        if len(data) == 1 or (len(data) == 2 and parse_bool(data, [1])):
+            return data
+        return None
+
+
+class RemoveUnusedFilesCommand(Command, ABC):
+    """Remove unused files command class"""
+    def build_data(self, data):
+        if len(data) == 2 and parse_bool(data, [1]):
+            return data
+        return None
+
+
+class SeparatorCommand(Command, ABC):
+    """Separator command class"""
+    def build_data(self, data):
+        if len(data) == 2:
+            replace_underscore_by_space(data)
+            return data
+        return None
+
+
+class DecimalCharacterCommand(Command, ABC):
+    """Decimal character command class"""
+    def build_data(self, data):
+        if len(data) == 2:
+            replace_underscore_by_space(data)
+            return data
+        return None
+
+
+class MaxValueCommand(Command, ABC):
+    """Max value command class"""
+    def build_data(self, data):
+        if len(data) == 2 and ((parse_int(data, [1]) and data[1] >= 1) or data[1] == "None"):
+            if data[1] == "None":
+                data[1] = None
+            return data
+        return None
+
+
+class AddAxisCommand(Command, ABC):
+    """Add axis command class"""
+    def build_data(self, data):
+        if len(data) in range(2, 6) and parse_int(data, [1]) and data[1] >= 111:
+            replace_underscore_by_space(data, [1])
+            return data
+        return None
+
+
+class AddAxesCommand(Command, ABC):
+    """Add axes command class"""
+    def build_data(self, data):
+        if len(data) == 3 and parse_int(data, [1, 2]) and data[1] >= 1 and data[2] >= 1:
+            return data
+        return None
+
+
+class AxisTitleCommand(Command, ABC):
+    """Axis title command class"""
+    def build_data(self, data):
+        if len(data) == 3 and parse_int(data, [1]) and data[1] >= 1:
+            replace_underscore_by_space(data, [1])
+            return data
+        return None
+
+
+class AxisLabelsCommand(Command, ABC):
+    """Axis labels command class"""
+    def build_data(self, data):
+        if len(data) == 4 and parse_int(data, [1]) and data[1] >= 1:
+            replace_underscore_by_space(data, [1])
+            return data
+        return None
+
+
+class SynchronizeAxesCommand(Command, ABC):
+    """Synchronize axes command class"""
+    def build_data(self, data):
+        if not (len(data) >= 3 and parse_float(data, [1]) and parse_int(data, range(2, len(data))) and data[2] >= 1):
+            return None
+
+        if data[1] < 0 and data[1] != -1.0:
+            return None
+
+        axes = []
+        for i in range(3, len(data)):
+            if data[i] < 1 or data[i] == data[2]:
+                return None
+            else:
+                axes.append(data[i])
+
+        return [data[0], data[1], data[2], axes]
+
+
+class ClearAxisCommand(Command, ABC):
+    """Clear axis command class"""
+    def build_data(self, data):
+        if len(data) == 2 and parse_int(data, [1]) and data[1] >= 1:
+            return data
+        return None
+
+
+class RemoveAxisCommand(Command, ABC):
+    """Remove axis command class"""
+    def build_data(self, data):
+        if len(data) == 2 and parse_int(data, [1]) and data[1] >= 1:
+            return data
+        return None
+
+
+class AddLineCommand(Command, ABC):
+    """Add line command class"""
+    def build_data(self, data):
+        if len(data) in [2, 3] and parse_int(data, [1]) and data[1] >= 1:
+            return data
+        return None
+
+
+class ColorLineCommand(Command, ABC):
+    """Color line command class"""
+    def build_data(self, data):
+        if len(data) == 4 and parse_int(data, [1, 2]) and data[1] >= 1 and data[2] >= 1:
+            return data
+        return None
+
+
+class MarkerLineCommand(Command, ABC):
+    """Marker line command class"""
+    def build_data(self, data):
+        if len(data) == 4 and parse_int(data, [1, 2]) and data[1] >= 1 and data[2] >= 1:
+            return data
+        return None
+
+
+class StyleLineCommand(Command, ABC):
+    """Style line command class"""
+    def build_data(self, data):
+        if len(data) == 4 and parse_int(data, [1, 2]) and data[1] >= 1 and data[2] >= 1:
+            return data
+        return None
+
+
+class ClearLineCommand(Command, ABC):
+    """Clear line command class"""
+    def build_data(self, data):
+        if len(data) == 3 and parse_int(data, [1, 2]) and data[1] >= 1 and data[2] >= 1:
+            return data
+        return None
+
+
+class RemoveLineCommand(Command, ABC):
+    """Remove line command class"""
+    def build_data(self, data):
+        if len(data) == 3 and parse_int(data, [1, 2]) and data[1] >= 1 and data[2] >= 1:
+            return data
+        return None
+
+
+class HeaderCommand(Command, ABC):
+    """Header command class"""
+    def build_data(self, data):
+        if len(data) >= 2:
+            replace_underscore_by_space(data)
+            return data
+        return None
+
+
+class WriteCommand(Command, ABC):
+    """Write command class"""
+    def build_data(self, data):
+        if len(data) >= 2:
+            replace_underscore_by_space(data)
+            return data
+        return None
+
+
+class WriteSeveralCommand(Command, ABC):
+    """Write several command class"""
+    def build_data(self, data):
+        length = len(data)
+        if length <= 2:
+            return None
+        else:
+            lines = []
+            line = []
+            for i in range(1, length):
+                if data[i] == ";":
+                    if len(line) > 0:
+                        replace_underscore_by_space(line, skip_0=False)
+                        lines.append(line)
+                        line = []
+                    continue
+                line.append(data[i])
+            if len(line) > 0:
+                replace_underscore_by_space(line, skip_0=False)
+                lines.append(line)
+            return [data[0], lines]
+
+
+class LineCommand(Command, ABC):
+    """Line command class"""
+    def build_data(self, data):
+        while ";" in data:
+            data.remove(";")
+        length = len(data)
+        if length >= 3 and length % 2 == 1 and parse_int(data, [1, 2]) and data[1] >= 1 and data[
+            2] >= 1 and parse_float(data, range(3, length)):
+            return data
+        return None
+
+
+class LineWriteCommand(Command, ABC):
+    """Line Write command class"""
+    def build_data(self, data):
+        if len(data) == 5 and parse_int(data, [1, 2]) and parse_float(data, [3, 4]) and data[1] >= 1 and data[2] >= 1:
+            return data
+        return None
+
+
+class LineWriteSeveralCommand(Command, ABC):
+    """Line Write several command class"""
+    def build_data(self, data):
+        length = len(data)
+        if not (length >= 3 and parse_int(data, [1, 2]) and data[1] >= 1 and data[2] >= 1):
+            return None
+        else:
+            lines = []
+            line = []
+            for i in range(3, length):
+                if data[i] == ";":
+                    if len(line) > 0:
+                        valid = parse_float(line) and len(line) == 2
+                        if not valid:
+                            return None
+                        lines.append(line)
+                        line = []
+                    continue
+                line.append(data[i])
+
+            if len(line) != 0:
+                valid = parse_float(line) and len(line) == 2
+                if not valid:
+                    return None
+                lines.append(line)
+
+            return [data[0], data[1], data[2], lines]
+
+
+class LineDerivationCommand(Command, ABC):
+    """Line derivation command class"""
+    def build_data(self, data):
+        length = len(data)
+        if length == 5:
+            if not (parse_int(data, range(1, 5)) and data[1] >= 1 and data[2] >= 1 and data[3] >= 1 and data[4] >= 1):
+                return None
+        elif length == 6:
+            if not (parse_int(data, range(1, 6)) and data[1] >= 1 and data[2] >= 1 and data[3] >= 1 and data[4] >= 1 and
+                    data[5] >= 0):
+                return None
+        else:
+            return None
+        return data
+
+
+def replace_underscore_by_space(data: [], index_to_skip=None, skip_0=True):
+    """
+    Replace all underscore by a simple space
+    :param data: Array of string.
+    :param index_to_skip: Array of int.
+    :param skip_0: Skip the first element
+    """
+    if index_to_skip is None:
+        index_to_skip = []
+    if skip_0:
+        index_to_skip.append(0)
+
+    for i in range(len(data)):
+        if i in index_to_skip:
+            continue
+        data[i] = data[i].replace("_", " ")
+
+
+def parse_bool(data: [], index=None):
+    """
+    Try to parse values to boolean.
+    :param data: Data to source.
+    :param index: Index to parse. If None, check all the data.
+    :return: True if all is parsed, else False.
+    """
+    if index is None:
+        index = range(0, len(data))
+
+    for i in index:
+        try:
+            data[i] = bool(int(data[i]))
+        except ValueError:
+            if data[i] in ["true", "True", "false", "False"]:
+                data[i] = True if data[i] in ["true", "True"] else False
+            else:
+                return False
+    return True
+
+
+def parse_int(data: [], index=None):
+    """
+    Try to parse values to integer.
+    :param data: Data to source.
+    :param index: Index to parse. If None, check all the data.
+    :return: True if all is parsed, else False.
+    """
+    if index is None:
+        index = range(0, len(data))
+
+    for i in index:
+        try:
+            data[i] = int(data[i])
+        except ValueError:
+            return False
+    return True
+
+
+def parse_float(data: [], index=None):
+    """
+    Try to parse values to float.
+    :param data: Data to source.
+    :param index: Index to parse. If None, check all the data.
+    :return: True if all is parsed, else False.
+    """
+    if index is None:
+        index = range(0, len(data))
+
+    for i in index:
+        try:
+            data[i] = float(data[i])
+        except ValueError:
+            return False
+    return True
+
+
+COMMANDS_LIST = {
+    "-n": NewCommand(),
+    "-ruf": RemoveUnusedFilesCommand(),
+    "-s": SeparatorCommand(),
+    "-dc": DecimalCharacterCommand(),
+    "-mv": MaxValueCommand(),
+    "-aa": AddAxisCommand(),
+    "-aas": AddAxesCommand(),
+    "-at": AxisTitleCommand(),
+    "-albl": AxisLabelsCommand(),
+    # "-sa": SynchronizeAxesCommand(),
+    "-clra": ClearAxisCommand(),
+    "-ra": RemoveAxisCommand(),
+    "-al": AddLineCommand(),
+    "-cl": ColorLineCommand(),
+    "-ml": MarkerLineCommand(),
+    "-sl": StyleLineCommand(),
+    "-clrl": ClearLineCommand(),
+    "-rl": RemoveLineCommand(),
+    "-h": HeaderCommand(),
+    "-w": WriteCommand(),
+    "-ws": WriteSeveralCommand(),
+    "-l": LineCommand(),
+    "-lw": LineWriteCommand(),
+    "-lws": LineWriteSeveralCommand(),
+    "-ld": LineDerivationCommand()
+}
+
+
+def get_command_codes(with_dashes=True):
+    """
+    Get the available command codes
+    :param with_dashes: If True, returns ['-n', '-ruf', ...]', else ['n', 'ruf', ...]
+    """
+    return COMMANDS_LIST.keys() if with_dashes else list(map(lambda x: x[1:], COMMANDS_LIST.keys()))
+
+
+def validation(data_read: str):
+    """
+    Check if a command is valid.
+    :return: None, [data] or err_message, None<br />A string corresponding to an error message if the data read is not valid, and an array with data already sorted.
+    """
+    data = data_read.split()
+    err = None
+    if len(data) == 0:
+        return err, None
+    data_build = None
+
+    if data[0] in get_command_codes():
+        data_build = COMMANDS_LIST[data[0]].build_data(data)
+        if data_build is None:
+            err = commands.build_error(helper.COMMANDS_LIST[data[0]], data_read)
+    else:
+        err = f"Command not found: {data[0]}\nTo get the available commands, use: python command_helper.py -l"
+    return err, data_build
+
+
+def dispatch(data_read: str):
+    """
+    Parse and dispatch a command as main.py did, the commands executing nothing.
+    :return: The data built, None if the command is not valid
+    """
+    err, data = validation(data_read)
+    if err is not None or data is None:
+        return None
+
+    match data[0]:
+        case "-n": pass
+        case "-ruf": pass
+        case "-s": pass
+        case "-dc": pass
+        case "-mv": pass
+        case "-aa": pass
+        case "-aas": pass
+        case "-at": pass
+        case "-albl": pass
+        case "-clra": pass
+        case "-ra": pass
+        case "-al": pass
+        case "-cl": pass
+        case "-ml": pass
+        case "-sl": pass
+        case "-clrl": pass
+        case "-rl": pass
+        case "-h": pass
+        case "-w": pass
+        case "-ws": pass
+        case "-l": pass
+        case "-lw": pass
+        case "-lws": pass
+        case "-ld": pass
+    return data
@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+
+"""
+Line buffer module
+
+Copyright © 2022 Roman Clavier
+
+Store the values of a line in preallocated numpy arrays, so adding values doesn't copy the whole history.
+"""
+
+import numpy as np
+
+default_capacity = 1024
+
+
+class SlidingMaximum:
+    """
+    Sliding maximum class.
+    Give the maximum of the last values added in O(1), using a monotonic queue: only the values that can still become
+    the maximum, once the older values are dropped, are kept (their values are strictly decreasing).
+    Each value is added and removed once, so the cost is O(1) amortized per value.
+    """
+    def __init__(self, capacity=64):
+        self._indexes = np.empty(capacity, dtype=np.int64)
+        self._values = np.empty(capacity)
+        self._start = 0
+        self._end = 0
+        self.next_index = 0     # index of the next value added
+
+    def __len__(self):
+        return self._end - self._start
+
+    def push(self, values):
+        """
+        Add values.
+        :param values: numpy array of float. The non-finite values (NaN, inf and -inf) are ignored.
+        """
+        count = len(values)
+        if count == 1:
+            self._push_one(values[0])
+            return
+        if count == 0:
+            return
+        indexes = np.arange(self.next_index, self.next_index + count)
+        self.next_index += count
+        if not np.isfinite(values).all():
+            values = np.where(np.isfinite(values), values, np.nan)     # ignored as NaN values
+
+        # Only the values greater than all the next ones of the array can become the maximum
+        next_maximums = np.empty(count)
+        next_maximums[:-1] = np.fmax.accumulate(values[:0:-1])[::-1]
+        next_maximums[-1] = -np.inf
+        next_maximums[np.isnan(next_maximums)] = -np.inf   # only NaN values after
+        candidates = values > next_maximums
+        indexes = indexes[candidates]
+        values = values[candidates]
+        if len(values) == 0:
+            return
+
+        # The queued values lower or equal to the new maximum can't become the maximum anymore
+        self._end = self._start + np.searchsorted(-self._values[self._start:self._end], -values[0], side="left")
+        self._reserve(len(values))
+        self._indexes[self._end:self._end + len(values)] = indexes
+        self._values[self._end:self._end + len(values)] = values
+        self._end += len(values)
+
+    def _push_one(self, value):
+        """Add one value, without the overhead of the numpy functions"""
+        index = self.next_index
+        self.next_index += 1
+        if not -np.inf < value < np.inf:    # NaN, inf or -inf
+            return
+        while self._end > self._start and self._values[self._end - 1] <= value:
+            self._end -= 1
+        self._reserve(1)
+        self._indexes[self._end] = index
+        self._values[self._end] = value
+        self._end += 1
+
+    def _reserve(self, count: int):
+        """Make room for count values at the end of the arrays"""
+        if self._end + count <= len(self._values):
+            return
+        kept = len(self)
+        capacity = len(self._values) if 2 * (kept + count) <= len(self._values) else 2 * (kept + count)
+        queued_indexes = self._indexes[self._start:self._end]
+        queued_values = self._values[self._start:self._end]
+        if capacity != len(self._values):
+            self._indexes = np.empty(capacity, dtype=np.int64)
+            self._values = np.empty(capacity)
+        self._indexes[:kept] = queued_indexes
+        self._values[:kept] = queued_values
+        self._start = 0
+        self._end = kept
+
+    def drop_before(self, index: int):
+        """Forget the values added before the given index"""
+        self._start += np.searchsorted(self._indexes[self._start:self._end], index, side="left")
+
+    def clear(self):
+        """Forget all the values"""
+        self._start = 0
+        self._end = 0
+
+    def get(self):
+        """Get the maximum, None if there is no value"""
+        return self._values[self._start] if self._end > self._start else None
+
+
+class LineBuffer:
+    """
+    Line buffer class.
+    The values are written one after the other in preallocated arrays, and the oldest ones are dropped by moving the
+    start index. When the end of the arrays is reached, the values kept are moved back to the beginning (or the arrays
+    are enlarged if they are more than half full), so adding values costs O(1) amortized.
+    The values are always contiguous: get_data() returns views of the arrays, without any copy.
+    The bounds of the values kept are tracked incrementally (see SlidingMaximum), so get_bounds() costs O(1).
+    """
+    def __init__(self, x=None, y=None, capacity=default_capacity):
+        """
+        :param x: Initial x values. None if empty.
+        :param y: Initial y values. None if empty.
+        :param capacity: Initial number of values the buffer can store before being enlarged
+        """
+        self._x = np.empty(capacity)
+        self._y = np.empty(capacity)
+        self._start = 0
+        self._end = 0
+        # Maximums of x, -x, y and -y. They are updated by get_bounds(), with all the values added since its last call.
+        self._maximums = [SlidingMaximum() for _ in range(4)]
+        self._total_count = 0   # number of values added since the creation
+        self._unsorted_index = -1   # index (see _total_count) of the last x lower than the previous one
+        self.clear_count = 0    # number of calls of clear()
+        if x is not None and len(x) > 0:
+            self.append(x, y)
+
+    def __len__(self):
+        return self._end - self._start
+
+    @property
+    def total_count(self):
+        """The number of values added since the creation of the buffer, including the ones dropped"""
+        return self._total_count
+
+    @property
+    def capacity(self):
+        """The number of values the arrays can store"""
+        return len(self._x)
+
+    def append(self, x, y, max_values=None):
+        """
+        Add values.
+        :param x: float or array of float
+        :param y: float or array of float
+        :param max_values: Maximum number of values kept, the oldest ones are dropped. None if not limited.
+        """
+        x = np.asarray(x, dtype=np.float64).ravel()
+        y = np.asarray(y, dtype=np.float64).ravel()
+        count = len(x)
+        if max_values is not None and count >= max_values:
+            x = x[-max_values:]
+            y = y[-max_values:]
+            count = max_values
+
+        if count > 0:
+            self._track_order(x)
+
+        # Drop the oldest values
+        kept = len(self)
+        if max_values is not None:
+            kept = min(kept, max_values - count)
+        self._start = self._end - kept
+
+        if self._end + count > self.capacity:
+            self._reserve(kept + count)
+
+        self._x[self._end:self._end + count] = x
+        self._y[self._end:self._end + count] = y
+        self._end += count
+
+        self._total_count += count
+
+    def _track_order(self, x):
+        """Remember the last x lower than the previous one, to know if the x values are sorted"""
+        if len(self) > 0 and x[0] < self._x[self._end - 1]:
+            self._unsorted_index = self._total_count
+        if len(x) > 1:
+            decreasing = np.flatnonzero(x[1:] < x[:-1])
+            if len(decreasing) > 0:
+                self._unsorted_index = self._total_count + decreasing[-1] + 1
+
+    def is_sorted(self):
+        """True if the x values are in ascending order (as for a time series)"""
+        # sorted if the value lower than the previous one is not in the buffer, or is the first one
+        return self._unsorted_index <= self._total_count - len(self)
+
+    def _reserve(self, size: int):
+        """Move the values back to the beginning of the arrays, enlarged if they can't store twice the given size"""
+        kept = len(self)
+        if 2 * size > self.capacity:
+            capacity = max(2 * size, default_capacity)
+            x = np.empty(capacity)
+            y = np.empty(capacity)
+            x[:kept] = self._x[self._start:self._end]
+            y[:kept] = self._y[self._start:self._end]
+            self._x = x
+            self._y = y
+        else:
+            self._x[:kept] = self._x[self._start:self._end]
+            self._y[:kept] = self._y[self._start:self._end]
+        self._start = 0
+        self._end = kept
+
+    def clear(self):
+        """Remove all the values. The arrays are kept."""
+        self._start = 0
+        self._end = 0
+        self.clear_count += 1
+        for maximum in self._maximums:
+            maximum.clear()
+            maximum.next_index = self._total_count
+
+    def get_bounds(self):
+        """
+        Get the bounds of the values (the non-finite values are ignored: they can't be limits of an axis).
+        The values added since the last call are taken into account at once: calling it once per frame costs O(1)
+        amortized per value, using vectorized operations.
+        :return: tuple (x_min, x_max, y_min, y_max), None if there is no value
+        """
+        new_count = self._total_count - self._maximums[0].next_index
+        if new_count > 0:
+            pending = min(new_count, len(self))   # the values already dropped are skipped
+            x = self._x[self._end - pending:self._end]
+            y = self._y[self._end - pending:self._end]
+            for maximum, values in zip(self._maximums, (x, -x, y, -y)):
+                maximum.next_index += new_count - pending
+                maximum.push(values)
+        for maximum in self._maximums:
+            maximum.drop_before(self._total_count - len(self))
+        x_max, x_min, y_max, y_min = (maximum.get() for maximum in self._maximums)
+        if x_max is None or y_max is None:
+            return None
+        return -x_min, x_max, -y_min, y_max
+
+    def get_xdata(self):
+        """Get a view of the x values"""
+        return self._x[self._start:self._end]
+
+    def get_ydata(self):
+        """Get a view of the y values"""
+        return self._y[self._start:self._end]
+
+    def get_data(self):
+        """Get views of the x and y values"""
+        return self.get_xdata(), self.get_ydata()
+
+
+def get_derivatives(x_data, y_data, degree=1):
+    """
+    Get all the derived values, computed with vectorized operations. The derivative of degree n at a point is the
+    difference between the derivatives of degree n - 1 at this point and at the previous one, divided by the
+    difference between their x values (backward differences).
+    :param x_data: numpy array of the x values
+    :param y_data: numpy array of the y values
+    :param degree: The degree of derivation
+    :return: The x values of the derived points (x_data[degree:]) and the derived values
+    """
+    if degree < 0:
+        raise ValueError("Degree is positive or null : *degree* >= 0")
+    if len(x_data) <= degree:
+        return np.empty(0), np.empty(0)
+
+    values = y_data
+    if degree > 0:
+        dx = x_data[1:] - x_data[:-1]
+        for level in range(degree):
+            # values are the derived values of degree "level" at x_data[level:]
+            values = (values[1:] - values[:-1]) / dx[level:]
+    return x_data[degree:], values
+
+
+class DerivativeStream:
+    """
+    Derivative stream class.
+    Compute the derivative of a line incrementally: only the values added to the original buffer since the last update
+    are derived, in one vectorized pass. Only the last *degree* original values are kept between two updates, to
+    derive the next ones.
+    """
+    def __init__(self, ori_buffer: LineBuffer, degree: int):
+        self.ori_buffer = ori_buffer
+        self.degree = degree
+        self._x = np.empty(0)           # last original values, needed to derive the next ones
+        self._y = np.empty(0)
+        self._next_index = None         # index (see LineBuffer.total_count) of the next original value to derive
+        self._ori_clear_count = ori_buffer.clear_count
+        self._derived_clear_count = None
+
+    def update(self, derived_buffer: LineBuffer):
+        """
+        Derive the new original values. If the original buffer has been cleared, the derived buffer is cleared too.
+        :param derived_buffer: The buffer receiving the derived values
+        :return: True if the derived buffer has been cleared, and the x and y values to add to it
+        """
+        cleared = False
+        if self.ori_buffer.clear_count != self._ori_clear_count:
+            self._ori_clear_count = self.ori_buffer.clear_count
+            derived_buffer.clear()
+            cleared = True
+        if derived_buffer.clear_count != self._derived_clear_count:    # the derived values are all derived again
+            self._derived_clear_count = derived_buffer.clear_count
+            self._next_index = None
+
+        ori_buffer = self.ori_buffer
+        first_index = ori_buffer.total_count - len(ori_buffer)
+        if self._next_index is None or self._next_index < first_index:  # start, or values dropped before derived
+            self._x = np.empty(0)
+            self._y = np.empty(0)
+            self._next_index = first_index
+
+        new_count = ori_buffer.total_count - self._next_index
+        if new_count == 0:
+            return cleared, self._x[:0], self._y[:0]
+        self._next_index = ori_buffer.total_count
+
+        ori_xdata, ori_ydata = ori_buffer.get_data()
+        x_data = np.concatenate((self._x, ori_xdata[-new_count:]))
+        y_data = np.concatenate((self._y, ori_ydata[-new_count:]))
+        new_x, new_y = get_derivatives(x_data, y_data, self.degree)
+
+        # Less than degree values buffered: keep all of them, no derived value yet
+        keep = max(len(x_data) - self.degree, 0) if self.degree > 0 else len(x_data)
+        self._x = x_data[keep:]
+        self._y = y_data[keep:]
+        return cleared, new_x, new_y
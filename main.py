@@ -11,6 +11,7 @@ Python describing
 from datetime import datetime
 import time
 import os
+import shutil
 import signal
 import argparse
 
@@ -21,83 +22,96 @@ import tools
 
 global run
 global display_elapsed_time
-global fig
 
-global is_connected
-global serial_port
+global queue_size
+global bulk_read
+global baud_rate
+global binary_mode
 global com_ports
-global com_ports_index
 global port_delay
-global last_read_data_time
-global on_close_id
+global record_path
+global replay_exit
+global discovery
+global vid_pids
+global port_patterns
+global flush_interval
+global flush_rows
+global flush_bytes
+global fsync_data
+global write_queue_size
+global write_block
+global columnar_format
+global rotate_size
+global rotate_rows
+global rotate_time
+global compression
 
 global base_path
-global file_path
-global created_files
-global update_title_requested
-global last_header
-global all_headers
+global utils
 
-global remove_unused_files
-global separator
-global max_values
-global decimal_character
-global axes_synchronizer
+window_title = "Real time data visualizer"
 
 
 def main():
     """The main function"""
     global run
     global display_elapsed_time
-    global fig
 
-    global is_connected
-    global serial_port
+    global queue_size
+    global bulk_read
+    global baud_rate
+    global binary_mode
     global com_ports
-    global com_ports_index
     global port_delay
-    global last_read_data_time
-    global on_close_id
+    global record_path
+    global replay_exit
+    global discovery
+    global vid_pids
+    global port_patterns
+    global flush_interval
+    global flush_rows
+    global flush_bytes
+    global fsync_data
+    global write_queue_size
+    global write_block
+    global columnar_format
+    global rotate_size
+    global rotate_rows
+    global rotate_time
+    global compression
 
     global base_path
-    global file_path
-    global created_files
-    global update_title_requested
-    global last_header
-    global all_headers
-
-    global remove_unused_files
-    global separator
-    global max_values
-    global decimal_character
-    global axes_synchronizer
+    global utils
 
     args = parser.parse_args()
 
     run = True
     display_elapsed_time = False
-    fig = None
 
-    is_connected = False
-    serial_port = None
+    queue_size = serial_utils.default_queue_size
+    bulk_read = False
+    baud_rate = serial_utils.default_baud_rate
+    binary_mode = False
     com_ports = []
-    com_ports_index = 0
     port_delay = None
-    last_read_data_time = 0
-    on_close_id = None
+    record_path = None
+    replay_exit = False
+    discovery = False
+    vid_pids = []
+    port_patterns = []
+    flush_interval = data_writer.default_flush_interval
+    flush_rows = data_writer.default_flush_rows
+    flush_bytes = data_writer.default_flush_bytes
+    fsync_data = False
+    write_queue_size = data_writer.default_queue_size
+    write_block = False
+    columnar_format = False
+    rotate_size = None
+    rotate_rows = None
+    rotate_time = None
+    compression = None
 
     base_path = os.path.join(os.getcwd(), "data")
-    file_path = ""
-    created_files = []
-    update_title_requested = False
-    last_header = []
-    all_headers = []
-
-    remove_unused_files = False
-    max_values = None
-    separator = ";"
-    decimal_character = "."
-    axes_synchronizer = []
 
     print()
 
@@ -108,12 +122,25 @@ def main():
     if args.file:
         get_ports(args.file)
 
-    if len(com_ports) == 0:
+    if args.vid_pid or args.match:
+        args.discover = True
+
+    if args.discover:
+        discovery = True
+        port_patterns = args.match or []
+        try:
+            vid_pids = [serial_utils.parse_vid_pid(item) for item in args.vid_pid or []]
+        except ValueError:
+            print(f"The USB ids must be given in hexadecimal as VID:PID or VID. Given: {' '.join(args.vid_pid)}")
+            input("Please press the Enter key to exit")
+            exit(-1)
+
+    if len(com_ports) == 0 and not args.replay and not discovery:
         # print("No communication port specified.\n"
         #      "Try to read the ports.txt file.")
         get_ports("ports.txt")
 
-    if len(com_ports) == 0:
+    if len(com_ports) == 0 and not args.replay and not discovery:
         print("No communication port selected.\n"
               "To specify it (or them), you can:\n"
               "- create the file ports.txt and write the available ports you want\n"
@@ -121,6 +148,10 @@ def main():
         tools.exit_program()
 
     if args.delay is not None:
+        if args.multi:
+            print("The communication port delay can't be used with the multi-board mode.")
+            input("Please press the Enter key to exit")
+            exit(-1)
         if args.delay > 0:
             port_delay = args.delay
         else:
@@ -131,43 +162,174 @@ def main():
     if args.timer:
         display_elapsed_time = True
 
-    print("Available ports selected:")
-    for port in com_ports:
-        print(port)
-    print()
+    if args.queue_size is not None:
+        if args.queue_size > 0:
+            queue_size = args.queue_size
+        else:
+            print(f"The queue size must be a non-null positive integer. Given: {args.queue_size}")
+            input("Please press the Enter key to exit")
+            exit(-1)
 
-    while run:
-        if not is_connected:
-            if fig:
-                close_fig()
+    if args.bulk:
+        bulk_read = True
 
-            if serial_port:
-                disconnect()
+    if args.binary:
+        binary_mode = True
 
-            if com_ports_index >= len(com_ports) or com_ports_index < 0:
-                com_ports_index = 0
+    if args.baud is not None:
+        if args.baud == "auto":
+            baud_rate = None
+        elif args.baud.isdigit() and int(args.baud) > 0:
+            baud_rate = int(args.baud)
+        else:
+            print(f"The baud rate must be a non-null positive integer or \"auto\". Given: {args.baud}")
+            input("Please press the Enter key to exit")
+            exit(-1)
 
-            if connect(com_ports[com_ports_index]):
-                last_read_data_time = time.time()
-            else:
-                com_ports_index += 1
+    if args.speed is not None and args.speed < 0:
+        print(f"The replay speed must be a positive number. Given: {args.speed}")
+        input("Please press the Enter key to exit")
+        exit(-1)
+
+    if args.record:
+        record_path = args.record
+
+    if args.no_blit:
+        utils.scheduler.blit = False
+
+    if args.no_decimation:
+        utils.scheduler.level_of_detail.enabled = False
+
+    if args.fps is not None:
+        if args.fps >= 0:
+            utils.scheduler.fps = args.fps
         else:
-            read()
-        if fig:
-            utils.refresh_plot(fig, 0.01)
+            print(f"The frame rate must be a positive number. Given: {args.fps}")
+            input("Please press the Enter key to exit")
+            exit(-1)
 
-    disconnect()
-    close_fig()
+    if args.columnar:
+        columnar_format = True
+        # Each flush writes a chunk of the recording
+        flush_interval = columnar.default_flush_interval
+        flush_rows = columnar.default_flush_rows
 
-    if remove_unused_files:
-        for filepath in created_files:
-            if os.path.getsize(filepath) == 0:
-                os.remove(filepath)
-            else:
-                with open(filepath, "r") as file:
-                    content = file.readlines()
-                if len(content) == 1 and content[0] in all_headers:
-                    os.remove(filepath)
+    if args.flush_interval is not None:
+        if args.flush_interval >= 0:
+            flush_interval = args.flush_interval
+        else:
+            print(f"The flush interval must be a positive number. Given: {args.flush_interval}")
+            input("Please press the Enter key to exit")
+            exit(-1)
+
+    for value, name in ((args.flush_rows, "number of rows"), (args.flush_bytes, "number of characters")):
+        if value is not None and value < 1:
+            print(f"The {name} waiting must be a non-null positive number. Given: {value}")
+            input("Please press the Enter key to exit")
+            exit(-1)
+    if args.flush_rows is not None:
+        flush_rows = args.flush_rows
+    if args.flush_bytes is not None:
+        flush_bytes = args.flush_bytes
+    fsync_data = args.fsync
+
+    if args.write_queue_size is not None:
+        if args.write_queue_size > 0:
+            write_queue_size = args.write_queue_size
+        else:
+            print(f"The writing queue size must be a non-null positive integer. Given: {args.write_queue_size}")
+            input("Please press the Enter key to exit")
+            exit(-1)
+    write_block = args.write_block
+
+    for value, name in ((args.rotate_size, "size"), (args.rotate_rows, "number of rows"),
+                        (args.rotate_time, "time")):
+        if value is not None and value <= 0:
+            print(f"The {name} of the save files must be a non-null positive number. Given: {value}")
+            input("Please press the Enter key to exit")
+            exit(-1)
+    if args.rotate_size is not None:
+        rotate_size = int(args.rotate_size * 1e6)
+    rotate_rows = args.rotate_rows
+    rotate_time = args.rotate_time
+    compression = args.compress
+
+    if args.no_render:
+        if args.snapshot:
+            print("The snapshots (-snap option) can't be saved without rendering (-nr option).")
+            input("Please press the Enter key to exit")
+            exit(-1)
+        utils = null_backend
+
+    if args.snapshot:
+        args.headless = True
+
+    snapshotter = None
+    if args.headless and not args.no_render:
+        utils.set_headless()
+        if args.snapshot:
+            interval = args.snapshot_interval if args.snapshot_interval is not None else snapshot.default_interval
+            if interval <= 0:
+                print(f"The snapshot interval must be a non-null positive number. Given: {interval}")
+                input("Please press the Enter key to exit")
+                exit(-1)
+            snapshotter = snapshot.Snapshotter(args.snapshot, utils.render_image, interval)
+
+    if args.replay_exit:
+        replay_exit = True
+
+    if discovery and args.multi:
+        # The boards connected now are used
+        for port in serial_utils.find_ports(vid_pids, port_patterns):
+            if port not in com_ports:
+                com_ports.append(port)
+
+    if not args.replay:
+        print("Available ports selected:" if com_ports else "Available ports selected: none yet")
+        for port in com_ports:
+            print(port)
+        if discovery and not args.multi:
+            print("The ports found on the computer are also probed at each connection attempt.")
+        print()
+
+    if args.replay:
+        session = Session([])
+        try:
+            session.open_replay(args.replay, args.speed if args.speed is not None else 1.0)
+        except (OSError, ValueError) as err:
+            print(f"{type(err).__name__}: {err}")
+            input("Please press the Enter key to exit")
+            exit(-1)
+        sessions = [session]
+
+    elif args.multi:
+        # One session per board, all connected at the same time
+        sessions = [Session([port], port) for port in com_ports]
+    else:
+        # One session trying each port until it succeeds
+        sessions = [Session(com_ports, discover=discovery)]
+
+    while run:
+        for session in sessions:
+            session.update()
+            session.renderer.sync()
+
+        if snapshotter:
+            snapshotter.update([session.fig for session in sessions])
+            for path, err in snapshotter.pop_errors():
+                log(f"Snapshot {path}: {type(err).__name__}: {err}")
+        if not utils.headless:
+            utils.render([session.fig for session in sessions if session.fig])
+        time.sleep(0.01)
+
+    if snapshotter:
+        # The last values received are also saved
+        snapshotter.update([session.fig for session in sessions], force=True)
+        for path, saved_count, dropped_count in snapshotter.close():
+            log(f"Snapshots saved: {path} ({saved_count} images, {dropped_count} dropped)")
+
+    for session in sessions:
+        session.close()
 
 
 def on_close(event):
@@ -197,228 +359,31 @@ def get_ports(filepath):
         print(f"File not found: {filepath}")
 
 
-def connect(com_name, baud_rate=9600, timeout=0.01):
-    """
-    Try to connect with the arduino
-    :param com_name: Name of communication port
-    :param baud_rate: Communication's frequency
-    :param timeout: Timer before continue
-    :return: void
-    """
-    global is_connected
-    global serial_port
-
-    try:
-        serial_port = serial.Serial(com_name, baudrate=baud_rate, timeout=timeout)
-        is_connected = True
-        print(f"Connection success to: {serial_port.name} at baud rate: {serial_port.baudrate}\n")
-    except serial.SerialException:
-        is_connected = False
-        print(f"Connection failed to: {com_name}")
-        time.sleep(1)
-    return is_connected
-
-
-def disconnect():
-    """Disconnect serial_port"""
-    global serial_port
-    if serial_port:
-        print(f"\nClosing serial port: {serial_port.name}\n")
-        serial_port.close()
-        serial_port = None
-
-
-def read():
-    """
-    Read data from Arduino card
-    """
-    global display_elapsed_time
-    global fig
-
-    global is_connected
-    global serial_port
-    global com_ports_index
-    global port_delay
-    global last_read_data_time
-
-    global file_path
-    global remove_unused_files
-    global last_header
-
-    global update_title_requested
-    global max_values
-    global separator
-    global decimal_character
-    global axes_synchronizer
-
+def is_valid_line(data_read: bytes):
+    """Check if a raw line received is a valid command"""
     try:
-        data_read = serial_port.readline()
-
-    except serial.SerialException as err:
-        is_connected = False
-        log(f"{type(err).__name__}: {err}")
-        return
-
-    if not data_read:
-        if port_delay and time.time() - last_read_data_time > port_delay:
-            is_connected = False
-            com_ports_index += 1
-        return
-    else:
-        last_read_data_time = time.time()
-
-    for synchronizer in axes_synchronizer:
-        synchronizer.try_synchronize()
+        data_decoded = data_read.decode("ascii").strip()
+    except UnicodeDecodeError:
+        return False
+    return data_decoded.startswith("-") and helper.validation(data_decoded)[0] is None
 
-    data_decoded = data_read.decode("ascii").strip()
-    if len(data_decoded) == 0:
-        return
-
-    if data_decoded[0] == "-":
-        err, data = helper.validation(data_decoded)
-        if not file_path and data[0] != "-n":
-            print("Not initialized")
-            return
-    else:
-        log(data_decoded)
-        return
 
+def is_valid_frame(frame: bytes):
+    """Check if a raw binary frame received is a valid command"""
+    err, data = binary_protocol.decode_frame(frame)
     if err:
-        print(f"Error:\n{err}\n")
-        return
-
-    if len(data) == 0:
-        return
-
-    match data[0]:
-        case "-n":
-            if len(data) == 2:
-                remove_unused_files = data[1]
-
-            utils.init_plot()
-
-            if fig:
-                utils.clear_fig(fig)
-            create_file()
-
-        case "-ruf":
-            remove_unused_files = data[1]
-
-        case "-s":
-            separator = data[1]
-
-        case "-dc":
-            decimal_character = data[1]
-
-        case "-mv":
-            max_values = data[1]
-
-        case "-aa":
-            pos = data[1]
-            title = data[2] if len(data) >= 3 else None
-            x_label = data[3] if len(data) >= 4 else None
-            y_label = data[4] if len(data) >= 5 else None
-            add_axis(pos, title, x_label, y_label)
-
-        case "-aas":
-            add_multi_axis(data[1], data[2])
-
-        case "-at":
-            utils.set_axis_title(get_axis(fig, data[1]), data[2])
-
-        case "-albl":
-            utils.set_axis_label(get_axis(fig, data[1]), data[2], data[3])
-
-        case "-sa":
-            ori_axis = get_axis(fig, data[2])
-            if data[1] == -1:
-                remove_synchronizer_on(ori_axis)
-            else:
-                axes_index = data[3] if len(data[3]) != 0 else list(range(1, len(fig.axes) + 1)).remove(data[2])
-                axes = []
-                for i in axes_index:
-                    axes.append(get_axis(fig, i))
-
-                if data[1] == 0:
-                    utils.synchronize_axes(ori_axis, axes)
-                else:
-                    axes_synchronizer.append(AxesSynchronizer(data[1], ori_axis, axes))
-
-        case "-clra":
-            utils.clear_axis(get_axis(fig, data[1]))
-
-        case "-ra":
-            axis = get_axis(fig, data[1])
-            remove_synchronizer_on(axis)
-            utils.remove_axis(axis)
-
-        case "-al":
-            line = utils.add_line(get_axis(fig, data[1]))
-            if len(data) > 2:
-                utils.set_color(line, data[2])
+        return False
+    return not isinstance(data, bytes) or is_valid_line(data)
 
-        case "-cl":
-            utils.set_color(get_line(fig, data[1], data[2]), data[3])
 
-        case "-ml":
-            utils.set_marker(get_line(fig, data[1], data[2]), data[3])
-
-        case "-sl":
-            utils.set_style(get_line(fig, data[1], data[2]), data[3])
-
-        case "-clrl":
-            utils.clear_line(get_line(fig, data[1], data[2]))
-
-        case "-rl":
-            utils.remove_line(get_line(fig, data[1], data[2]))
-
-        case "-h":
-            write_header(data[1:])
-
-        case "-w":
-            write_data(data[1:])
-
-        case "-ws":
-            write_datas(data[1])
-
-        case "-l":
-            x, y = [[float(x) for (i, x) in enumerate(data[3:]) if i % 2 == 0],
-                    [float(y) for (i, y) in enumerate(data[3:]) if i % 2 != 0]]
-            utils.add_values(get_line(fig, data[1], data[2]), x, y, max_values)
-
-        case "-lw":
-            write_data([str(data[3]), str(data[4])])
-            utils.add_values(get_line(fig, data[1], data[2]), data[3], data[4], max_values)
-
-        case "-lws":
-            write_datas(list(map(lambda item: [str(item[0]), str(item[1])], data[3])))
-            x = []
-            y = []
-
-            for dt in data[3]:
-                x.append(dt[0])
-                y.append(dt[1])
-            utils.add_values(get_line(fig, data[1], data[2]), x, y, max_values)
-
-        case "-ld":
-            utils.compute_derivative(get_line(fig, data[1], data[2]),
-                                     get_line(fig, data[3], data[4]),
-                                     max_values,
-                                     data[5] if len(data) == 6 else 1)
-
-        case _:
-            log(f"Unknown {data_decoded}")
-
-    if display_elapsed_time:
-        print("{:}\t{:<10}\t{:}".format(
-            "Elapsed time (ms):",
-            round((time.time() - last_read_data_time) * 1000.0, 3),
-            data_decoded if len(data_decoded) < 20 else (data_decoded[:20] + "...")
-        ))
-
-    if update_title_requested and fig is not None:
-        utils.set_title(fig, file_path)
-        update_title_requested = False
+def get_line_format():
+    """
+    Get how the lines received are checked and delimited, depending on the mode (ASCII or binary)
+    :return: The function checking a raw line, and the end of line
+    """
+    if binary_mode:
+        return is_valid_frame, binary_protocol.FRAME_DELIMITER
+    return is_valid_line, b"\n"
 
 
 def read_validation_error(cmd: str, message: str, data_err: str):
@@ -426,193 +391,798 @@ def read_validation_error(cmd: str, message: str, data_err: str):
     log(f"Validation error:\n  Command: {cmd}\n  Message: {message}\n  Given: {data_err}")
 
 
-def close_fig():
-    """Close current fig"""
-    global fig
-    global on_close_id
-    utils.close(fig, on_close_id)
-    fig = None
-    on_close_id = None
-
-
-def get_axis(figure, axis_index: int):
-    """Get an axis"""
-    return figure.axes[get_index(axis_index)]
-
-
-def get_line(figure, axis_index: int, line_index: int):
-    """Get a line"""
-    return get_axis(figure, axis_index).lines[get_index(line_index)]
-
-
-def get_index(data):
-    """Get index"""
-    return int(data) - 1
-
-
-def create_file():
+def log(data: str):
     """
-    Create a new file
+    Log the data.
+    :param data: any | string
     :return: void
     """
-    global file_path
-    global created_files
-    global update_title_requested
-
-    now = datetime.now()
-    dt_string = now.strftime("%Y_%d_%m-%H_%M_%S")
-    file_path = os.path.join(base_path, f"{dt_string}.txt")
-
-    if not os.path.exists(base_path):
-        os.mkdir(base_path)
-
-    if not os.path.exists(file_path):
-        with open(file_path, "x") as file:
-            created_files.append(file.name)
-            log(f"New file: {file.name}")
-    else:
-        log("File's already existing")
-    update_title_requested = True
-
-
-def add_axis(pos, title=None, x_label=None, y_label=None):
-    """Add an axis"""
-    global fig
-    global on_close_id
-
-    if fig is None:
-        fig, on_close_id = utils.create_plot(window_title="Real time data visualizer", fig_title=file_path,
-                                             close_event=on_close)
-
-    utils.add_axis(fig, pos, title, x_label, y_label)
-
-
-def add_multi_axis(row: int, column: int):
-    """Set axis format"""
-    global fig
-    global on_close_id
-
-    if fig:
-        close_fig()
-
-    fig = utils.add_multi_axis(row, column)
-    on_close_id = utils.set_close_event(fig, on_close)
-    utils.set_window_title(fig, "Real time data visualizer")
-    utils.set_title(fig, file_path)
-
-
-def remove_synchronizer_on(ori_axis):
-    """Remove all the synchronizer having this reference axis."""
-    global axes_synchronizer
-    i = 0
-    while i < len(axes_synchronizer):
-        if axes_synchronizer[i].get_ori_axis() == ori_axis:
-            axes_synchronizer.remove(axes_synchronizer[i])
-            i -= 1
-        i += 1
+    print(data)
 
 
-def write_header(header=None):
+class Session:
     """
-    Save the header given
-    :param header: array of string
-    :return: void
+    Session class.
+    Everything related to one board: its serial port, its figure, its save files and its settings.
+    Several sessions can run at the same time, each one with its own board (multi-board mode).
     """
-    global file_path
-    global last_header
-    global all_headers
 
-    if header is None:
-        header = []
+    def __init__(self, com_ports_available: [], name=None, discover=False):
+        """
+        :param com_ports_available: The ports tried one by one until a connection succeeds
+        :param name: Name of the session, added to the window title and the save file names. None for no name.
+        :param discover: If True, the ports found on the computer are probed in parallel with com_ports_available,
+        instead of trying com_ports_available one by one
+        """
+        self.com_ports = com_ports_available
+        self.com_ports_index = 0
+        self.name = name
+        self.discover = discover
+
+        self.is_connected = False
+        self.serial_port = None
+        self.serial_reader = None
+        self.connection_probe = None    # ConnectionProbe running, see connect()
+        self.probed_port = None         # port probed by connection_probe, None for all the ports found
+        self.reported_dropped_count = 0
+        self.last_read_data_time = 0
+        self.next_connection_time = 0
+        self.recorder = None
+        self.replay_finished = False
+
+        # The commands modify the scene, the renderer applies the changes to the figure at each loop
+        self.scene = scene.Scene()
+        self.renderer = utils.SceneRenderer(self.scene, self.get_window_title(), on_close)
+
+        self.file_path = ""
+        self.writer = None      # DiskWriter of the files, see create_file()
+        self.compressor = None  # Compressor of the files continued into a new one, see rotate_file()
+        self.reported_write_dropped_count = 0
+        self.segment_path = ""  # path of the file created, continued into data/file_002.txt, ... (see rotate_file())
+        self.segment_index = 1
+        self.segment_rows = 0
+        self.segment_size = 0
+        self.segment_start_time = 0
+        self.created_files = []
+        self.update_title_requested = False
+        self.last_header = []
+        self.all_headers = []
+
+        self.remove_unused_files = False
+        self.max_values = None
+        self.separator = ";"
+        self.decimal_character = "."
+        self.queued_layout = None   # layout of the rows queued into the current recording (-col option)
+
+        self.dispatcher = helper.Dispatcher(self.get_executions())
+
+    def update(self):
+        """Connect the board if required, else process all the data received since the last call"""
+        self.check_writer()
+        if self.writer and self.is_rotation_required():
+            self.rotate_file()
+        if self.is_connected:
+            self.read()
+            return
 
-    if not os.path.exists(file_path):
-        create_file()
+        if self.connection_probe:
+            if not self.connection_probe.is_alive():
+                self.finish_probe()
+            return
+        if time.monotonic() < self.next_connection_time:
+            return
 
-    if len(header) > 0:
-        last_header = header
-        all_headers.append(separator.join(header) + "\n")
-        try_write(separator.join(header) + "\n")
-    else:
-        log("without header")
+        if self.fig or self.scene.axes:
+            self.close_fig()
 
+        if self.serial_port:
+            self.disconnect()
 
-def write_data(data: []):
-    """
-    Save the data given
-    :param data: array of native type (int, bool, float, string, ...)
-    :return: void
-    """
-    global file_path
-    global separator
-    global decimal_character
+        if self.discover:
+            self.connect_first_responding(baud_rate)
+        else:
+            if self.com_ports_index >= len(self.com_ports) or self.com_ports_index < 0:
+                self.com_ports_index = 0
 
-    if not os.path.exists(file_path):
-        global last_header
-        create_file()
-        write_header(last_header)
+            self.connect(self.com_ports[self.com_ports_index], baud_rate)
+        if not self.connection_probe:
+            self.end_connection_attempt()
 
-    for i in range(len(data)):
-        if decimal_character != '.' and not tools.is_int(data[i]) and tools.is_float(data[i]):
-            data[i] = data[i].replace('.', decimal_character)
+    def end_connection_attempt(self):
+        """Prepare the next connection attempt, if the connection failed"""
+        if self.is_connected:
+            self.last_read_data_time = time.monotonic()
+            return
+        if not self.discover:
+            self.com_ports_index += 1
+        # wait before the next try, without blocking the other sessions
+        self.next_connection_time = time.monotonic() + 1
+
+    def close(self):
+        """Disconnect the board, close the figure and remove the unused files if requested"""
+        if self.connection_probe:
+            self.connection_probe.cancel()
+            self.connection_probe = None
+        self.disconnect()
+        if self.recorder:
+            self.recorder.close()
+            log(f"Capture saved: {self.recorder.file_path} ({self.recorder.count} lines)")
+            self.recorder = None
+        if self.fig or self.scene.axes:
+            self.close_fig()
+
+        # All the rows queued are written before checking if the files are used
+        if self.writer:
+            self.check_writer()
+            self.writer.stop()
+            if self.writer.orphan_count > 0:
+                log(f"{self.writer.orphan_count} row(s) not written into {self.file_path}: "
+                    f"{type(self.writer.error).__name__}: {self.writer.error}")
+            self.writer = None
+        if self.compressor:
+            self.compressor.stop()
+            self.log_compression_errors()
+            self.compressor = None
+
+        if self.remove_unused_files:
+            for filepath in self.created_files:
+                if not os.path.exists(filepath):    # removed while recording (see move_to_new_file)
+                    continue
+                if os.path.isdir(filepath):     # recording of the -col option
+                    if columnar.is_empty(filepath):
+                        shutil.rmtree(filepath)
+                    continue
+                if os.path.getsize(filepath) == 0:
+                    os.remove(filepath)
+                else:
+                    with open(filepath, "r") as file:
+                        content = file.readlines()
+                    if len(content) == 1 and content[0] in self.all_headers:
+                        os.remove(filepath)
+
+    def connect(self, com_name, baud_rate=9600, timeout=0.01):
+        """
+        Try to connect with the arduino, and start reading it in background
+        :param com_name: Name of communication port
+        :param baud_rate: Communication's frequency. If None, it is detected automatically: the baud rates are tried
+        in background (see finish_probe()).
+        :param timeout: Timer before continue
+        :return: True if the connection succeeded, False if it failed or is still being probed
+        """
+        if baud_rate is None:
+            print(f"Detecting the baud rate of: {com_name}")
+            is_valid, delimiter = get_line_format()
+            self.start_probe(com_name, serial_utils.probe_baud_rate, com_name, is_valid, timeout=timeout,
+                             delimiter=delimiter)
+            return False
+
+        try:
+            self.serial_port = serial.Serial(com_name, baudrate=baud_rate, timeout=timeout)
+        except serial.SerialException:
+            self.serial_port = None
+            print(f"Connection failed to: {com_name}")
+
+        self.start_reading()
+        return self.is_connected
+
+    def connect_first_responding(self, baud_rate=9600, timeout=0.01):
+        """
+        Probe in parallel the ports found on the computer (matching the USB ids and patterns given), and the ports
+        of the session. Connect the first one sending a valid command. The ports are probed in background (see
+        finish_probe()).
+        :param baud_rate: Communication's frequency. If None, it is detected automatically.
+        :param timeout: Timer before continue
+        :return: False: the connection failed or is still being probed
+        """
+        com_names = serial_utils.find_ports(vid_pids, port_patterns)
+        for com_name in self.com_ports:
+            if com_name not in com_names:
+                com_names.append(com_name)
+
+        if not com_names:
+            print("Connection failed: no port found")
+            self.is_connected = False
+            return False
+
+        print(f"Probing: {', '.join(com_names)}")
+        is_valid, delimiter = get_line_format()
+        self.start_probe(None, serial_utils.probe_ports, com_names, is_valid, baud_rate, timeout=timeout,
+                         delimiter=delimiter)
+        return False
+
+    def start_probe(self, com_name, probe, *args, **kwargs):
+        """
+        Run a probe in background, so the other sessions are still read and drawn while the ports are tried. The
+        connection is finished by finish_probe(), called by update() once the probe is done.
+        :param com_name: Name of the port probed, None if several ports are probed
+        :param probe: The probe function (see serial_utils.ConnectionProbe)
+        """
+        self.probed_port = com_name
+        self.connection_probe = serial_utils.ConnectionProbe(
+            probe, *args, name=f"ConnectionProbe-{self.name}" if self.name else "ConnectionProbe", **kwargs)
+        self.connection_probe.start()
+
+    def finish_probe(self):
+        """Connect the port found by the probe, or prepare the next attempt"""
+        probe = self.connection_probe
+        self.connection_probe = None
+        self.serial_port = probe.serial_port
+        if self.serial_port is None:
+            if self.probed_port is None:
+                print("Connection failed: no valid command received")
+            elif probe.error is not None:
+                print(f"Connection failed to: {self.probed_port}")
+            else:
+                print(f"Connection failed to: {self.probed_port} (no valid command received at any baud rate)")
+
+        self.start_reading(probe.initial_lines)
+        self.end_connection_attempt()
+
+    def start_reading(self, initial_lines=None):
+        """
+        Start reading the serial port in background, if it is opened
+        :param initial_lines: Lines already read, by a probe for example
+        """
+        self.is_connected = self.serial_port is not None
+        if not self.is_connected:
+            return
 
-    try_write(separator.join(data) + "\n", rewrite_header_if_error=True)
+        print(f"Connection success to: {self.serial_port.name} at baud rate: {self.serial_port.baudrate}\n")
+        delimiter = get_line_format()[1]
+        self.serial_reader = serial_utils.SerialReader(self.serial_port, queue_size, bulk_read, initial_lines,
+                                                       delimiter)
+        self.reported_dropped_count = 0
+        self.serial_reader.start()
+
+        if record_path and self.recorder is None:
+            # The same capture is kept for all the connections of the session
+            self.recorder = capture.CaptureWriter(self.get_file_name(record_path), binary_mode)
+            log(f"Recording to: {self.recorder.file_path}")
+
+    def open_replay(self, file_path: str, speed=1.0):
+        """
+        Replay a capture file instead of reading a board.
+        :param file_path: Path of the capture file
+        :param speed: 1 for real time, 2 for twice faster, ..., 0 for as fast as possible
+        """
+        global binary_mode
+
+        self.serial_reader = capture.ReplaySource(file_path, speed)
+        binary_mode = self.serial_reader.binary
+        self.is_connected = True
+        self.last_read_data_time = time.monotonic()
+        print(f"Replay of: {file_path} ({self.serial_reader.count} lines, speed: {speed if speed > 0 else 'max'})\n")
+        self.serial_reader.start()
+
+    def disconnect(self):
+        """Stop the background reading and disconnect serial_port"""
+        if self.serial_reader:
+            self.serial_reader.stop()
+            self.serial_reader = None
+        if self.serial_port:
+            print(f"\nClosing serial port: {self.serial_port.name}\n")
+            self.serial_port.close()
+            self.serial_port = None
+
+    def read(self):
+        """
+        Process all the data received from Arduino card since the last call
+        """
+        lines = self.serial_reader.get_lines()
+
+        dropped_count = self.serial_reader.dropped_count
+        if dropped_count != self.reported_dropped_count:
+            log(f"Reading queue full: {dropped_count - self.reported_dropped_count} line(s) dropped "
+                f"(total: {dropped_count}). Try to increase the queue size (-q option).")
+            self.reported_dropped_count = dropped_count
+
+        if not lines:
+            if getattr(self.serial_reader, "finished", False):
+                if not self.replay_finished:
+                    self.on_replay_finished()
+            elif self.serial_reader.error is not None:
+                self.is_connected = False
+                err = self.serial_reader.error
+                log(f"{type(err).__name__}: {err}")
+            elif port_delay and time.monotonic() - self.last_read_data_time > port_delay:
+                self.is_connected = False
+                self.com_ports_index += 1
+            return
 
+        self.last_read_data_time = lines[-1][0]
+        for receive_time, data_read in lines:
+            if self.recorder:
+                self.recorder.write(receive_time, data_read)
 
-def try_write(data: str, try_count=1, rewrite_header_if_error=False):
-    """Try to write into the current file. If a PermissionError is raised, a new file is created."""
-    global file_path
-    if try_count > 5:
-        raise PermissionError
+            if binary_mode:
+                self.process_frame(data_read, receive_time)
+            else:
+                self.process_line(data_read, receive_time)
+
+    def on_replay_finished(self):
+        """Display the throughput of the replay, and stop the program if requested"""
+        global run
+
+        self.replay_finished = True
+        elapsed_time = time.monotonic() - self.serial_reader.start_time
+        count = self.serial_reader.count
+        log(f"Replay finished: {count} lines processed in {round(elapsed_time, 3)} s "
+            f"({round(count / elapsed_time) if elapsed_time > 0 else count} lines/s)")
+        if replay_exit:
+            run = False
+
+    def process_line(self, data_read: bytes, receive_time: float):
+        """
+        Process one line read from Arduino card
+        :param data_read: The raw line received
+        :param receive_time: The time (time.monotonic()) at which the line has been received
+        """
+        data_decoded = data_read.decode("ascii").strip()
+        if len(data_decoded) == 0:
+            return
 
-    try:
-        with open(file_path, "a") as file:
-            file.write(data)
-    except PermissionError:
-        create_file()
-        global last_header
-        if rewrite_header_if_error and len(last_header) > 0:
-            try_write(last_header, try_count + 1)
-        try_write(data, try_count + 1)
+        if data_decoded[0] == "-":
+            err, handler, data = self.dispatcher.parse(data_decoded)
+        else:
+            log(data_decoded)
+            return
 
+        if err:
+            print(f"Error:\n{err}\n")
+            return
 
-def write_datas(data: []):
-    """
-    Save the data given. Line are split by *separator*
-    :param data: array of array of native type (int, bool, float, string, ...)
-    :return: void
-    """
-    for line in data:
-        if line:
-            write_data(line)
+        if handler is None:
+            return
 
+        self.execute_command(handler, data, data_decoded, receive_time)
 
-def log(data: str):
-    """
-    Log the data.
-    :param data: any | string
-    :return: void
-    """
-    print(data)
+    def process_frame(self, frame: bytes, receive_time: float):
+        """
+        Process one binary frame read from Arduino card
+        :param frame: The raw frame received (COBS encoded)
+        :param receive_time: The time (time.monotonic()) at which the frame has been received
+        """
+        if len(frame) == 0:     # a delimiter can be sent alone to resynchronize the stream
+            return
 
+        err, data = binary_protocol.decode_frame(frame)
 
-class AxesSynchronizer:
-    """Axes Synchronizer"""
+        if err:
+            print(f"Error:\n{err}\n")
+            return
 
-    def __init__(self, timeout: float, ori_axis, axes: []):
-        self._timeout = timeout
-        self._last_refresh = time.time()
-        self._ori_axis = ori_axis
-        self._axes = axes
+        if isinstance(data, bytes):     # text frame
+            self.process_line(data, receive_time)
+        else:
+            self.execute_command(self.dispatcher.get_handler(data[0]), data, f"{data[0]} (binary)", receive_time)
+
+    def execute_command(self, handler, data: [], description: str, receive_time: float):
+        """
+        Execute a validated command
+        :param handler: The handler of the command (see command_helper.Dispatcher)
+        :param data: The command code followed by its arguments, as built by the validation
+        :param description: Text describing the command, used for logs
+        :param receive_time: The time (time.monotonic()) at which the command has been received
+        """
+        if not self.file_path and data[0] != "-n":
+            print("Not initialized")
+            return
+
+        handler.execute(data)
+
+        if display_elapsed_time:
+            print("{:}\t{:<10}\t{:}".format(
+                "Elapsed time (ms):",
+                round((time.monotonic() - receive_time) * 1000.0, 3),
+                description if len(description) < 20 else (description[:20] + "...")
+            ))
+
+        if self.update_title_requested:
+            self.scene.set_title(self.file_path)
+            self.update_title_requested = False
+
+    def get_executions(self):
+        """
+        Get the functions executing each command
+        :return: dict of command code: function taking the data built by the validation
+        """
+        return {
+            "-n": self.execute_new,
+            "-ruf": self.execute_remove_unused_files,
+            "-s": self.execute_separator,
+            "-dc": self.execute_decimal_character,
+            "-mv": self.execute_max_values,
+            "-aa": self.execute_add_axis,
+            "-aas": self.execute_add_axes,
+            "-at": self.execute_axis_title,
+            "-albl": self.execute_axis_labels,
+            "-sa": self.execute_synchronize_axes,
+            "-clra": self.execute_clear_axis,
+            "-ra": self.execute_remove_axis,
+            "-al": self.execute_add_line,
+            "-cl": self.execute_color_line,
+            "-ml": self.execute_marker_line,
+            "-sl": self.execute_style_line,
+            "-clrl": self.execute_clear_line,
+            "-rl": self.execute_remove_line,
+            "-h": self.execute_header,
+            "-w": self.execute_write,
+            "-ws": self.execute_write_several,
+            "-l": self.execute_line,
+            "-lw": self.execute_line_write,
+            "-lws": self.execute_line_write_several,
+            "-ld": self.execute_line_derivation,
+        }
+
+    def execute_new(self, data: []):
+        """Execute -n"""
+        if len(data) == 2:
+            self.remove_unused_files = data[1]
+
+        self.scene.clear()
+        self.create_file()
+
+    def execute_remove_unused_files(self, data: []):
+        """Execute -ruf"""
+        self.remove_unused_files = data[1]
+
+    def execute_separator(self, data: []):
+        """Execute -s"""
+        self.separator = data[1]
+
+    def execute_decimal_character(self, data: []):
+        """Execute -dc"""
+        self.decimal_character = data[1]
+
+    def execute_max_values(self, data: []):
+        """Execute -mv"""
+        self.max_values = data[1]
+
+    def execute_add_axis(self, data: []):
+        """Execute -aa"""
+        pos = data[1]
+        title = data[2] if len(data) >= 3 else None
+        x_label = data[3] if len(data) >= 4 else None
+        y_label = data[4] if len(data) >= 5 else None
+        self.add_axis(pos, title, x_label, y_label)
+
+    def execute_add_axes(self, data: []):
+        """Execute -aas"""
+        self.add_multi_axis(data[1], data[2])
+
+    def execute_axis_title(self, data: []):
+        """Execute -at"""
+        self.scene.set_axis_title(self.scene.get_axis(data[1]), data[2])
+
+    def execute_axis_labels(self, data: []):
+        """Execute -albl"""
+        self.scene.set_axis_labels(self.scene.get_axis(data[1]), data[2], data[3])
+
+    def execute_synchronize_axes(self, data: []):
+        """Execute -sa"""
+        ori_axis = self.scene.get_axis(data[2])
+        if data[1] == -1 and len(data[3]) == 0:
+            self.scene.unlink_axes(ori_axis)
+            return
 
-    def get_ori_axis(self):
-        """Get oriAxis"""
-        return self._ori_axis
+        axes_index = data[3] if len(data[3]) != 0 else [i for i in range(1, len(self.scene.axes) + 1) if i != data[2]]
+        axes = [self.scene.get_axis(i) for i in axes_index]
+        if data[1] == -1:
+            self.scene.unlink_axes(ori_axis, axes)
+        elif data[1] == 0:
+            self.scene.synchronize_axes(ori_axis, axes)
+        else:
+            # The axes are synchronized each time the dimensions of ori_axis change, at most once per period
+            self.scene.link_axes(ori_axis, axes, data[1])
+
+    def execute_clear_axis(self, data: []):
+        """Execute -clra"""
+        self.scene.clear_axis(self.scene.get_axis(data[1]))
+
+    def execute_remove_axis(self, data: []):
+        """Execute -ra"""
+        self.scene.remove_axis(self.scene.get_axis(data[1]))
+
+    def execute_add_line(self, data: []):
+        """Execute -al"""
+        self.scene.add_line(self.scene.get_axis(data[1]), data[2] if len(data) > 2 else None)
+
+    def execute_color_line(self, data: []):
+        """Execute -cl"""
+        self.scene.set_color(self.scene.get_line(data[1], data[2]), data[3])
+
+    def execute_marker_line(self, data: []):
+        """Execute -ml"""
+        self.scene.set_marker(self.scene.get_line(data[1], data[2]), data[3])
+
+    def execute_style_line(self, data: []):
+        """Execute -sl"""
+        self.scene.set_style(self.scene.get_line(data[1], data[2]), data[3])
+
+    def execute_clear_line(self, data: []):
+        """Execute -clrl"""
+        self.scene.clear_line(self.scene.get_line(data[1], data[2]))
+
+    def execute_remove_line(self, data: []):
+        """Execute -rl"""
+        self.scene.remove_line(self.scene.get_line(data[1], data[2]))
+
+    def execute_header(self, data: []):
+        """Execute -h"""
+        self.write_header(data[1:])
+
+    def execute_write(self, data: []):
+        """Execute -w"""
+        self.write_data(data[1:])
+
+    def execute_write_several(self, data: []):
+        """Execute -ws"""
+        self.write_datas(data[1])
+
+    def execute_line(self, data: []):
+        """Execute -l"""
+        # data[3] is the numpy array of the pairs (x, y)
+        self.scene.add_values(self.scene.get_line(data[1], data[2]), data[3][:, 0], data[3][:, 1], self.max_values)
+
+    def execute_line_write(self, data: []):
+        """Execute -lw"""
+        self.write_data([str(data[3]), str(data[4])])
+        self.scene.add_values(self.scene.get_line(data[1], data[2]), data[3], data[4], self.max_values)
+
+    def execute_line_write_several(self, data: []):
+        """Execute -lws"""
+        self.write_datas(list(map(lambda item: [str(item[0]), str(item[1])], data[3])))
+        self.scene.add_values(self.scene.get_line(data[1], data[2]), data[3][:, 0], data[3][:, 1], self.max_values)
+
+    def execute_line_derivation(self, data: []):
+        """Execute -ld"""
+        self.scene.compute_derivative(self.scene.get_line(data[1], data[2]),
+                                      self.scene.get_line(data[3], data[4]),
+                                      self.max_values,
+                                      data[5] if len(data) == 6 else 1)
+
+    @property
+    def fig(self):
+        """The figure of the session, None if it isn't created yet (see the renderer)"""
+        return self.renderer.fig
+
+    def close_fig(self):
+        """Close current fig, and remove all the axes of the scene. The next figure keeps the title (the file path)."""
+        self.renderer.close()
+        self.scene.clear()
+        self.scene.set_title(self.file_path)
+
+    def create_file(self, header=None):
+        """
+        Create a new file. The next rows are written into it by the DiskWriter of the session.
+        :param header: The header written first into the file if rows of the previous file are moved into it (see
+        move_to_new_file()). None if there isn't any.
+        :return: void
+        """
+        now = datetime.now()
+        dt_string = now.strftime("%Y_%d_%m-%H_%M_%S")
+        extension = columnar.extension if columnar_format else ".txt"
+        self.segment_path = self.get_file_name(os.path.join(base_path, f"{dt_string}{extension}"))
+        self.segment_index = 1
+
+        if not os.path.exists(base_path):
+            os.mkdir(base_path)
+        self.open_file(self.segment_path, header)
+
+    def rotate_file(self):
+        """
+        Continue the current file into a new one (see -rs, -rr and -rt options): data/file.txt => data/file_002.txt,
+        data/file_003.txt, ... The new file starts with the last header. The previous file is compressed in background
+        if requested (-cmp option).
+        """
+        self.segment_index += 1
+        root, extension = os.path.splitext(self.segment_path)
+        on_closed = None
+        if compression and not columnar_format:     # a recording is a directory, it isn't compressed
+            if self.compressor is None:
+                self.compressor = data_writer.Compressor(compression)
+                self.compressor.start()
+            on_closed = self.compressor.submit
+        self.open_file(f"{root}_{self.segment_index:03d}{extension}", on_closed=on_closed)
+        if len(self.last_header) > 0:
+            self.try_write(self.format_header(self.last_header), 0)
+
+    def is_rotation_required(self):
+        """True if the current file is full: its rows must be continued into a new file (see rotate_file())"""
+        if self.segment_rows == 0:
+            return False
+        return (rotate_size is not None and self.segment_size >= rotate_size) \
+            or (rotate_rows is not None and self.segment_rows >= rotate_rows) \
+            or (rotate_time is not None and time.monotonic() - self.segment_start_time >= rotate_time)
+
+    def open_file(self, file_path: str, header=None, on_closed=None):
+        """
+        Create a file, and write the next rows into it
+        :param file_path: The path of the file
+        :param header: See create_file()
+        :param on_closed: Function called with the path of the previous file once closed (see DiskWriter.open())
+        :return: void
+        """
+        self.file_path = file_path
+        if not os.path.exists(self.file_path):
+            if columnar_format:
+                columnar.create(self.file_path)
+            else:
+                with open(self.file_path, "x"):
+                    pass
+            self.created_files.append(self.file_path)
+            log(f"New file: {self.file_path}")
+        else:
+            log("File's already existing")
+
+        if self.writer is None:
+            self.writer = data_writer.DiskWriter(flush_interval, flush_rows, flush_bytes, fsync_data,
+                                                 write_queue_size, write_block,
+                                                 name=f"DiskWriter-{self.name}" if self.name else "DiskWriter",
+                                                 writer_class=columnar.ColumnarWriter if columnar_format
+                                                 else data_writer.DataWriter)
+            self.writer.start()
+        self.writer.open(self.file_path, header, on_closed)
+        self.queued_layout = None
+        self.segment_rows = 0
+        self.segment_size = 0
+        self.segment_start_time = time.monotonic()
+        self.update_title_requested = True
+
+    def add_axis(self, pos, title=None, x_label=None, y_label=None):
+        """Add an axis"""
+        self.scene.add_axis(pos, title, x_label, y_label)
+
+    def add_multi_axis(self, row: int, column: int):
+        """Set axis format: all the axes are replaced, the figure is kept"""
+        self.scene.set_grid(row, column)
+
+    def get_file_name(self, file_path: str):
+        """Add the name of the session (if any) to the name of a file: data/file.txt => data/file_NAME.txt"""
+        if not self.name:
+            return file_path
+        root, extension = os.path.splitext(file_path)
+        return root + "_" + "".join(c if c.isalnum() else "_" for c in self.name).strip("_") + extension
+
+    def get_window_title(self):
+        """Get the title of the window, containing the name of the session if any"""
+        return f"{window_title} - {self.name}" if self.name else window_title
+
+    def write_header(self, header=None):
+        """
+        Save the header given
+        :param header: array of string
+        :return: void
+        """
+        if header is None:
+            header = []
+
+        if self.writer is None:
+            self.create_file()
+
+        if len(header) > 0:
+            self.last_header = header
+            self.all_headers.append(self.separator.join(header) + "\n")
+            self.try_write(self.format_header(header), 0)
+        else:
+            log("without header")
+
+    def write_data(self, data: []):
+        """
+        Save the data given
+        :param data: array of native type (int, bool, float, string, ...)
+        :return: void
+        """
+        if self.writer is None:
+            self.create_file()
+            self.write_header(self.last_header)
+
+        self.try_write(self.format_rows([data]))
+
+    def format_header(self, header: []):
+        """Get a header, as given to the writer of the files: text, or array of values with the -col option"""
+        if columnar_format:
+            return [list(header)]
+        return self.separator.join(header) + "\n"
+
+    def format_rows(self, rows: []):
+        """
+        Get rows, as given to the writer of the files: text, or arrays of values with the -col option (the values
+        are formatted by the export, see columnar.py)
+        :param rows: array of array of string
+        """
+        if columnar_format:
+            return rows
+        return "".join(self.format_row(row) for row in rows)
+
+    def format_row(self, data: []):
+        """
+        Get the row of the data given, as written in the file
+        :param data: array of string
+        :return: The row, with its end of line
+        """
+        for i in range(len(data)):
+            if self.decimal_character != '.' and not tools.is_int(data[i]) and tools.is_float(data[i]):
+                data[i] = data[i].replace('.', self.decimal_character)
+        return self.separator.join(data) + "\n"
+
+    def try_write(self, data, row_count=1):
+        """
+        Queue rows to write into the current file (see DiskWriter). The file is written in background: if it can't
+        be written, a new file is created by check_writer().
+        :param data: The rows, see format_rows() and format_header()
+        :param row_count: The number of rows in data, 0 for a header
+        """
+        if columnar_format:
+            self.write_layout()
+        self.writer.write(data, row_count)
+
+        self.segment_rows += row_count
+        if rotate_size is not None:     # size of the text, the recordings (-col option) are smaller
+            self.segment_size += len(data) if isinstance(data, str) else sum(len(value) + 1
+                                                                              for row in data for value in row)
+        if self.is_rotation_required():
+            self.rotate_file()
+
+    def write_layout(self):
+        """
+        Queue the separator and the decimal character into the current recording (-col option) if they have changed:
+        the recording stores them for the export (see columnar.py)
+        """
+        layout = columnar.format_layout(self.separator, self.decimal_character)
+        if layout != self.queued_layout:
+            self.writer.write(layout, 0)    # never dropped, as a header
+            self.queued_layout = layout
+
+    def check_writer(self):
+        """Create a new file if the current one can't be written, and log the rows dropped by the writing queue"""
+        if self.writer is None:
+            return
 
-    def try_synchronize(self):
-        """Try to synchronize axes dimensions"""
-        if time.time() - self._last_refresh >= self._timeout:
-            self._last_refresh = time.time()
-            utils.synchronize_axes(self._ori_axis, self._axes)
+        dropped_count = self.writer.dropped_count
+        if dropped_count != self.reported_write_dropped_count:
+            log(f"Writing queue full: {dropped_count - self.reported_write_dropped_count} row(s) dropped "
+                f"(total: {dropped_count}). Try to increase the writing queue size (-wq option), or to wait for "
+                f"the disk (-wb option).")
+            self.reported_write_dropped_count = dropped_count
+
+        if self.writer.new_file_required:
+            self.move_to_new_file()
+
+        if self.compressor:
+            self.log_compression_errors()
+
+    def log_compression_errors(self):
+        """Log the files which couldn't be compressed (see rotate_file())"""
+        for path, err in self.compressor.pop_errors():
+            log(f"Compression of {path}: {type(err).__name__}: {err}")
+
+    def move_to_new_file(self):
+        """
+        Create a new file, the current one can't be written (locked by another program, removed, ...). The rows not
+        written are moved into the new file, after the last header.
+        A PermissionError is raised after 5 files which can't be written.
+        """
+        error = self.writer.error
+        if self.writer.failure_count >= 5:
+            raise PermissionError(f"{type(error).__name__}: {error}")
+
+        log(f"Can't write {self.file_path}: {type(error).__name__}: {error}")
+        self.create_file(self.format_header(self.last_header) if len(self.last_header) > 0 else None)
+
+    def write_datas(self, data: []):
+        """
+        Save the data given. Line are split by *separator*
+        :param data: array of array of native type (int, bool, float, string, ...)
+        :return: void
+        """
+        if self.writer is None:
+            self.create_file()
+            self.write_header(self.last_header)
+
+        rows = [line for line in data if line]
+        if rows:
+            self.try_write(self.format_rows(rows), len(rows))
 
 
 if __name__ == "__main__":
@@ -620,6 +1190,14 @@ if __name__ == "__main__":
 
     try:
         import serial
+        import serial_utils
+        import binary_protocol
+        import capture
+        import columnar
+        import data_writer
+        import scene
+        import snapshot
+        import null_backend
         import pyplot_utils as utils
     except ImportError as error:
         print(f"\n{type(error).__name__}: {error.msg}\n")
@@ -635,4 +1213,90 @@ if __name__ == "__main__":
                              "received, even if the connection to the port was successful.")
     parser.add_argument("-t", "--timer", action="store_true", help="display the elapsed time to process a received "
                                                                    "command")
+    parser.add_argument("-q", "--queue-size", type=int,
+                        help="set the maximum number of received lines waiting to be processed. "
+                             f"Default: {serial_utils.default_queue_size}")
+    parser.add_argument("-br", "--baud", type=str,
+                        help="set the baud rate of the communication, or \"auto\" to detect it using the first valid "
+                             f"command received. Default: {serial_utils.default_baud_rate}")
+    parser.add_argument("-bin", "--binary", action="store_true",
+                        help="receive binary frames instead of ASCII lines. See binary_protocol.py")
+    parser.add_argument("-m", "--multi", action="store_true",
+                        help="connect all the communication ports at the same time (one board per port). Each board "
+                             "has its own window and its own save files.")
+    parser.add_argument("-dis", "--discover", action="store_true",
+                        help="find the ports on the computer, and probe them in parallel: the first one sending a "
+                             "valid command is used. With the multi-board mode, all the ports found are used.")
+    parser.add_argument("-id", "--vid-pid", type=str, nargs="+",
+                        help="only discover the USB ports having these ids, in hexadecimal: VID:PID or VID. "
+                             "Example: 2341:0043 (implies -dis)")
+    parser.add_argument("-mt", "--match", type=str, nargs="+",
+                        help="only discover the ports whose description or manufacturer matches these patterns. "
+                             "Example: \"*Arduino*\" (implies -dis)")
+    parser.add_argument("-rec", "--record", type=str,
+                        help="record all the raw data received into a capture file, to replay it later (-rp option)")
+    parser.add_argument("-rp", "--replay", type=str,
+                        help="replay a capture file (see -rec option) instead of reading a board")
+    parser.add_argument("-sp", "--speed", type=float,
+                        help="set the replay speed: 1 for real time (default), 2 for twice faster, ..., "
+                             "0 for as fast as possible")
+    parser.add_argument("-rpe", "--replay-exit", action="store_true", help="stop the program at the end of the "
+                                                                           "replay")
+    parser.add_argument("-b", "--bulk", action="store_true", help="read all the bytes waiting in the serial buffer "
+                                                                  "at once, instead of one line per read")
+    parser.add_argument("-fps", "--fps", type=float,
+                        help="set the maximum number of times per second the graphs are redrawn, 0 for no limit. "
+                             f"Default: {utils.default_fps}")
+    parser.add_argument("-nbl", "--no-blit", action="store_true",
+                        help="redraw the whole figures at each frame, instead of only the lines modified")
+    parser.add_argument("-ndec", "--no-decimation", action="store_true",
+                        help="draw all the points of the lines, and keep their markers even when they overlap")
+    parser.add_argument("-nr", "--no-render", action="store_true",
+                        help="don't build any figure: the values are only stored in memory and written in the save "
+                             "files. Useful to record the data at full speed")
+    parser.add_argument("-hl", "--headless", action="store_true",
+                        help="don't display any window: the figures are only drawn to save their images (-snap "
+                             "option). Useful on a computer without display")
+    parser.add_argument("-snap", "--snapshot", type=str,
+                        help="save an image of the figures at a fixed interval: into a PNG file replaced by each new "
+                             "image (example: snapshot.png), an image sequence (example: frames/img_{:06d}.png) or a "
+                             "video using ffmpeg (example: video.mp4) (implies -hl)")
+    parser.add_argument("-si", "--snapshot-interval", type=float,
+                        help="set the time between two images (in seconds) of the -snap option. "
+                             f"Default: {snapshot.default_interval}")
+    parser.add_argument("-fi", "--flush-interval", type=float,
+                        help="set the maximum time (in seconds) a row waits before being written into the save file, "
+                             f"0 to write each row at once. Default: {data_writer.default_flush_interval}")
+    parser.add_argument("-fr", "--flush-rows", type=int,
+                        help="set the maximum number of rows waiting to be written into the save file. "
+                             f"Default: {data_writer.default_flush_rows}")
+    parser.add_argument("-fb", "--flush-bytes", type=int,
+                        help="set the maximum number of characters waiting to be written into the save file. "
+                             f"Default: {data_writer.default_flush_bytes}")
+    parser.add_argument("-fsync", "--fsync", action="store_true",
+                        help="synchronize the save file to the disk at each write, so the rows written survive a "
+                             "power loss (slower)")
+    parser.add_argument("-wq", "--write-queue-size", type=int,
+                        help="set the maximum number of writes (one per command saving data) waiting to be written "
+                             "into the save file by the background writer. If the disk is too slow and the queue is "
+                             f"full, the rows are dropped. Default: {data_writer.default_queue_size}")
+    parser.add_argument("-wb", "--write-block", action="store_true",
+                        help="when the writing queue is full, wait for the disk instead of dropping the rows: no row "
+                             "is lost, but the processing of the data received is delayed")
+    parser.add_argument("-col", "--columnar", action="store_true",
+                        help="record the save files as typed columns (numpy arrays), instead of text: smaller and "
+                             "faster to load. A save file is then a directory (*.columns), see columnar.py to export "
+                             "it to text. The rows are written by chunks, by default every "
+                             f"{columnar.default_flush_interval} seconds or {columnar.default_flush_rows} rows")
+    parser.add_argument("-rs", "--rotate-size", type=float,
+                        help="continue the save file into a new one (file_002.txt, file_003.txt, ...) each time it "
+                             "reaches this size, in megabytes. Each new file starts with the last header")
+    parser.add_argument("-rr", "--rotate-rows", type=int,
+                        help="continue the save file into a new one each time it reaches this number of rows")
+    parser.add_argument("-rt", "--rotate-time", type=float,
+                        help="continue the save file into a new one each time it is this old, in seconds. Example: "
+                             "3600 for a file per hour")
+    parser.add_argument("-cmp", "--compress", type=str, choices=data_writer.compression_extensions.keys(),
+                        help="compress the save files in background once continued into a new one (see -rs, -rr and "
+                             "-rt options): file.txt is replaced by file.txt.gz (gzip) or file.txt.xz (lzma)")
     main()
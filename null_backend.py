@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+
+"""
+Null backend module
+
+Copyright © 2022 Roman Clavier
+
+Rendering backend drawing nothing: the scene (see scene.py) still stores the values of the lines in memory, but
+matplotlib isn't used. Used by main.py (-nr option) to record the data received at full speed, and by benchmark.py to
+measure the cost of the rendering on its own.
+
+A rendering backend is a module giving:
+- SceneRenderer(scene, window_title, close_event): applies the changes of a scene to its figure at each call of
+  sync(), gives the figure (fig, None if there is none) and closes it with close().
+- render(figures, force=False): draws a frame of the figures, if its time is reached.
+- headless: True if nothing is displayed.
+pyplot_utils.py is the matplotlib backend, used by default.
+"""
+
+headless = True     # nothing is displayed
+
+
+class SceneRenderer:
+    """Scene renderer class. Nothing is rendered: there is never any figure."""
+    def __init__(self, scene, window_title=None, close_event=None):
+        self.scene = scene
+        self.fig = None
+
+    def sync(self):
+        """Nothing to apply. The synchronizations requested are dropped, so they don't pile up."""
+        self.scene.synchronizations.clear()
+
+    def close(self):
+        """Nothing to close"""
+
+
+def render(figures, force=False):
+    """
+    Render a frame: nothing is drawn
+    :return: False, no frame is ever rendered
+    """
+    return False
@@ -8,21 +8,503 @@ Copyright © 2022 Roman Clavier
 This module is helping to use the matplotlib.pyplot module
 """
 import time
+import weakref
 
 import matplotlib.pyplot as plt
 import numpy as np
 
+from line_buffer import LineBuffer
+
 # use ggplot style for more sophisticated visuals
 plt.style.use('ggplot')
 
 default_style = "-"
 default_marker = "o"
 
+default_fps = 30
+
+# line: LineBuffer storing its values. The buffer is removed with the line.
+_line_buffers = weakref.WeakKeyDictionary()
+
+
+class FigureBlitter:
+    """
+    Figure blitter class.
+    The lines of the figure are animated: they are not part of the normal drawing of the figure. After each full
+    drawing, the background of each axis (grid, ticks, titles, ...) is cached. Then, updating a line only restores
+    the background of its axis, draws the lines of this axis and blits the axis.
+    A full drawing is still done when the figure is modified in another way: limits, titles, labels, axes, ...
+    """
+    def __init__(self, fig):
+        self.fig = fig
+        self.full_redraw_requested = True
+        self._backgrounds = {}     # axis: (background, xlim, ylim)
+        self._draw_event_id = fig.canvas.mpl_connect("draw_event", self._on_draw)
+
+    def _on_draw(self, event):
+        """After a full drawing: cache the backgrounds, then draw the animated lines over them"""
+        canvas = self.fig.canvas
+        self._backgrounds = {axis: (canvas.copy_from_bbox(axis.bbox), axis.get_xlim(), axis.get_ylim())
+                             for axis in self.fig.axes}
+        for axis in self.fig.axes:
+            self._draw_lines(axis)
+
+    @staticmethod
+    def _draw_lines(axis):
+        """Draw the lines of an axis"""
+        for line in axis.lines:
+            axis.draw_artist(line)
+
+    def needs_full_redraw(self):
+        """True if something else than the lines has been modified since the last full drawing"""
+        if self.full_redraw_requested or self.fig.stale or len(self._backgrounds) != len(self.fig.axes):
+            return True
+        for axis in self.fig.axes:
+            cached = self._backgrounds.get(axis)
+            if cached is None or cached[1] != axis.get_xlim() or cached[2] != axis.get_ylim():
+                return True
+        return False
+
+    def render(self, dirty_axes):
+        """
+        Render the figure
+        :param dirty_axes: The axes containing a modified line
+        """
+        for axis in self.fig.axes:
+            for line in axis.lines:
+                if not line.get_animated():
+                    line.set_animated(True)
+                    self.full_redraw_requested = True   # the cached background still contains the line
+
+        if self.needs_full_redraw():
+            self.full_redraw_requested = False
+            self.fig.canvas.draw_idle()
+            return
+
+        canvas = self.fig.canvas
+        for axis in dirty_axes:
+            if axis not in self._backgrounds:   # axis of another figure
+                continue
+            canvas.restore_region(self._backgrounds[axis][0])
+            self._draw_lines(axis)
+            canvas.blit(axis.bbox)
+
+
+class Autoscaler:
+    """
+    Autoscaler class.
+    Set the limits of an axis from the bounds of its lines, with hysteresis: the limits only grow when a value is out
+    of them, by a step (growth) anticipating the next values, and only shrink when the values use less than a part
+    (shrink) of them. So the limits don't change at each value, and the ticks are not laid out again at each frame.
+    """
+    def __init__(self, margin=0.05, growth=0.25, shrink=0.5):
+        """
+        :param margin: Space kept around the values, relative to their range
+        :param growth: When the limits grow, space added in the growth direction, relative to the range of the values
+        :param shrink: The limits shrink when the values (with margins) use less than this part of them
+        """
+        self.margin = margin
+        self.growth = growth
+        self.shrink = shrink
+
+    def get_limits(self, limits, data_min, data_max):
+        """
+        Get the new limits of one direction (x or y)
+        :param limits: The current limits (low, high)
+        :param data_min: The minimum of the values
+        :param data_max: The maximum of the values
+        :return: The new limits, None if they are unchanged
+        """
+        low, high = limits
+        span = data_max - data_min
+        if span <= 0:
+            span = abs(data_max) or 1.0
+        margin = self.margin * span
+
+        if data_min < low or data_max > high:
+            if data_min < low:
+                low = data_min - margin - self.growth * span
+            if data_max > high:
+                high = data_max + margin + self.growth * span
+            return low, high
+
+        if span + 2 * margin < self.shrink * (high - low):
+            return data_min - margin, data_max + margin
+        return None
+
+    def update(self, axis):
+        """
+        Update the limits of an axis whose automatic scaling is on (it is turned off by zooming or panning)
+        :param axis: The given axis
+        """
+        bounds = [get_buffer(line).get_bounds() for line in axis.lines]
+        bounds = [line_bounds for line_bounds in bounds if line_bounds is not None]
+        if len(bounds) == 0:
+            return
+        x_min, x_max, y_min, y_max = np.array(bounds).T
+
+        if axis.get_autoscalex_on():
+            limits = self.get_limits(axis.get_xlim(), x_min.min(), x_max.max())
+            if limits is not None:
+                axis.set_xlim(limits, auto=None)
+        if axis.get_autoscaley_on():
+            limits = self.get_limits(axis.get_ylim(), y_min.min(), y_max.max())
+            if limits is not None:
+                axis.set_ylim(limits, auto=None)
+
+
+class AxesLink:
+    """Axes link class. The axes following the x limits of a reference axis, each one with its interval."""
+    def __init__(self, ori_axis, callback_id):
+        self.ori_axis = ori_axis
+        self.callback_id = callback_id
+        self.pending = True     # the x limits of the reference axis have changed since they were copied
+        self.intervals = {}     # axis: minimum time between two copies (in seconds)
+        self.next_times = {}    # axis: time (time.monotonic()) from which the limits can be copied again
+
+
+class AxesLinker:
+    """
+    Axes linker class.
+    Copy the x limits of reference axes to other axes. A change of the limits of a reference axis (new values, zoom,
+    pan, ...) is only noted by its "xlim_changed" callback, then the limits are copied once per frame (see
+    RenderScheduler.flush()), at most once per interval for each axis.
+    """
+    def __init__(self):
+        self._links = {}    # reference axis: AxesLink
+
+    def link(self, ori_axis, axes: [], interval: float):
+        """
+        Make axes follow the x limits of a reference axis
+        :param ori_axis: The reference axis
+        :param axes: The axes following it
+        :param interval: Minimum time between two copies of the limits (in seconds)
+        """
+        link = self._links.get(ori_axis)
+        if link is None:
+            callback_id = ori_axis.callbacks.connect("xlim_changed", self._on_xlim_changed)
+            link = self._links[ori_axis] = AxesLink(ori_axis, callback_id)
+        for axis in axes:
+            link.intervals[axis] = interval
+            link.next_times[axis] = 0
+        link.pending = True
+
+    def unlink(self, ori_axis, axes=None):
+        """
+        Stop following the x limits of a reference axis. The automatic scaling of the axes is turned on again.
+        :param ori_axis: The reference axis
+        :param axes: The axes not following it anymore. None for all the axes.
+        """
+        link = self._links.get(ori_axis)
+        if link is None:
+            return
+        for axis in list(link.intervals) if axes is None else axes:
+            if link.intervals.pop(axis, None) is not None:
+                del link.next_times[axis]
+                axis.set_autoscalex_on(True)
+        if len(link.intervals) == 0:
+            ori_axis.callbacks.disconnect(link.callback_id)
+            del self._links[ori_axis]
+
+    def on_cleared(self, axis):
+        """
+        Keep the links of an axis which has been cleared: Axes.clear() replaces its callbacks registry, so the
+        "xlim_changed" callback of a reference axis is connected again. The limits are copied again at the next frame.
+        :param axis: The axis cleared
+        """
+        for link in self._links.values():
+            if link.ori_axis is axis:
+                link.callback_id = axis.callbacks.connect("xlim_changed", self._on_xlim_changed)
+                link.pending = True
+            elif axis in link.intervals:    # its automatic scaling is turned on again by the clear
+                link.next_times[axis] = 0
+                link.pending = True
+
+    def _on_xlim_changed(self, ori_axis):
+        """Note the change of the limits of a reference axis, they are copied at the next frame"""
+        link = self._links.get(ori_axis)
+        if link is not None:
+            link.pending = True
+
+    def apply(self):
+        """Copy the limits of the reference axes which have changed to their axes"""
+        if len(self._links) == 0:
+            return
+        now = time.monotonic()
+        for link in list(self._links.values()):
+            for axis in [axis for axis in link.intervals if is_removed(axis)]:
+                del link.intervals[axis]
+                del link.next_times[axis]
+            if is_removed(link.ori_axis) or len(link.intervals) == 0:
+                link.ori_axis.callbacks.disconnect(link.callback_id)
+                del self._links[link.ori_axis]
+                continue
+            if not link.pending:
+                continue
+
+            link.pending = False
+            limits = link.ori_axis.get_xlim()
+            for axis, interval in link.intervals.items():
+                if now < link.next_times[axis]:
+                    link.pending = True     # copied at a next frame
+                    continue
+                link.next_times[axis] = now + interval
+                if axis.get_xlim() != limits:
+                    axis.set_xlim(limits)   # turns off the automatic scaling of the x axis
+
+
+def is_removed(axis):
+    """True if the axis has been removed from its figure, or its figure cleared"""
+    return axis.figure is None or axis not in axis.figure.axes
+
+
+def get_visible_slice(x, x_min, x_max):
+    """
+    Get the points of a line inside the visible x range, plus the one before and the one after it: the line still
+    crosses the edges of the axis.
+    :param x: numpy array of the x values, in ascending order
+    :param x_min: The lower visible x limit
+    :param x_max: The upper visible x limit
+    :return: The slice of the points
+    """
+    start = max(int(np.searchsorted(x, x_min, "left")) - 1, 0)
+    end = min(int(np.searchsorted(x, x_max, "right")) + 1, len(x))
+    return slice(start, end)
+
+
+def decimate(x, y, x_min, x_max, columns: int):
+    """
+    Reduce the number of points of a line, keeping its visual envelope: the points are split into buckets, one per
+    pixel column of the visible x range, and only the first, the last, the minimum and the maximum of each bucket are
+    kept. The points out of the visible x range are put in two more buckets, one at each side.
+    :param x: numpy array of the x values, in ascending order
+    :param y: numpy array of the y values
+    :param x_min: The lower visible x limit
+    :param x_max: The upper visible x limit (greater than x_min)
+    :param columns: Number of pixel columns of the visible x range, usually the width of the axis in pixels
+    :return: The x and y values kept
+    """
+    count = len(x)
+    if count <= 2:
+        return x, y
+    buckets = np.clip(((x - x_min) * (columns / (x_max - x_min))).astype(np.int64), -1, columns)
+    new_bucket = buckets[1:] != buckets[:-1]
+    starts = np.concatenate(([0], np.flatnonzero(new_bucket) + 1))
+    bucket_ids = np.concatenate(([0], np.cumsum(new_bucket)))
+
+    def first_of_each_bucket(values):
+        """Index of the first point of each bucket whose y value is the value of its bucket (NaN never matches)"""
+        indexes = np.flatnonzero(y == values[bucket_ids])
+        ids = bucket_ids[indexes]
+        first = np.ones(len(indexes), dtype=bool)
+        first[1:] = ids[1:] != ids[:-1]
+        return indexes[first]
+
+    indexes = np.unique(np.concatenate((
+        starts,
+        np.append(starts[1:] - 1, count - 1),                   # last point of each bucket
+        first_of_each_bucket(np.fmin.reduceat(y, starts)),      # minimum, the NaN values are ignored
+        first_of_each_bucket(np.fmax.reduceat(y, starts))       # maximum
+    )))
+    return x[indexes], y[indexes]
+
+
+class LevelOfDetail:
+    """
+    Level of detail class.
+    Only change what is drawn, the values stored (and written in the save file) are not modified:
+    - only the points of the visible x range of a line are drawn, when its x values are sorted (see
+      get_visible_slice()). After a zoom or a pan, its points are taken again (see RenderScheduler).
+    - when a line has more visible points than points_per_pixel per horizontal pixel of its axis, it is decimated
+      (see decimate()). Only the lines whose x values are sorted are decimated.
+    - when a line has more visible points than marker_density per horizontal pixel, its markers are hidden, as they
+      would overlap. They are shown again when the density decreases.
+    """
+    def __init__(self, enabled=True, points_per_pixel=4, marker_density=0.2):
+        """
+        :param enabled: If False, all the points and markers are drawn
+        :param points_per_pixel: Maximum number of points drawn per horizontal pixel
+        :param marker_density: Maximum number of points per horizontal pixel to draw the markers
+        """
+        self.enabled = enabled
+        self.points_per_pixel = points_per_pixel
+        self.marker_density = marker_density
+        self._hidden_markers = weakref.WeakKeyDictionary()  # line: marker hidden
+
+    def get_data(self, line):
+        """
+        Get the values of a line to draw, and hide or show its markers
+        :param line: The given line
+        :return: The x and y values to draw
+        """
+        x, y = get_data(line)
+        if not self.enabled:
+            return x, y
+
+        x_min, x_max = sorted(line.axes.get_xlim())
+        is_sorted = get_buffer(line).is_sorted() and x_min < x_max
+        if is_sorted:
+            visible = get_visible_slice(x, x_min, x_max)
+            x, y = x[visible], y[visible]
+
+        width = max(line.axes.bbox.width, 1)
+        density = len(x) / width
+        if density > self.marker_density:
+            if line not in self._hidden_markers and line.get_marker() not in ("None", "", " ", None):
+                self._hidden_markers[line] = line.get_marker()
+                line.set_marker("None")
+        elif line in self._hidden_markers:
+            line.set_marker(self._hidden_markers.pop(line))
+
+        if density > self.points_per_pixel and is_sorted:
+            return decimate(x, y, x_min, x_max, int(width))
+        return x, y
+
+    def forget_marker(self, line):
+        """The marker of the line has been set: it is not restored anymore"""
+        self._hidden_markers.pop(line, None)
+
+
+class RenderScheduler:
+    """
+    Render scheduler class.
+    The values added to a line are only stored in its buffer, and the line is marked dirty. At most fps times per
+    second, render() gives the new values of each dirty line to matplotlib once (decimated, see LevelOfDetail),
+    rescales each axis containing a dirty line once (see Autoscaler), synchronizes the linked axes (see AxesLinker),
+    and redraws the figures. When the x limits of an axis change (new values, zoom, pan, ...), its lines are marked
+    dirty: their visible points are decimated again.
+    If blit is True and the backend supports it, only the axes containing a dirty line are redrawn (see FigureBlitter).
+    """
+    def __init__(self, fps=default_fps, blit=True):
+        """
+        :param fps: Maximum number of frames per second. 0 to render at each call of render().
+        :param blit: Use blitting to redraw only the lines, when the backend supports it
+        """
+        self.fps = fps
+        self.blit = blit
+        self.frame_count = 0
+        self._dirty_lines = {}     # used as an ordered set
+        self._next_frame_time = 0
+        self._blitters = weakref.WeakKeyDictionary()
+        self._watched_axes = weakref.WeakKeyDictionary()    # axis: its callback registry, watching its x limits
+        self.autoscaler = Autoscaler()
+        self.axes_linker = AxesLinker()
+        self.level_of_detail = LevelOfDetail()
+
+    def mark_dirty(self, line):
+        """Mark a line as modified: it will be updated at the next frame"""
+        self._dirty_lines[line] = None
+
+    def _watch_xlim(self, axis):
+        """Connect the "xlim_changed" callback of an axis, if not done yet, or if its callbacks were reset (clear())"""
+        if self._watched_axes.get(axis) is not axis.callbacks:
+            self._watched_axes[axis] = axis.callbacks
+            axis.callbacks.connect("xlim_changed", self._on_xlim_changed)
+
+    def _on_xlim_changed(self, axis):
+        """The x limits of an axis have changed: its lines are decimated again at the next frame"""
+        if self.level_of_detail.enabled:
+            for line in axis.lines:
+                self.mark_dirty(line)
+
+    def request_full_redraw(self, fig):
+        """Redraw the whole figure at the next frame, not only its lines"""
+        if fig in self._blitters:
+            self._blitters[fig].full_redraw_requested = True
+
+    def is_frame_due(self):
+        """True if the time of the next frame is reached"""
+        return self.fps <= 0 or time.monotonic() >= self._next_frame_time
+
+    def flush(self):
+        """
+        Give the values of all the dirty lines to matplotlib, and rescale their axes
+        :return: The axes containing a dirty line
+        """
+        axes = {line.axes: None for line in self._dirty_lines
+                if line.axes is not None and line.axes.figure is not None}   # line or axis removed
+        # Limits first: the lines are decimated over the new x limits. Changing the x limits of an axis marks its
+        # lines dirty (see _on_xlim_changed())
+        for axis in axes:
+            self._watch_xlim(axis)
+            self.autoscaler.update(axis)
+        self.axes_linker.apply()
+
+        for line in self._dirty_lines:
+            if line.axes is None or line.axes.figure is None:
+                continue
+            line.set_data(*self.level_of_detail.get_data(line))
+            axes[line.axes] = None
+        self._dirty_lines.clear()
+        return axes
+
+    def render(self, figures, force=False):
+        """
+        Render a frame if its time is reached.
+        :param figures: The figures to redraw
+        :param force: If True, the frame is rendered even if its time is not reached
+        :return: True if a frame has been rendered
+        """
+        if not force and not self.is_frame_due():
+            return False
+        if self.fps > 0:
+            self._next_frame_time = time.monotonic() + 1 / self.fps
+
+        dirty_axes = self.flush()
+        for fig in figures:
+            if self.blit and fig.canvas.supports_blit:
+                if fig not in self._blitters:
+                    self._blitters[fig] = FigureBlitter(fig)
+                self._blitters[fig].render(dirty_axes)
+            elif fig.stale:
+                fig.canvas.draw_idle()
+            fig.canvas.flush_events()   # update the plot and take care of window events (like resizing etc.)
+        self.frame_count += 1
+        return True
+
+
+scheduler = RenderScheduler()
+
+
+def render(figures, force=False):
+    """
+    Render a frame if its time is reached (see RenderScheduler)
+    :param figures: The figures to redraw
+    :param force: If True, the frame is rendered even if its time is not reached
+    :return: True if a frame has been rendered
+    """
+    return scheduler.render(figures, force)
+
+
+headless = False    # see set_headless()
+
+
+def set_headless():
+    """
+    Use the Agg backend: the figures are only drawn in memory, without any window (see render_image()).
+    Must be called before the creation of the first figure.
+    """
+    global headless
+    plt.switch_backend("agg")
+    headless = True
+    scheduler.blit = False  # nothing is displayed between two images
+
+
+def render_image(fig):
+    """
+    Give the new values of the lines to matplotlib, and draw the figure in memory
+    :return: numpy array (height, width, 4) of the RGBA pixels (a copy)
+    """
+    scheduler.flush()
+    fig.canvas.draw()
+    return np.array(fig.canvas.buffer_rgba())
+
 
 def init_plot():
     """Init"""
     # this is the call to matplotlib that allows dynamic plotting
-    plt.ion()
+    if not headless:
+        plt.ion()
 
 
 def close(fig, close_event_id=None):
@@ -54,25 +536,11 @@ def create_plot(window_title=None, fig_title=None, close_event=None):
     if close_event is not None:
         cid = set_close_event(fig, close_event)
 
-    plt.show()
+    if not headless:
+        plt.show()
     return fig, cid
 
 
-def add_multi_axis(row, column):
-    """
-    Add multi axis
-    :return: The new figure
-    """
-
-    result = plt.subplots(nrows=row, ncols=column)
-    fig = result[0]
-    fig.set_size_inches(18.5, 10.5)
-    fig.set_dpi(80)
-
-    plt.show()
-    return fig
-
-
 def set_close_event(fig, close_event):
     """
     Set event closing
@@ -94,25 +562,17 @@ def set_window_title(fig, title):
 def set_title(fig, title, fontsize=16):
     """Set fig's title"""
     fig.suptitle(title, fontsize=fontsize)
-
-
-def refresh_plot(fig, interval=0.01):
-    """Refresh fig"""
-    fig.canvas.flush_events()   # update the plot and take care of window events (like resizing etc.)
-    time.sleep(interval)
-
-
-def clear_fig(fig):
-    """Clear fig"""
-    fig.clear()
+    scheduler.request_full_redraw(fig)
 
 
 def add_axis(fig, pos, title=None, xlabel=None, ylabel=None):
     """add axis"""
     # if pos is : 121
     # Cut your window in 1 row and 2 columns, and start a plot in the first part
+    # pos can also be a tuple (rows, columns, index)
 
-    axis = fig.add_subplot(pos)
+    axis = fig.add_subplot(*pos) if isinstance(pos, tuple) else fig.add_subplot(pos)
+    scheduler.request_full_redraw(fig)
 
     # update plot label/title
 
@@ -136,6 +596,7 @@ def set_axis_title(axis, title):
     """Set axis' title"""
     # axis.title.set_text(title)
     axis.set_title(title)
+    scheduler.request_full_redraw(axis.figure)
 
 
 def set_axis_label(axis, xlabel, ylabel):
@@ -147,16 +608,19 @@ def set_axis_label(axis, xlabel, ylabel):
 def set_axis_xlabel(axis, xlabel):
     """Set axis' xlabel"""
     axis.set_xlabel(xlabel)
+    scheduler.request_full_redraw(axis.figure)
 
 
 def set_axis_ylabel(axis, ylabel):
     """Set axis' ylabel"""
     axis.set_ylabel(ylabel)
+    scheduler.request_full_redraw(axis.figure)
 
 
 def clear_axis(axis):
     """Clear an axis"""
     axis.clear()
+    scheduler.axes_linker.on_cleared(axis)
 
 
 def remove_axis(axis):
@@ -176,18 +640,19 @@ def add_line(axis, x_value=None, y_value=None):
 
 def remove_line(line):
     """Remove a line"""
-    line.axes.lines.remove(line)
+    line.remove()
 
 
 def clear_line(line):
     """Clear line data"""
-    line.set_xdata(np.empty(0))
-    line.set_ydata(np.empty(0))
+    get_buffer(line).clear()
+    scheduler.mark_dirty(line)
 
 
 def set_color(line, color):
     """Set the line's color"""
     line.set_color(color)
+    scheduler.mark_dirty(line)
 
 
 def set_marker(line, marker):
@@ -195,6 +660,8 @@ def set_marker(line, marker):
     if marker is None or marker == "None" or marker == "none":
         marker = "None"
     line.set_marker(marker)
+    scheduler.level_of_detail.forget_marker(line)
+    scheduler.mark_dirty(line)
 
 
 def set_style(line, style):
@@ -202,210 +669,172 @@ def set_style(line, style):
     if style is None or style == "None" or style == "none":
         style = "None"
     line.set_linestyle(style)
+    scheduler.mark_dirty(line)
 
 
-def add_values(line, x, y, max_values=None, margin_coef=0.95):
+def get_buffer(line):
     """
-    Add values to a line.
+    Get the buffer storing the values of a line, created from the line's data if the line doesn't have one yet.
     :param line: The given line
-    :param x: float or array of float
-    :param y: float or array of float
-    :param max_values: Max values in the line
-    :param margin_coef: Not used
-    """
-
-    if isinstance(x, float) or isinstance(x, int):
-        x = [x]
-    if isinstance(y, float) or isinstance(y, int):
-        y = [y]
-
-    if type(x) is not type(y):
-        raise ValueError(f"x and y must be of the same type! x type: {type(x)} | y type: {type(y)}")
-
-    if len(x) != len(y):
-        raise ValueError(f"x and y datas required the same length! x length : {len(x)} | y length: {len(y)}")
-
-    x_data = np.append(line.get_xdata(), x)
-    y_data = np.append(line.get_ydata(), y)
-
-    if max_values is not None:
-        if max_values < 1:
-            raise ValueError("max_values is a positive no-null integer")
-        else:
-            # manage size of data
-            diff = len(x_data) - max_values
-            if diff > 0:    # too many values
-                x_data = x_data[diff:]
-                y_data = y_data[diff:]
-    """
-    x_min = np.min(x_data)
-    x_max = np.max(x_data)
-    y_min = np.min(y_data)
-    y_max = np.max(y_data)
-
-    x_lim_min, x_lim_max = line.axes.get_xlim()
-    y_lim_min, y_lim_max = line.axes.get_ylim()
-
-    x_lim_min *= margin_coef
-    x_lim_max *= margin_coef
-    y_lim_min *= margin_coef
-    y_lim_max *= margin_coef
-
-    marge_bound_coef = 0.10
-
-    # check x bounds
-    if x_min <= x_lim_min or x_max >= x_lim_max:
-        std = np.std(x_data)
-        if std == 0:
-            std = 0.1
-
-        if x_min <= x_lim_min and x_max < x_lim_max:        # just x min
-            line.axes.set_xlim([x_min - std, x_lim_max + std * marge_bound_coef])
-        elif x_min > x_lim_min and x_max >= x_lim_max:      # just x max
-            if max_values is None:
-                line.axes.set_xlim([x_lim_min - std * marge_bound_coef, x_max + std])
-            else:
-                line.axes.set_xlim([x_min - std * marge_bound_coef, x_max + std])
-        else:                                               # both
-            line.axes.set_xlim([x_min - std, x_max + std])
-
-    # check y bounds
-    # TODO: Resize y bounds better
-    if y_min <= y_lim_min or y_max >= y_lim_max:
-        std = np.std(y_data)
-        if std == 0:
-            std = 0.1
-
-        if y_min <= y_lim_min and y_max < y_lim_max:        # just y min
-            line.axes.set_ylim([y_min - std, y_lim_max + std * marge_bound_coef])
-        elif y_min > y_lim_min and y_max >= y_lim_max:      # just x max
-            line.axes.set_ylim([y_lim_min - std * marge_bound_coef, y_max + std])
-        else:                                               # both
-            line.axes.set_ylim([y_min - std, y_max + std])
-    """
-
-    line.set_xdata(x_data)
-    line.set_ydata(y_data)
-
-    line.axes.relim()                  # recompute the data limits
-    line.axes.autoscale_view()         # automatic axis scaling
-
-
-def get_line_derivative(line, degree=1):
-    """Get derived from a line"""
-    return get_derivative(get_xdata(line), get_ydata(line), degree)
-
-
-def get_derivative(x_data, y_data, degree=1):
-    """
-    Get derived value
-    :param x_data: The x array
-    :param y_data: The y array
-    :param degree: The degree of derivation
-    :return: Dy / Dx of the desired degree
+    :return: The LineBuffer of the line
     """
-    if degree < 0:
-        raise ValueError("Degree is positive or null : *degree* >= 0")
-    if degree == 0:         # derivative function of degree 0 is itself
-        return y_data[-1]
-
-    if len(x_data) <= degree:
-        raise IndexError("Not enough value")
-
-    if degree == 1:
-        x0 = x_data[-2]
-        x1 = x_data[-1]
-        y0 = y_data[-2]
-        y1 = y_data[-1]
-        return (y1 - y0) / (x1 - x0)
-
-    new_x_data = [None for _ in range(degree)]
-    new_y_data = [None for _ in range(degree)]
-
-    # take only the required values to compute the next recursion
-    for i in range(degree):
-        x0 = x_data[-2 - i]
-        x1 = x_data[-1 - i]
-        y0 = y_data[-2 - i]
-        y1 = y_data[-1 - i]
-        new_x_data[-1 - i] = x1
-        new_y_data[-1 - i] = (y1 - y0) / (x1 - x0)
-
-    return get_derivative(new_x_data, new_y_data, degree - 1)
-
-
-def compute_derivative(ori_line, derived_line, max_values: int, degree: int):
-    """Add all missing derivative values to have the same number of points as the main line"""
-    ori_xdata, ori_ydata = get_data(ori_line)
-    derived_xdata = get_xdata(derived_line)
-    derived_xdata_len = len(derived_xdata)
-    ori_xdata_len = len(ori_xdata)
-
-    if derived_xdata_len > ori_xdata_len:
-        clear_line(derived_line)
-        derived_xdata = get_xdata(derived_line)
-        derived_xdata_len = len(derived_xdata)
-
-    if derived_xdata_len == 0:
-        diff = ori_xdata_len
-    else:
-        index_equal = 1
-        # Try to find the last derived x in the original list
-        while ori_xdata[-index_equal] != derived_xdata[-1] and index_equal <= ori_xdata_len:
-            index_equal += 1
-        if index_equal >= ori_xdata_len:  # If no match
-            diff = ori_xdata_len
-        else:
-            diff = index_equal - 1  # We go back 1 because we started at 1
-
-    new_x = [None for _ in range(diff)]
-    new_y = [None for _ in range(diff)]
-
-    for i in range(0, diff):
-        start_index = -diff - degree + i
-        if start_index < -ori_xdata_len:
-            continue
-        end_index = -diff + i + 1
-        if end_index == 0:
-            x_to_add = ori_xdata[start_index:]
-            y_to_add = ori_ydata[start_index:]
-        else:
-            x_to_add = ori_xdata[start_index:end_index]
-            y_to_add = ori_ydata[start_index:end_index]
-        try:
-            y = get_derivative(x_to_add, y_to_add, degree)
-            # only if y computed, new_x and new_y are feed
-            new_x[i] = x_to_add[-1]
-            new_y[i] = y
-        except IndexError:  # if not enough data to build a derived
-            pass
-
-    new_x = [x for x in new_x if x is not None]
-    new_y = [y for y in new_y if y is not None]
-    if len(new_x) > 0:
-        add_values(derived_line, new_x, new_y, max_values)
+    buffer = _line_buffers.get(line)
+    if buffer is None:
+        buffer = LineBuffer(line.get_xdata(), line.get_ydata())
+        _line_buffers[line] = buffer
+    return buffer
 
 
 def get_data(line):
-    """Get xdata and ydata"""
-    return line.get_data()
-
-
-def get_xdata(line):
-    """get x_data"""
-    return line.get_xdata()
-
-
-def get_ydata(line):
-    """get y_data"""
-    return line.get_ydata()
+    """Get xdata and ydata (views of the line buffer, not copies)"""
+    return get_buffer(line).get_data()
 
 
 def synchronize_axes(ori_axis, axes):
     """Synchronize the X axis dimensions with respect of the ori_axis dimensions."""
+    scheduler.flush()   # the limits of ori_axis are up to date
     x_min_ori, x_max_ori = ori_axis.get_xlim()
     for axis in axes:
         x_min, x_max = axis.get_xlim()
 
         if x_min != x_min_ori or x_max != x_max_ori:
             axis.set_xlim(x_min_ori, x_max_ori)
+
+
+def link_axes(ori_axis, axes, interval: float):
+    """
+    Synchronize the X axis dimensions of the axes with respect of the ori_axis dimensions, each time they change
+    (see AxesLinker).
+    :param interval: Minimum time between two synchronizations (in seconds)
+    """
+    scheduler.axes_linker.link(ori_axis, axes, interval)
+
+
+def unlink_axes(ori_axis, axes=None):
+    """Stop the synchronization of the axes (all if None) with ori_axis"""
+    scheduler.axes_linker.unlink(ori_axis, axes)
+
+
+class SceneRenderer:
+    """
+    Scene renderer class.
+    Apply the changes of a scene (see scene.py) to a matplotlib figure, at each call of sync(). The figure is created
+    with the first axis, and kept until close() is called. Each axis and each line of the scene is linked to its
+    matplotlib artist by its id: only the objects added, removed or modified since the last sync() are updated, and the
+    lines use the buffers of the scene (see get_buffer()).
+    """
+    def __init__(self, scene, window_title=None, close_event=None):
+        """
+        :param scene: The scene rendered
+        :param window_title: The title of the window
+        :param close_event: Function called when the window is closed
+        """
+        self.scene = scene
+        self.window_title = window_title
+        self.close_event = close_event
+        self.fig = None
+        self._close_event_id = None
+        self._title_revision = None
+        # axis id: {"axis": matplotlib axis, "revision", "clear_count", "links": {axis id: interval},
+        #           "lines": {line id: {"line": matplotlib line, "revision", "data": (total_count, clear_count)}}}
+        self._axes = {}
+
+    def sync(self):
+        """Apply the changes of the scene to the figure"""
+        scene = self.scene
+        if self.fig is None:
+            if len(scene.axes) == 0:
+                return
+            init_plot()
+            self.fig, self._close_event_id = create_plot(self.window_title, close_event=self.close_event)
+
+        if self._title_revision != scene.revision:
+            self._title_revision = scene.revision
+            set_title(self.fig, scene.title or "")
+
+        for axis_id in [axis_id for axis_id in self._axes if scene.get(axis_id) is None]:
+            self._remove_axis(axis_id)
+        for axis in scene.axes:
+            self._sync_axis(axis)
+        for axis in scene.axes:
+            self._sync_links(axis)
+
+        for ori_axis, axes in scene.synchronizations:
+            if ori_axis.id in self._axes:     # not removed since
+                synchronize_axes(self._axes[ori_axis.id]["axis"],
+                                 [self._axes[axis.id]["axis"] for axis in axes if axis.id in self._axes])
+        scene.synchronizations.clear()
+
+    def _remove_axis(self, axis_id):
+        """Remove the artist of an axis removed from the scene"""
+        axis = self._axes.pop(axis_id)["axis"]
+        unlink_axes(axis)
+        remove_axis(axis)
+
+    def _sync_axis(self, scene_axis):
+        """Create or update the artist of an axis and its lines"""
+        entry = self._axes.get(scene_axis.id)
+        if entry is None:
+            axis = add_axis(self.fig, scene_axis.pos, scene_axis.title, scene_axis.xlabel, scene_axis.ylabel)
+            entry = self._axes[scene_axis.id] = {"axis": axis, "revision": scene_axis.revision,
+                                                 "clear_count": scene_axis.clear_count, "links": {}, "lines": {}}
+        axis = entry["axis"]
+
+        if entry["clear_count"] != scene_axis.clear_count:
+            entry["clear_count"] = scene_axis.clear_count
+            clear_axis(axis)
+            entry["lines"] = {}
+        if entry["revision"] != scene_axis.revision:
+            entry["revision"] = scene_axis.revision
+            set_axis_title(axis, scene_axis.title or "")
+            set_axis_label(axis, scene_axis.xlabel or "", scene_axis.ylabel or "")
+
+        lines = entry["lines"]
+        line_ids = {scene_line.id for scene_line in scene_axis.lines}
+        for line_id in [line_id for line_id in lines if line_id not in line_ids]:
+            remove_line(lines.pop(line_id)["line"])
+
+        for scene_line in scene_axis.lines:
+            line_entry = lines.get(scene_line.id)
+            if line_entry is None:
+                line = add_line(axis)
+                _line_buffers[line] = scene_line.buffer
+                line_entry = lines[scene_line.id] = {"line": line, "revision": None, "data": None}
+            line = line_entry["line"]
+
+            if line_entry["revision"] != scene_line.revision:
+                line_entry["revision"] = scene_line.revision
+                if scene_line.color is not None:
+                    set_color(line, scene_line.color)
+                if scene_line.marker is not None:
+                    set_marker(line, scene_line.marker)
+                if scene_line.style is not None:
+                    set_style(line, scene_line.style)
+
+            buffer = scene_line.buffer
+            data = (buffer.total_count, buffer.clear_count)
+            if line_entry["data"] != data:
+                line_entry["data"] = data
+                scheduler.mark_dirty(line)
+
+    def _sync_links(self, scene_axis):
+        """Update the axes following the x limits of an axis (see AxesLinker)"""
+        entry = self._axes[scene_axis.id]
+        if entry["links"] == scene_axis.links:
+            return
+        axis = entry["axis"]
+        removed = [axis_id for axis_id in entry["links"] if axis_id not in scene_axis.links]
+        unlink_axes(axis, [self._axes[axis_id]["axis"] for axis_id in removed if axis_id in self._axes])
+        for axis_id, interval in scene_axis.links.items():
+            if entry["links"].get(axis_id) != interval:
+                link_axes(axis, [self._axes[axis_id]["axis"]], interval)
+        entry["links"] = dict(scene_axis.links)
+
+    def close(self):
+        """Close the figure. A new one is created by the next sync() if the scene has axes."""
+        if self.fig is not None:
+            close(self.fig, self._close_event_id)
+        self.fig = None
+        self._close_event_id = None
+        self._title_revision = None
+        self._axes = {}
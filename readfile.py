@@ -1,11 +1,13 @@
 # -*- coding: utf-8 -*-
 
 """
-Module
+Readfile module
 
 Copyright © 2022 Roman Clavier
 
-Python describing
+Check a save file written by main.py: the number of columns and the types of the values of its lines.
+The file is read by chunks (see iter_lines()): the summaries are computed line by line, and the rows are only parsed
+again when they are used (see iter_rows()), so the memory used doesn't depend on the size of the file.
 """
 
 import argparse
@@ -14,6 +16,8 @@ import time
 
 import tools
 
+default_chunk_size = 1024 * 1024    # characters read at once
+
 
 def main():
     """Main function"""
@@ -21,45 +25,91 @@ def main():
     base_path = os.path.join(os.getcwd(), "data")
 
     if args.read:
+        chunk_size = args.chunk_size * 1024
         if os.path.exists(args.read):
-            read_file(args.read)
+            read_file(args.read, chunk_size)
         elif os.path.exists(os.path.join(base_path, args.read)):
-            read_file(args.read)
+            read_file(os.path.join(base_path, args.read), chunk_size)
         else:
             print(f"File not found: {args.read}")
             print("You can give a relative path to access a file in the source folder, or an absolute path to read any "
                   "file.")
 
 
-def read_file(filename: str):
+def iter_lines(filename: str, chunk_size=default_chunk_size):
     """
-    Read the given file and build the line.
+    Read a file by chunks of fixed size, instead of loading it at once
     :param filename: Path of the file
-    :return: None
+    :param chunk_size: The number of characters read at once
+    :return: generator of string: the lines of the file, without their end of line
+    """
+    with open(filename) as file:
+        rest = ""
+        while chunk := file.read(chunk_size):
+            lines = (rest + chunk).split("\n")
+            rest = lines.pop()      # incomplete line, completed by the next chunk
+            yield from lines
+    if rest:
+        yield rest
+
+
+def parse_line(line: str, sep=None):
+    """
+    Split a line into values
+    :param line: The line
+    :param sep: The separator of the columns, None if the line is a single column
+    :return: array of values: float if they are numbers, else string. The empty values are removed.
+    """
+    split_line = line.strip().split(sep) if sep else [line.strip()]
+    split_line = [x.strip() for x in split_line if x.strip()]
+
+    for index, item in enumerate(split_line):
+        try:
+            split_line[index] = float(item)
+        except ValueError:
+            pass
+    return split_line
+
+
+def iter_rows(filename: str, sep=None, excluded_lines=None, chunk_size=default_chunk_size):
+    """
+    Parse the lines of a file one by one, when they are used
+    :param filename: Path of the file
+    :param sep: See parse_line()
+    :param excluded_lines: array of DataLines: the lines to skip (numbered from 1). None to keep all the lines.
+    :param chunk_size: See iter_lines()
+    :return: generator of array of values (see parse_line())
+    """
+    excluded_lines = sorted(excluded_lines or [], key=lambda datalines: datalines.start)
+    excluded_index = 0
+    for index, line in enumerate(iter_lines(filename, chunk_size)):
+        while excluded_index < len(excluded_lines) and excluded_lines[excluded_index].end < index + 1:
+            excluded_index += 1
+        if excluded_index < len(excluded_lines) and excluded_lines[excluded_index].start <= index + 1:
+            continue
+        yield parse_line(line, sep)
+
+
+def analyze_file(filename: str, sep=None, chunk_size=default_chunk_size):
+    """
+    Count the columns and the types of the values of each line of a file, without keeping the lines
+    :param filename: Path of the file
+    :param sep: See parse_line()
+    :param chunk_size: See iter_lines()
+    :return: dict {number of columns: DataCount}, dict {type name: DataCount}, and the values of the first line (None
+    if the file is empty)
     """
-    sep = None
     columns_count = dict()
     types = dict()
-    col_format = "{:<20}\t{:<20}\t{:}"
-    headers = None
-    editing = True
-
-    with open(filename) as file:
-        lines = file.readlines()
-    if tools.input_choices("File contains columns?") == "y":
-        sep = tools.input_validation("Input the separator used: ")
+    first_line = None
 
-    for index, line in enumerate(lines):
-        line = line.strip()
-        split_line = line.split(sep) if sep else [line]
-        split_line = [x.strip() for x in split_line if x.strip()]
+    for index, line in enumerate(iter_lines(filename, chunk_size)):
+        split_line = parse_line(line, sep)
+        if index == 0:
+            first_line = split_line
 
-        for index2, item in enumerate(split_line):
-            try:
-                split_line[index2] = float(split_line[index2])
-            except ValueError:
-                pass
-            tmp = type(split_line[index2]).__name__
+        for item in split_line:
+            tmp = type(item).__name__
             if tmp in types.keys():
                 types[tmp].count += 1
                 datalines = types[tmp].lines[-1]
@@ -83,9 +133,26 @@ def read_file(filename: str):
         else:
             columns_count[tmp] = DataCount(1, [DataLines(index + 1)])
 
-        lines[index] = split_line
+    return columns_count, types, first_line
 
-    del index, index2, line, item, split_line, file
+
+def read_file(filename: str, chunk_size=default_chunk_size):
+    """
+    Read the given file and build the line.
+    The file is read by chunks: only the summaries of its lines are kept in memory.
+    :param filename: Path of the file
+    :param chunk_size: See iter_lines()
+    :return: generator of the rows kept (see iter_rows()), parsed when they are used
+    """
+    sep = None
+    col_format = "{:<20}\t{:<20}\t{:}"
+    headers = None
+    excluded_lines = []
+
+    if tools.input_choices("File contains columns?") == "y":
+        sep = tools.input_validation("Input the separator used: ")
+
+    columns_count, types, first_line = analyze_file(filename, sep, chunk_size)
 
     tmp = sorted(types.items())
     types.clear()
@@ -127,7 +194,7 @@ def read_file(filename: str):
         if "str" in types.keys() and types["str"].lines[0].start == 1:
             print()
             if tools.input_choices("This file contains headers (at line 1)?") == "y":
-                headers = lines[0]
+                headers = first_line
                 headers_str = " ; ".join(headers)
                 print(f"Headers: {headers_str}")
                 del headers_str
@@ -141,18 +208,11 @@ def read_file(filename: str):
         match tools.input_choices("Choice", ["1", "2", "3"]):
             case "1":
                 available_types = ["float", "int"]
-                index_to_remove = []
                 for item in types:
                     if item not in available_types:
-                        for dataline in types[item].lines:
-                            for index in range(dataline.start - 1, dataline.end):
-                                if index not in index_to_remove:
-                                    index_to_remove.append(index)
-
-                for index in range(0, len(index_to_remove)):
-                    lines.pop(index_to_remove[index] - index)
+                        excluded_lines.extend(types[item].lines)
 
-                del available_types, item, dataline, index, index_to_remove
+                del available_types, item
 
             case "2":
                 pass
@@ -169,7 +229,7 @@ def read_file(filename: str):
         print("File is empty? No column found!")
         tools.exit_program()
 
-    pass
+    return iter_rows(filename, sep, excluded_lines, chunk_size)
 
 
 class DataCount:
@@ -208,5 +268,7 @@ if __name__ == "__main__":
     parser.add_argument("-r", "--read", type=str, help="read the file selected. You can give a relative path to access "
                                                        "a file in the source folder, or an absolute path to read any "
                                                        "file.")
-    # TODO: add user info in readme
+    parser.add_argument("-cs", "--chunk-size", type=int, default=default_chunk_size // 1024,
+                        help=f"set the number of characters read at once, in KiB. Default: "
+                             f"{default_chunk_size // 1024}")
     main()
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+
+"""
+Scene module
+
+Copyright © 2022 Roman Clavier
+
+The content of the figure of a session, independent of the renderer: its axes, their lines, their styles and their
+values. The commands received only modify the scene, then a renderer (see pyplot_utils.SceneRenderer) applies all the
+changes to the figure at once, at each frame.
+
+Each axis and each line has a stable id, never reused: the renderer links its own objects to these ids, so removing an
+axis or a line, or changing the layout, only updates the objects concerned instead of rebuilding the figure.
+"""
+
+from line_buffer import LineBuffer, DerivativeStream
+
+
+class SceneLine:
+    """Scene line class. The values of a line and its style."""
+    def __init__(self, line_id: int, axis, color=None):
+        self.id = line_id
+        self.axis = axis
+        self.buffer = LineBuffer()
+        self.color = color      # None for the default color of the renderer
+        self.marker = None      # None for the default marker of the renderer
+        self.style = None       # None for the default style of the renderer
+        self.revision = 0       # incremented at each change of the style
+        self.derivative_stream = None   # see Scene.compute_derivative()
+
+
+class SceneAxis:
+    """Scene axis class. The lines of an axis, its position and its titles."""
+    def __init__(self, axis_id: int, pos, title=None, xlabel=None, ylabel=None):
+        """
+        :param axis_id: The id of the axis
+        :param pos: The position of the axis: 3 digits integer (example: 121, see -aa) or tuple (rows, columns, index)
+        """
+        self.id = axis_id
+        self.pos = pos
+        self.title = title
+        self.xlabel = xlabel
+        self.ylabel = ylabel
+        self.lines = []
+        self.links = {}         # id of an axis following the x limits of this one: interval (see -sa)
+        self.revision = 0       # incremented at each change of the titles
+        self.clear_count = 0    # incremented each time the axis is cleared
+
+
+class Scene:
+    """
+    Scene class.
+    The axes and the lines are given by their number (starting at 1), as in the commands, or by their id.
+    """
+    def __init__(self):
+        self.title = None
+        self.axes = []
+        self.revision = 0       # incremented at each change of the title
+        self.synchronizations = []  # (axis, axes) whose x limits must be synchronized once, by the renderer
+        self._objects = {}      # id: SceneAxis or SceneLine
+        self._last_id = 0
+
+    def _new_id(self):
+        """Get a new id"""
+        self._last_id += 1
+        return self._last_id
+
+    def get(self, object_id: int):
+        """Get an axis or a line by its id, None if it doesn't exist anymore"""
+        return self._objects.get(object_id)
+
+    def get_axis(self, axis_index: int):
+        """Get an axis by its number"""
+        return self.axes[int(axis_index) - 1]
+
+    def get_line(self, axis_index: int, line_index: int):
+        """Get a line by the number of its axis and its number"""
+        return self.get_axis(axis_index).lines[int(line_index) - 1]
+
+    def set_title(self, title):
+        """Set the title of the figure"""
+        self.title = title
+        self.revision += 1
+
+    def clear(self):
+        """Remove all the axes, and the title"""
+        for axis in list(self.axes):
+            self.remove_axis(axis)
+        self.synchronizations.clear()
+        self.set_title(None)
+
+    def add_axis(self, pos, title=None, xlabel=None, ylabel=None):
+        """
+        Add an axis
+        :return: The new axis
+        """
+        axis = SceneAxis(self._new_id(), pos, title, xlabel, ylabel)
+        self._objects[axis.id] = axis
+        self.axes.append(axis)
+        return axis
+
+    def set_grid(self, row: int, column: int):
+        """Replace all the axes by a grid of new axes"""
+        for axis in list(self.axes):
+            self.remove_axis(axis)
+        for index in range(row * column):
+            self.add_axis((row, column, index + 1))
+
+    def remove_axis(self, axis):
+        """Remove an axis and its lines"""
+        self.axes.remove(axis)
+        del self._objects[axis.id]
+        for line in axis.lines:
+            del self._objects[line.id]
+        for other_axis in self.axes:
+            other_axis.links.pop(axis.id, None)
+
+    def clear_axis(self, axis):
+        """Remove all the lines of an axis, and its titles"""
+        for line in axis.lines:
+            del self._objects[line.id]
+        axis.lines = []
+        axis.title = axis.xlabel = axis.ylabel = None
+        axis.clear_count += 1
+
+    def set_axis_title(self, axis, title):
+        """Set the title of an axis"""
+        axis.title = title
+        axis.revision += 1
+
+    def set_axis_labels(self, axis, xlabel, ylabel):
+        """Set the labels of an axis"""
+        axis.xlabel = xlabel
+        axis.ylabel = ylabel
+        axis.revision += 1
+
+    def link_axes(self, ori_axis, axes: [], interval: float):
+        """Make axes follow the x limits of a reference axis, at most once per interval (in seconds)"""
+        for axis in axes:
+            ori_axis.links[axis.id] = interval
+
+    def unlink_axes(self, ori_axis, axes=None):
+        """Stop following the x limits of a reference axis, for the given axes (all if None)"""
+        if axes is None:
+            ori_axis.links.clear()
+        for axis in axes or []:
+            ori_axis.links.pop(axis.id, None)
+
+    def synchronize_axes(self, ori_axis, axes: []):
+        """Give the x limits of a reference axis to axes, once"""
+        self.synchronizations.append((ori_axis, axes))
+
+    def add_line(self, axis, color=None):
+        """
+        Add a line to an axis
+        :return: The new line
+        """
+        line = SceneLine(self._new_id(), axis, color)
+        self._objects[line.id] = line
+        axis.lines.append(line)
+        return line
+
+    def remove_line(self, line):
+        """Remove a line"""
+        line.axis.lines.remove(line)
+        del self._objects[line.id]
+
+    def set_color(self, line, color):
+        """Set the color of a line"""
+        line.color = color
+        line.revision += 1
+
+    def set_marker(self, line, marker):
+        """Set the marker of a line"""
+        line.marker = marker
+        line.revision += 1
+
+    def set_style(self, line, style):
+        """Set the style of a line"""
+        line.style = style
+        line.revision += 1
+
+    def clear_line(self, line):
+        """Remove all the values of a line"""
+        line.buffer.clear()
+
+    def add_values(self, line, x, y, max_values=None):
+        """
+        Add values to a line.
+        :param line: The given line
+        :param x: float or array of float
+        :param y: float or array of float
+        :param max_values: Max values in the line
+        """
+        if isinstance(x, float) or isinstance(x, int):
+            x = [x]
+        if isinstance(y, float) or isinstance(y, int):
+            y = [y]
+
+        if len(x) != len(y):
+            raise ValueError(f"x and y datas required the same length! x length : {len(x)} | y length: {len(y)}")
+
+        if max_values is not None and max_values < 1:
+            raise ValueError("max_values is a positive no-null integer")
+
+        line.buffer.append(x, y, max_values)
+
+    def compute_derivative(self, ori_line, derived_line, max_values: int, degree: int):
+        """Add all missing derivative values to have the same number of points as the main line"""
+        stream = derived_line.derivative_stream
+        if stream is None or stream.ori_buffer is not ori_line.buffer or stream.degree != degree:
+            stream = DerivativeStream(ori_line.buffer, degree)
+            derived_line.derivative_stream = stream
+
+        _, new_x, new_y = stream.update(derived_line.buffer)
+        if len(new_x) > 0:
+            self.add_values(derived_line, new_x, new_y, max_values)
@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+
+"""
+serial_utils module
+
+Copyright © 2022 Roman Clavier
+
+This module is helping to use the serial (pyserial) module
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import fnmatch
+import queue
+import threading
+import time
+
+import serial
+import serial.tools.list_ports
+
+default_queue_size = 10000
+default_baud_rate = 9600
+default_probe_window = 2.5  # an Arduino is reset when the port is opened, and its bootloader takes ~2 seconds
+
+# Tried in this order by probe_baud_rate()
+standard_baud_rates = [9600, 115200, 57600, 38400, 19200, 230400, 250000, 500000, 1000000, 2000000, 4800, 2400, 1200]
+
+
+class LineSplitter:
+    """
+    Line splitter class.
+    Split the chunks of bytes given into complete lines, keeping the partial trailing line for the next chunk.
+    """
+    def __init__(self, delimiter=b"\n"):
+        self._delimiter = delimiter
+        self._pending = b""
+
+    def feed(self, chunk: bytes):
+        """
+        Add a chunk of bytes.
+        :param chunk: The bytes read
+        :return: array of bytes, all the complete lines (without the delimiter)
+        """
+        lines = (self._pending + chunk).split(self._delimiter)
+        self._pending = lines.pop()
+        return lines
+
+
+class SerialReader(threading.Thread):
+    """
+    Serial reader class.
+    Own the serial port reading in a background thread, and push each line received with its receive time into a
+    bounded queue. The GUI thread drains the queue using get_lines().
+    In bulk mode, all the bytes waiting in the serial buffer are read in one call, instead of one line per call.
+    The lines can be delimited by another byte than b"\n" (binary frames for example), using the bulk mode.
+    """
+    def __init__(self, serial_port, queue_size=default_queue_size, bulk=False, initial_lines=None, delimiter=b"\n"):
+        super().__init__(name=f"SerialReader-{serial_port.name}", daemon=True)
+        self._serial_port = serial_port
+        self._bulk = bulk or delimiter != b"\n"
+        self._splitter = LineSplitter(delimiter)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._running = threading.Event()
+        self._running.set()
+        self.error = None
+        self.received_count = 0
+        self.dropped_count = 0
+
+        # Lines already read before the start of the thread (by a probe for example)
+        if initial_lines:
+            for receive_time, data_read in initial_lines:
+                self._push(receive_time, data_read)
+
+    def run(self):
+        """Read the serial port until stop() is called or an error occurred"""
+        while self._running.is_set():
+            try:
+                if self._bulk:
+                    # read(1) waits for the port timeout if nothing is available
+                    chunk = self._serial_port.read(self._serial_port.in_waiting or 1)
+                else:
+                    chunk = self._serial_port.readline()
+            except (serial.SerialException, OSError, TypeError) as err:
+                # TypeError can be raised by pyserial if the port is closed while reading
+                if self._running.is_set():
+                    self.error = err
+                break
+
+            if not chunk:
+                continue
+
+            receive_time = time.monotonic()
+            if self._bulk:
+                for data_read in self._splitter.feed(chunk):
+                    self._push(receive_time, data_read)
+            else:
+                self._push(receive_time, chunk)
+
+    def _push(self, receive_time, data_read):
+        """Push a line into the queue. If the queue is full, the line is dropped and counted."""
+        self.received_count += 1
+        try:
+            self._queue.put_nowait((receive_time, data_read))
+        except queue.Full:
+            self.dropped_count += 1
+
+    def get_lines(self):
+        """
+        Get all the lines currently waiting in the queue.
+        :return: array of tuple (receive_time, data_read)
+        """
+        lines = []
+        # Only take what is already queued, else a fast board could keep the GUI thread here forever
+        for _ in range(self._queue.qsize()):
+            try:
+                lines.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return lines
+
+    def stop(self, timeout=1.0):
+        """Stop the reading and wait the end of the thread"""
+        self._running.clear()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
+
+
+def read_until_valid(serial_port, is_valid, window=default_probe_window, delimiter=b"\n", cancel_event=None):
+    """
+    Read a serial port until a valid line is received, or the window is elapsed.
+    :param serial_port: The serial port opened
+    :param is_valid: Function taking a line (bytes) and returning True if it is valid
+    :param window: Maximum time to wait (in seconds)
+    :param delimiter: The end of line
+    :param cancel_event: threading.Event stopping the reading when it is set. None if not used.
+    :return: True if a valid line has been received, and the array of tuple (receive_time, data_read) read
+    """
+    splitter = LineSplitter(delimiter)
+    lines = []
+    end_time = time.monotonic() + window
+    while time.monotonic() < end_time and not (cancel_event and cancel_event.is_set()):
+        # read_until() never reads beyond the end of a line, so nothing is lost when a valid line is found
+        chunk = serial_port.read_until(delimiter)
+        if not chunk:
+            continue
+        receive_time = time.monotonic()
+        for data_read in splitter.feed(chunk):
+            lines.append((receive_time, data_read))
+            if is_valid(data_read):
+                return True, lines
+    return False, lines
+
+
+def probe_baud_rate(com_name, is_valid, baud_rates=None, window=default_probe_window, timeout=0.01,
+                    delimiter=b"\n", cancel_event=None):
+    """
+    Find the baud rate used by the board, trying each baud rate until a valid line is received.
+    :param com_name: Name of communication port
+    :param is_valid: Function taking a line (bytes) and returning True if it is valid
+    :param baud_rates: Baud rates to try. If None, standard_baud_rates is used.
+    :param window: Maximum time to wait a valid line for each baud rate (in seconds)
+    :param timeout: Timeout of the serial port returned
+    :param delimiter: The end of line
+    :param cancel_event: threading.Event stopping the probe when it is set. None if not used.
+    :return: The serial port opened at the right baud rate (None if not found), and the lines already read
+    :raise serial.SerialException: If the port can't be opened
+    """
+    if baud_rates is None:
+        baud_rates = standard_baud_rates
+
+    for baud_rate in baud_rates:
+        if cancel_event and cancel_event.is_set():
+            break
+        serial_port = serial.Serial(com_name, baudrate=baud_rate, timeout=timeout)
+        try:
+            valid, lines = read_until_valid(serial_port, is_valid, window, delimiter, cancel_event)
+        except serial.SerialException:
+            serial_port.close()
+            raise
+        if valid:
+            return serial_port, lines
+        serial_port.close()
+    return None, []
+
+
+def parse_vid_pid(text: str):
+    """
+    Parse a USB vendor id and product id, given in hexadecimal.
+    :param text: "VID:PID", example: "2341:0043". The PID can be omitted: "2341"
+    :return: tuple (vid, pid), pid is None if omitted
+    :raise ValueError: If the text is not valid
+    """
+    vid, _, pid = text.partition(":")
+    return int(vid, 16), int(pid, 16) if pid else None
+
+
+def find_ports(vid_pids=None, patterns=None):
+    """
+    Enumerate the serial ports of the computer, and keep the ones matching the filters.
+    If no filter is given, all the ports are returned.
+    :param vid_pids: array of tuple (vid, pid) (see parse_vid_pid), pid can be None to match any product
+    :param patterns: array of patterns (example: "*Arduino*") matching the description or the manufacturer, case
+    insensitive
+    :return: array of port names
+    """
+    ports = []
+    for port_info in serial.tools.list_ports.comports():
+        if vid_pids or patterns:
+            match_id = any(port_info.vid == vid and (pid is None or port_info.pid == pid) for vid, pid in vid_pids or [])
+            texts = [text.lower() for text in (port_info.description, port_info.manufacturer, port_info.product)
+                     if text]
+            match_text = any(fnmatch.fnmatch(text, pattern.lower()) for pattern in patterns or [] for text in texts)
+            if not (match_id or match_text):
+                continue
+        ports.append(port_info.device)
+    return ports
+
+
+def probe_ports(com_names, is_valid, baud_rate=default_baud_rate, window=default_probe_window, timeout=0.01,
+                delimiter=b"\n", cancel_event=None):
+    """
+    Probe all the given ports in parallel. The first port receiving a valid line wins, the other ones are closed.
+    :param com_names: Names of communication ports
+    :param is_valid: Function taking a line (bytes) and returning True if it is valid
+    :param baud_rate: Communication's frequency. If None, it is detected for each port (see probe_baud_rate).
+    :param window: Maximum time to wait a valid line (in seconds)
+    :param timeout: Timeout of the serial port returned
+    :param delimiter: The end of line
+    :param cancel_event: threading.Event stopping the probe when it is set. It is also set by the probe once a port
+    has won. None if not used.
+    :return: The serial port opened (None if no port is valid), and the lines already read
+    """
+    if not com_names:
+        return None, []
+
+    winner_found = cancel_event if cancel_event is not None else threading.Event()
+
+    def probe(com_name):
+        try:
+            if baud_rate is None:
+                return probe_baud_rate(com_name, is_valid, window=window, timeout=timeout, delimiter=delimiter,
+                                       cancel_event=winner_found)
+            serial_port = serial.Serial(com_name, baudrate=baud_rate, timeout=timeout)
+        except serial.SerialException:
+            return None, []
+        try:
+            valid, lines = read_until_valid(serial_port, is_valid, window, delimiter, winner_found)
+        except serial.SerialException:
+            valid, lines = False, []
+        if not valid:
+            serial_port.close()
+            return None, []
+        return serial_port, lines
+
+    result = None, []
+    with ThreadPoolExecutor(max_workers=len(com_names), thread_name_prefix="PortProbe") as executor:
+        futures = [executor.submit(probe, com_name) for com_name in com_names]
+        for future in as_completed(futures):
+            serial_port, lines = future.result()
+            if serial_port is None:
+                continue
+            if result[0] is None:
+                result = serial_port, lines
+                winner_found.set()
+            else:   # another port answered at the same time
+                serial_port.close()
+    return result
+
+
+class ConnectionProbe(threading.Thread):
+    """
+    Connection probe class.
+    Run a probe (probe_baud_rate() or probe_ports()) in a background thread: trying the baud rates or the ports takes
+    seconds, during which the other boards must still be read and the figures drawn. The result is read once the
+    thread is done.
+    """
+    def __init__(self, probe, *args, name="ConnectionProbe", **kwargs):
+        """
+        :param probe: The probe function, taking a cancel_event argument and returning (serial port, lines read)
+        :param args: The arguments of the probe function
+        :param name: Name of the thread
+        :param kwargs: The keyword arguments of the probe function
+        """
+        super().__init__(name=name, daemon=True)
+        self._probe = probe
+        self._args = args
+        self._kwargs = kwargs
+        self._cancel_event = threading.Event()
+        self._cancelled = False
+        self.serial_port = None     # the port opened, None if no valid command has been received
+        self.initial_lines = []     # the lines already read
+        self.error = None           # serial.SerialException raised by the probe, None if there isn't any
+
+    def run(self):
+        """Probe the ports"""
+        try:
+            serial_port, self.initial_lines = self._probe(*self._args, cancel_event=self._cancel_event,
+                                                          **self._kwargs)
+        except serial.SerialException as err:
+            self.error = err
+            return
+        if self._cancelled and serial_port:
+            serial_port.close()
+        else:
+            self.serial_port = serial_port
+
+    def cancel(self, timeout=1.0):
+        """
+        Stop the probe, and close the port it has opened
+        :param timeout: Maximum time to wait the end of the thread (in seconds)
+        """
+        self._cancelled = True
+        self._cancel_event.set()
+        if self.is_alive():
+            self.join(timeout)
+        if self.serial_port:
+            self.serial_port.close()
+            self.serial_port = None
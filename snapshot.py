@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+
+"""
+Snapshot module
+
+Copyright © 2022 Roman Clavier
+
+Save images of the figures at a fixed interval, without any window (headless mode, see main.py -hl option).
+
+The figures are drawn in memory by the GUI thread, then the images are saved by a background thread, so encoding and
+writing an image never delays the processing of the data received. If the writer is still busy with the previous
+images when a new one is drawn, the new one is dropped (and counted) instead of waiting.
+
+Three outputs are available, chosen from the path given:
+- "snapshot.png": a single PNG file, replaced by each new image (the file is always complete).
+- "frames/img_{:06d}.png": an image sequence, the path being formatted with the number of the image.
+- "video.mp4" (or .avi, .mkv, .mov, .webm): a video, the raw images being piped to ffmpeg.
+"""
+
+import os
+import queue
+import subprocess
+import threading
+import time
+
+import matplotlib.image
+
+default_interval = 1.0
+default_queue_size = 2
+video_extensions = (".mp4", ".avi", ".mkv", ".mov", ".webm")
+
+
+def get_output_path(path: str, index: int, count: int):
+    """
+    Get the output path of a figure. If there are several figures, the number of the figure is added to the file name.
+    :param path: The output path given
+    :param index: The index of the figure
+    :param count: The number of figures
+    :return: The output path. Example: "snapshot_2.png" for the second figure.
+    """
+    if count <= 1:
+        return path
+    root, extension = os.path.splitext(path)
+    return f"{root}_{index + 1}{extension}"
+
+
+class SnapshotWriter(threading.Thread):
+    """
+    Snapshot writer class.
+    Save the images given by submit() in a background thread, into a PNG file, an image sequence or a video.
+    """
+    def __init__(self, path: str, frame_rate=1.0, queue_size=default_queue_size, video_command=None):
+        """
+        :param path: The output path (see the module description)
+        :param frame_rate: Number of images per second of the video
+        :param queue_size: Maximum number of images waiting to be saved
+        :param video_command: Function taking the path, the width, the height and the frame rate, returning the
+        command receiving the raw RGBA images on its standard input. None to use ffmpeg.
+        """
+        super().__init__(name=f"SnapshotWriter-{path}", daemon=True)
+        self.path = path
+        self.frame_rate = frame_rate
+        self.sequence = "{" in path
+        self.video = not self.sequence and path.lower().endswith(video_extensions)
+        self._video_command = video_command or build_ffmpeg_command
+        self._process = None
+        self._frame_size = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self.error = None
+        self.saved_count = 0
+        self.dropped_count = 0
+
+    @property
+    def busy(self):
+        """True if a new image would be dropped"""
+        return self._queue.full()
+
+    def submit(self, image):
+        """
+        Give an image to save. If the writer is busy, the image is dropped and counted.
+        :param image: numpy array (height, width, 4) of the RGBA pixels, not modified afterwards
+        :return: True if the image will be saved
+        """
+        if self.error is not None:
+            return False
+        try:
+            self._queue.put_nowait(image)
+        except queue.Full:
+            self.dropped_count += 1
+            return False
+        return True
+
+    def run(self):
+        """Save the images until stop() is called or an error occurred"""
+        while True:
+            image = self._queue.get()
+            if image is None:
+                break
+            try:
+                saved = self._save(image)
+            except (OSError, ValueError) as err:
+                self.error = err
+                break
+            if saved:
+                self.saved_count += 1
+            else:
+                self.dropped_count += 1
+        self._close_video()
+
+    def _save(self, image):
+        """
+        Save an image
+        :return: False if the image can't be saved
+        """
+        if self.video:
+            return self._write_video_frame(image)
+        if self.sequence:
+            matplotlib.image.imsave(self.path.format(self.saved_count), image, format="png")
+        else:
+            # Written next to the file then renamed, so the file read by a viewer is always complete
+            temp_path = self.path + ".tmp"
+            matplotlib.image.imsave(temp_path, image, format="png")
+            os.replace(temp_path, self.path)
+        return True
+
+    def _write_video_frame(self, image):
+        """
+        Pipe an image to the video encoder, started with the size of the first image
+        :return: False if the image doesn't have the size of the video (window resized)
+        """
+        height, width = image.shape[:2]
+        if self._process is None:
+            self._frame_size = (height, width)
+            self._process = subprocess.Popen(self._video_command(self.path, width, height, self.frame_rate),
+                                             stdin=subprocess.PIPE)
+        if (height, width) != self._frame_size:     # a video can't change its size
+            return False
+        self._process.stdin.write(image.tobytes())
+        return True
+
+    def _close_video(self):
+        """Close the pipe of the video encoder, and wait for the end of the video"""
+        if self._process is None:
+            return
+        try:
+            self._process.stdin.close()
+        except OSError:
+            pass
+        self._process.wait()
+        self._process = None
+
+    def stop(self, timeout=10.0):
+        """Save the images waiting, and wait the end of the thread"""
+        if not self.is_alive():
+            return
+        while True:     # the sentinel must be queued, even if the queue is full
+            try:
+                self._queue.put(None, timeout=0.1)
+                break
+            except queue.Full:
+                if not self.is_alive():
+                    return
+        self.join(timeout)
+
+
+def build_ffmpeg_command(path: str, width: int, height: int, frame_rate: float):
+    """Build the ffmpeg command encoding the raw RGBA images received on its standard input into a video"""
+    return ["ffmpeg", "-loglevel", "error", "-y",
+            "-f", "rawvideo", "-pix_fmt", "rgba", "-s", f"{width}x{height}", "-r", str(frame_rate), "-i", "-",
+            "-pix_fmt", "yuv420p", "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", path]
+
+
+class Snapshotter:
+    """
+    Snapshotter class.
+    Draw the figures in memory at a fixed interval, and give their images to a SnapshotWriter per figure.
+    """
+    def __init__(self, path: str, draw, interval=default_interval):
+        """
+        :param path: The output path (see the module description)
+        :param draw: Function taking a figure, drawing it and returning its RGBA image (see pyplot_utils.render_image)
+        :param interval: Time between two images (in seconds)
+        """
+        self.path = path
+        self.interval = interval
+        self._draw = draw
+        self._writers = {}
+        self._reported_errors = set()
+        self._next_time = 0
+
+    def update(self, figures: [], force=False):
+        """
+        Take the images of the figures if the interval is elapsed.
+        :param figures: The figures, None if a figure doesn't exist yet. Each position has its own output.
+        :param force: If True, the images are taken even if the interval is not elapsed
+        :return: True if the images have been taken
+        """
+        now = time.monotonic()
+        if not force and now < self._next_time:
+            return False
+        self._next_time = now + self.interval
+
+        for index, fig in enumerate(figures):
+            if fig is None:
+                continue
+            writer = self._writers.get(index)
+            if writer is None:
+                path = get_output_path(self.path, index, len(figures))
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                writer = SnapshotWriter(path, 1 / self.interval if self.interval > 0 else 1.0)
+                writer.start()
+                self._writers[index] = writer
+            if writer.error is not None:
+                continue
+            if writer.busy:     # the figure isn't drawn for nothing
+                writer.dropped_count += 1
+            else:
+                writer.submit(self._draw(fig))
+        return True
+
+    def pop_errors(self):
+        """
+        Get the errors of the writers not returned yet.
+        :return: array of tuple (path, error)
+        """
+        errors = [(writer.path, writer.error) for writer in self._writers.values()
+                  if writer.error is not None and writer not in self._reported_errors]
+        self._reported_errors.update(writer for writer in self._writers.values() if writer.error is not None)
+        return errors
+
+    def close(self):
+        """
+        Save the images waiting, and stop the writers
+        :return: array of tuple (path, saved_count, dropped_count)
+        """
+        results = []
+        for writer in self._writers.values():
+            writer.stop()
+            results.append((writer.path, writer.saved_count, writer.dropped_count))
+        self._writers = {}
+        return results